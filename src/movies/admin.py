@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Movie, Rating, Watchlist
+from .models import Genre, Movie, Rating, Watchlist
 
 # Register your models here.
 
 admin.site.register(Movie)
 admin.site.register(Rating)
-admin.site.register(Watchlist)
\ No newline at end of file
+admin.site.register(Watchlist)
+admin.site.register(Genre)
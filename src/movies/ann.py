@@ -0,0 +1,147 @@
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+from .similarity import top_k
+
+ASSIGN_CHUNK = 65536
+
+
+def nearest_centroids(vectors, centroids):
+    """Index of the closest centroid (squared L2) for every row of `vectors`."""
+    half_norms = 0.5 * np.einsum('ij,ij->i', centroids, centroids)
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = vectors[start:start + ASSIGN_CHUNK]
+        assignment[start:start + ASSIGN_CHUNK] = np.argmax(chunk @ centroids.T - half_norms, axis=1)
+    return assignment
+
+
+def kmeans(vectors, n_clusters, iterations=20, seed=0, sample_size=100000):
+    """
+    Lloyd's k-means on (a sample of) the vectors. Returns the centroids.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = nearest_centroids(vectors, centroids)
+        membership = sp.csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (assignment, np.arange(len(vectors)))),
+            shape=(n_clusters, len(vectors)),
+        )
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.asarray(membership @ vectors)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters on random points so every list is used
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index for maximum inner product search.
+
+    Vectors are clustered with k-means into `n_lists` coarse cells and stored
+    contiguously cell by cell. A query scores the centroids, visits the
+    `nprobe` best cells and ranks only their members exactly, so recall is
+    traded against latency through `nprobe` alone.
+    """
+
+    ARRAYS = ('centroids', 'offsets', 'ids', 'vectors')
+
+    def __init__(self, centroids, offsets, ids, vectors):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, vectors, ids=None, n_lists=None, iterations=20, seed=0):
+        """
+        Cluster `vectors` and lay them out by cell. `ids` defaults to the row
+        numbers and is what queries return.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if ids is None:
+            ids = np.arange(len(vectors))
+        ids = np.asarray(ids, dtype=np.int64)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(vectors))))
+
+        centroids = kmeans(vectors, n_lists, iterations=iterations, seed=seed)
+        assignment = nearest_centroids(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=offsets[1:])
+
+        return cls(
+            centroids=centroids,
+            offsets=offsets,
+            ids=ids[order],
+            vectors=vectors[order],
+        )
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def save(self, path, prefix='ann_'):
+        path = Path(path)
+        for name in self.ARRAYS:
+            np.save(path / f'{prefix}{name}.npy', getattr(self, name))
+
+    @classmethod
+    def load(cls, path, prefix='ann_', mmap_mode='r'):
+        path = Path(path)
+        return cls(**{
+            name: np.load(path / f'{prefix}{name}.npy', mmap_mode=mmap_mode)
+            for name in cls.ARRAYS
+        })
+
+    @classmethod
+    def exists(cls, path, prefix='ann_'):
+        return all((Path(path) / f'{prefix}{name}.npy').exists() for name in cls.ARRAYS)
+
+    def _candidates(self, query, nprobe):
+        cells = top_k(self.centroids @ query, min(nprobe, self.n_lists))
+        return np.concatenate([
+            np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells
+        ]) if len(cells) else np.zeros(0, dtype=np.int64)
+
+    def search(self, query, k=10, nprobe=8, exclude=None):
+        """
+        Return (ids, scores) of the approximate top-k by inner product.
+        `exclude` is a collection of ids that must not be returned.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        positions = self._candidates(query, nprobe)
+        scores = self.vectors[positions] @ query
+
+        if exclude is not None and len(exclude):
+            scores[np.isin(self.ids[positions], np.asarray(list(exclude), dtype=np.int64))] = -np.inf
+
+        best = [i for i in top_k(scores, k) if np.isfinite(scores[i])]
+        return self.ids[positions[best]], scores[best]
+
+
+def brute_force_search(vectors, query, k=10, ids=None):
+    """Exact top-k by inner product; the reference for recall measurements."""
+    scores = np.asarray(vectors) @ np.asarray(query, dtype=np.float32)
+    best = top_k(scores, k)
+    if ids is None:
+        return best, scores[best]
+    return np.asarray(ids)[best], scores[best]
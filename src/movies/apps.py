@@ -9,5 +9,5 @@ class MoviesConfig(AppConfig):
         return 'django.db.models.BigAutoField'
     
     def ready(self):
-        # This will ensure models are properly loaded when the app is ready
-        pass
\ No newline at end of file
+        # Register signal handlers that keep the recommenders in sync with rating writes
+        from . import signals  # noqa: F401
\ No newline at end of file
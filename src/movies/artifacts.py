@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+MANIFEST_NAME = 'manifest.json'
+
+# File in the artifact root naming the version workers should serve
+POINTER_NAME = 'CURRENT'
+
+
+def artifact_root(name):
+    """Directory holding every version of the named artifact."""
+    return Path(settings.RECOMMENDER_ARTIFACT_DIR) / name
+
+
+def new_version_id():
+    """Sortable version identifier, e.g. 20250405T025300-123456."""
+    now = time.time()
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + f'-{int(now * 1e6) % 1000000:06d}'
+
+
+def list_versions(name):
+    """Return the published versions of an artifact, oldest first."""
+    root = artifact_root(name)
+    if not root.is_dir():
+        return []
+    return sorted(
+        entry.name for entry in root.iterdir()
+        if entry.is_dir() and not entry.name.startswith('.') and (entry / MANIFEST_NAME).exists()
+    )
+
+
+def latest_version(name):
+    """Return the path of the newest published version, or None."""
+    versions = list_versions(name)
+    if not versions:
+        return None
+    return artifact_root(name) / versions[-1]
+
+
+def current_version(name):
+    """
+    Return the path of the version the "current" pointer names, falling
+    back to the newest version if there is no pointer (or it is dangling).
+    """
+    root = artifact_root(name)
+    try:
+        version = (root / POINTER_NAME).read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        version = None
+    if version and (root / version / MANIFEST_NAME).exists():
+        return root / version
+    return latest_version(name)
+
+
+def set_current(name, version):
+    """
+    Point readers at a published version, e.g. to roll back. The pointer is
+    written to a temporary file and renamed over the old one, so readers
+    see either the previous version or the new one.
+    """
+    root = artifact_root(name)
+    if not (root / version / MANIFEST_NAME).exists():
+        raise ValueError(f'{name} has no published version {version}')
+    staging = root / f'.{POINTER_NAME}-{os.getpid()}-{time.time_ns()}'
+    with open(staging, 'w', encoding='utf-8') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(staging, root / POINTER_NAME)
+
+
+def pointer_stamp(name):
+    """
+    Cheap change detector for an artifact: two stat() calls covering the
+    pointer file and the root directory (which changes when a version is
+    published). Equal stamps mean nothing was published or switched.
+    """
+    root = artifact_root(name)
+    stamp = []
+    for path in (root / POINTER_NAME, root):
+        try:
+            info = os.stat(path)
+            stamp.append((info.st_ino, info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def read_manifest(path):
+    with open(Path(path) / MANIFEST_NAME, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ArtifactWriter:
+    """
+    Write a new artifact version into a hidden staging directory and publish
+    it with a single rename, so readers never see a half-written version.
+    Unless `activate` is off, the "current" pointer is then switched to it.
+
+        with ArtifactWriter('als') as writer:
+            np.save(writer.path / 'item_factors.npy', item_factors)
+            writer.manifest['factors'] = 64
+    """
+
+    def __init__(self, name, version=None, activate=True):
+        self.name = name
+        self.version = version or new_version_id()
+        self.activate = activate
+        self.root = artifact_root(name)
+        self.path = self.root / f'.staging-{self.version}'
+        self.manifest = {'name': name, 'version': self.version}
+
+    @property
+    def published_path(self):
+        return self.root / self.version
+
+    def __enter__(self):
+        self.path.mkdir(parents=True, exist_ok=False)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            return False
+
+        self.manifest['created_at'] = time.time()
+        with open(self.path / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.rename(self.path, self.published_path)
+        if self.activate:
+            set_current(self.name, self.version)
+        return False
+
+
+def prune_versions(name, keep=3):
+    """Delete all but the newest `keep` versions of an artifact, never the current one."""
+    versions = list_versions(name)
+    current = current_version(name)
+    for version in versions[:-keep] if keep > 0 else versions:
+        if current is not None and version == current.name:
+            continue
+        shutil.rmtree(artifact_root(name) / version, ignore_errors=True)
@@ -0,0 +1,153 @@
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+
+# Most suggestions a single request may ask for
+MAX_SUGGESTIONS = 20
+
+# Prefixes matching more keys than this have their suggestions precomputed,
+# so no request scans more than this many keys
+SCAN_LIMIT = 512
+
+# Sorts after every character a normalised key can contain
+_KEY_END = '\uffff'
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+_WORD_RE = re.compile(r'\S+')
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def normalize(text):
+    """Lower-case ASCII words separated by single spaces: 'Amélie!' -> 'amelie'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM_RE.sub(' ', text.lower()).strip()
+
+
+class PrefixIndex:
+    """
+    Typeahead over movie titles.
+
+    Every normalised title is stored once per word it contains, starting at
+    that word ("the dark knight", "dark knight", "knight"), in one sorted
+    list, so the titles matching a prefix at any word boundary are a single
+    bisected range. Movies are numbered by popularity rank, which makes
+    the best suggestions of a range simply its smallest distinct ranks.
+    """
+
+    def __init__(self, movies):
+        # movies: (id, title, year, poster_url) tuples, most popular first
+        self.movies = [
+            {"id": movie_id, "title": title, "year": year, "poster_url": poster_url}
+            for movie_id, title, year, poster_url in movies
+        ]
+
+        entries = sorted(
+            (name[match.start():], rank)
+            for rank, (_, title, _, _) in enumerate(movies)
+            for name in [normalize(title)]
+            for match in _WORD_RE.finditer(name)
+        )
+        self.keys = [key for key, _ in entries]
+        self.ranks = np.array([rank for _, rank in entries], dtype=np.int32)
+        self.hot = self._hot_prefixes()
+
+    @classmethod
+    def from_db(cls):
+        Movie = apps.get_model('movies', 'Movie')
+        MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+
+        popularity = dict(MoviePopularity.objects.filter(genre='').values_list('movie_id', 'score'))
+        rows = Movie.objects.values_list('id', 'title', 'release_date', 'poster_url')
+        movies = [
+            (movie_id, title, release_date.year if release_date else None, poster_url)
+            for movie_id, title, release_date, poster_url in rows.iterator(chunk_size=2000)
+        ]
+        movies.sort(key=lambda movie: (-popularity.get(movie[0], 0.0), movie[1], movie[0]))
+        return cls(movies)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def _top(self, lo, hi):
+        return np.unique(self.ranks[lo:hi])[:MAX_SUGGESTIONS].tolist()
+
+    def _hot_prefixes(self):
+        """Precomputed suggestions for every prefix matching over SCAN_LIMIT keys."""
+        hot = {}
+        stack = [('', 0, len(self.keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            depth = len(prefix) + 1
+            i = lo
+            while i < hi:
+                if len(self.keys[i]) < depth:
+                    # The key is the prefix itself, which sorts first
+                    i += 1
+                    continue
+                longer = self.keys[i][:depth]
+                j = bisect_left(self.keys, longer + _KEY_END, i, hi)
+                if j - i > SCAN_LIMIT:
+                    hot[longer] = self._top(i, j)
+                    stack.append((longer, i, j))
+                i = j
+        return hot
+
+    def suggest(self, query, limit=10):
+        """Up to `limit` movies whose title has a word starting with `query`, most popular first."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if query[-1:].isspace():
+            # "dark " has finished its word: match "dark knight", not "darkness"
+            prefix += ' '
+
+        ranks = self.hot.get(prefix)
+        if ranks is None:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + _KEY_END, lo)
+            ranks = self._top(lo, hi)
+        return [self.movies[rank] for rank in ranks[:limit]]
+
+
+def get_autocomplete_index(force=False):
+    """
+    Return the process-wide prefix index, rebuilt from the database when
+    it is older than RECOMMENDER_MODEL_TTL seconds or a movie changed in
+    this process. While one request rebuilds it the others keep answering
+    from the previous index.
+    """
+    global _index, _index_built_at
+
+    ttl = getattr(settings, 'RECOMMENDER_MODEL_TTL', 3600)
+    if not force and _index is not None and time.time() - _index_built_at < ttl:
+        return _index
+
+    if not _index_lock.acquire(blocking=force or _index is None):
+        return _index
+    try:
+        if force or _index is None or time.time() - _index_built_at >= ttl:
+            _index = PrefixIndex.from_db()
+            _index_built_at = time.time()
+    finally:
+        _index_lock.release()
+    return _index
+
+
+def autocomplete_changed():
+    """Rebuild the index on next use (called when a Movie is saved or deleted)."""
+    global _index_built_at
+    _index_built_at = 0.0
+
+
+def suggest_movies(query, limit=10):
+    return get_autocomplete_index().suggest(query, min(limit, MAX_SUGGESTIONS))
@@ -0,0 +1,112 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = 'recs:generation'
+HITS_KEY = 'recs:hits'
+MISSES_KEY = 'recs:misses'
+
+# Backends whose entries live inside one process: a bump or eviction made
+# anywhere else (a management command, another worker) never reaches them
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _counter(key):
+    value = cache.get(key)
+    return int(value) if value is not None else 0
+
+
+def _increment(key):
+    """Atomic where the backend supports it; creates the counter on first use."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def generation():
+    """Global counter folded into every key; bumping it orphans all entries."""
+    return _counter(GENERATION_KEY)
+
+
+def _user_version_key(user_id):
+    return f'recs:user:{user_id}'
+
+
+def recommendation_key(user_id, num_recommendations, namespace=''):
+    """Key for a user's list under the current generation and user version."""
+    user = 'anonymous' if user_id is None else user_id
+    versions = cache.get_many([GENERATION_KEY, _user_version_key(user)])
+    return (
+        f'recs:{versions.get(GENERATION_KEY, 0)}:{user}:'
+        f'{versions.get(_user_version_key(user), 0)}:{namespace}:{num_recommendations}'
+    )
+
+
+def get_cached_recommendations(user_id, num_recommendations, compute, namespace=''):
+    """
+    Return a user's serialised recommendations from the cache. Each view
+    caches its own serialisation under its own `namespace`.
+
+    On a miss compute() must return (payload, cacheable); results it marks
+    as not cacheable, e.g. ones degraded by the time budget, are served
+    once but not stored.
+    """
+    key = recommendation_key(user_id, num_recommendations, namespace)
+    payload = cache.get(key)
+    if payload is not None:
+        _increment(HITS_KEY)
+        return payload
+
+    _increment(MISSES_KEY)
+    payload, cacheable = compute()
+    if cacheable:
+        cache.set(key, payload, timeout=getattr(settings, 'RECOMMENDER_CACHE_TIMEOUT', 300))
+    return payload
+
+
+def evict_user(user_id):
+    """
+    Make a user's cached recommendations unreachable once the current
+    transaction commits, so a concurrent read cannot re-cache stale rows.
+    """
+    if user_id is None:
+        return
+    # A fresh timestamp rather than an increment: a plain set cannot race,
+    # and never repeats a version even if the old one was evicted
+    transaction.on_commit(lambda: cache.set(_user_version_key(user_id), time.time_ns(), timeout=None))
+
+
+def is_shared():
+    """True if every process sees the same cache, so invalidation reaches them all."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def bump_generation():
+    """
+    Invalidate every cached recommendation, e.g. after a retrain. Only
+    reaches other processes when is_shared().
+    """
+    return _increment(GENERATION_KEY)
+
+
+def cache_stats():
+    hits, misses = _counter(HITS_KEY), _counter(MISSES_KEY)
+    total = hits + misses
+    return {
+        'generation': generation(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
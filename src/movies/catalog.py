@@ -0,0 +1,189 @@
+import threading
+import time
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+
+from .versions import MOVIES, counter
+
+_index = None
+_index_built_at = 0.0
+_index_checked_at = 0.0
+_index_movies_version = None
+_index_lock = threading.Lock()
+
+
+class RecommendationFilters:
+    """Query-time restrictions on which movies may be recommended."""
+
+    def __init__(self, genres=(), year_from=None, year_to=None):
+        self.genres = tuple(sorted({genre.strip().lower() for genre in genres if genre.strip()}))
+        self.year_from = year_from
+        self.year_to = year_to
+
+    @classmethod
+    def from_query_params(cls, params):
+        """
+        Parse ?genre=Action&genre=Drama (or genre=Action,Drama), ?year_from=
+        and ?year_to=. Raises ValueError for years that are not integers.
+        """
+        genres = []
+        for value in params.getlist('genre'):
+            genres.extend(value.split(','))
+        year_from, year_to = params.get('year_from'), params.get('year_to')
+        return cls(
+            genres,
+            int(year_from) if year_from not in (None, '') else None,
+            int(year_to) if year_to not in (None, '') else None,
+        )
+
+    def __bool__(self):
+        return bool(self.genres) or self.year_from is not None or self.year_to is not None
+
+    def cache_key(self):
+        return f"{'|'.join(self.genres)}:{self.year_from or ''}:{self.year_to or ''}"
+
+
+class CatalogIndex:
+    """
+    Column-oriented snapshot of the Movie table for filtering candidates
+    with vectorised masks instead of SQL: one genre bitset per movie (bit g
+    set when a MovieGenre link gives it genre g), the release year, and the
+    overall popularity score.
+    """
+
+    def __init__(self, movie_ids, genre_names, genre_bits, years, popularity):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.genre_names = list(genre_names)
+        self.genre_index = {name: i for i, name in enumerate(self.genre_names)}
+        # (n_movies, words) uint64, so any number of genres fits
+        self.genre_bits = genre_bits
+        self.years = np.asarray(years, dtype=np.int32)
+        self.popularity = np.asarray(popularity, dtype=np.float64)
+
+    @classmethod
+    def from_db(cls):
+        Movie = apps.get_model('movies', 'Movie')
+        Genre = apps.get_model('movies', 'Genre')
+        MovieGenre = apps.get_model('movies', 'MovieGenre')
+        MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+
+        rows = list(Movie.objects.order_by('id').values_list('id', 'release_date'))
+        movie_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        # Undated movies get year 0, which year filters exclude
+        years = np.array([row[1].year if row[1] else 0 for row in rows], dtype=np.int32)
+
+        # Genre keys are the lower-cased names RecommendationFilters carries
+        genres = list(Genre.objects.order_by('key').values_list('id', 'key'))
+        genre_names = [key for _, key in genres]
+        genre_bits = np.zeros((len(rows), max(1, (len(genres) + 63) // 64)), dtype=np.uint64)
+        index = cls(movie_ids, genre_names, genre_bits, years, np.zeros(len(rows)))
+
+        links = np.array(list(MovieGenre.objects.values_list('movie_id', 'genre_id')), dtype=np.int64).reshape(-1, 2)
+        if len(links) and genres:
+            genre_ids = np.array([genre_id for genre_id, _ in genres], dtype=np.int64)
+            by_id = np.argsort(genre_ids)
+            genre_rows = by_id[np.minimum(np.searchsorted(genre_ids[by_id], links[:, 1]), len(genres) - 1)]
+            movie_rows = index.item_indices(links[:, 0])
+            # Links written between the reads may name rows the index lacks
+            known = (movie_rows >= 0) & (genre_ids[genre_rows] == links[:, 1])
+            genre_rows, movie_rows = genre_rows[known], movie_rows[known]
+            bits = np.left_shift(np.uint64(1), (genre_rows % 64).astype(np.uint64))
+            np.bitwise_or.at(genre_bits, (movie_rows, genre_rows // 64), bits)
+
+        scores = list(MoviePopularity.objects.filter(genre='').values_list('movie_id', 'score'))
+        if scores:
+            rows = index.item_indices([movie_id for movie_id, _ in scores])
+            values = np.array([score for _, score in scores])
+            index.popularity[rows[rows >= 0]] = values[rows >= 0]
+        return index
+
+    @property
+    def n_items(self):
+        return len(self.movie_ids)
+
+    def item_indices(self, movie_ids):
+        """Map movie IDs to rows; unknown movies map to -1."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if self.n_items == 0:
+            return np.full(len(movie_ids), -1, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.movie_ids, movie_ids), self.n_items - 1)
+        return np.where(self.movie_ids[idx] == movie_ids, idx, -1)
+
+    def genre_mask(self, genres):
+        """Movies having any of the given (lower-cased) genres."""
+        wanted = np.zeros(self.genre_bits.shape[1], dtype=np.uint64)
+        for name in genres:
+            g = self.genre_index.get(name)
+            if g is not None:
+                wanted[g // 64] |= np.uint64(1) << np.uint64(g % 64)
+        return (self.genre_bits & wanted).any(axis=1)
+
+    def mask(self, filters=None, exclude=None):
+        """
+        Boolean array over the catalog: True for movies that pass the filters
+        and are not in `exclude`.
+        """
+        allowed = np.ones(self.n_items, dtype=bool)
+        if filters:
+            if filters.genres:
+                allowed &= self.genre_mask(filters.genres)
+            if filters.year_from is not None or filters.year_to is not None:
+                allowed &= self.years > 0
+            if filters.year_from is not None:
+                allowed &= self.years >= filters.year_from
+            if filters.year_to is not None:
+                allowed &= self.years <= filters.year_to
+        if exclude is not None and len(exclude):
+            rows = self.item_indices(exclude)
+            allowed[rows[rows >= 0]] = False
+        return allowed
+
+    def allowed(self, movie_ids, mask):
+        """Boolean per movie ID: known to the catalog and set in `mask`."""
+        rows = self.item_indices(movie_ids)
+        if self.n_items == 0:
+            return rows >= 0
+        return (rows >= 0) & mask[np.maximum(rows, 0)]
+
+
+def get_catalog_index(force=False):
+    """
+    Return the process-wide catalog index.
+
+    It is rebuilt when older than RECOMMENDER_MODEL_TTL seconds, when a
+    movie changed in this process, and when the MOVIES change counter,
+    read every RECOMMENDER_ARTIFACT_CHECK_SECONDS, shows that another
+    worker saved or deleted one. While one request rebuilds it the others
+    keep filtering with the previous index.
+    """
+    global _index, _index_built_at, _index_checked_at, _index_movies_version
+
+    ttl = getattr(settings, 'RECOMMENDER_MODEL_TTL', 3600)
+    interval = getattr(settings, 'RECOMMENDER_ARTIFACT_CHECK_SECONDS', 2)
+    now = time.time()
+    if not force and _index is not None and now - _index_built_at < ttl and now - _index_checked_at < interval:
+        return _index
+
+    if not _index_lock.acquire(blocking=force or _index is None):
+        return _index
+    try:
+        # Read before rebuilding, so a save racing the rebuild is caught
+        # on the next check
+        version = counter(MOVIES)[0]
+        if (force or _index is None or time.time() - _index_built_at >= ttl
+                or version != _index_movies_version):
+            _index = CatalogIndex.from_db()
+            _index_built_at = time.time()
+            _index_movies_version = version
+        _index_checked_at = time.time()
+    finally:
+        _index_lock.release()
+    return _index
+
+
+def catalog_changed():
+    """Rebuild the index on next use (called when a Movie is saved or deleted)."""
+    global _index_built_at
+    _index_built_at = 0.0
@@ -0,0 +1,265 @@
+import json
+import re
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+from django.apps import apps
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from .artifacts import ArtifactWriter, current_version, read_manifest
+from .similarity import top_k
+
+ARTIFACT_NAME = 'content'
+
+# Each genre counts as this many occurrences of a "genre:<name>" term
+GENRE_WEIGHT = 3
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Catch-ups re-read this far before the last one, so a save committed late
+# with an earlier content_updated_at is not missed
+CATCH_UP_OVERLAP = timedelta(minutes=1)
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in ENGLISH_STOP_WORDS
+    ]
+
+
+def movie_changes(movie_ids, since):
+    """
+    What an index over `movie_ids`, read from the Movie table at `since`,
+    is missing: (id, title, genre, description) rows of movies saved since
+    then (new or edited), and the indexed IDs whose movies were deleted.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+    # content_updated_at, not updated_at: rating writes touch the latter
+    changed = Movie.objects.filter(content_updated_at__gt=since - CATCH_UP_OVERLAP)
+    rows = list(changed.values_list('id', 'title', 'genre', 'description'))
+    indexed = set(np.asarray(movie_ids).tolist()) | {row[0] for row in rows}
+    deleted = []
+    # Only list every ID when the counts show something is gone
+    if len(indexed) != Movie.objects.count():
+        deleted = sorted(indexed - set(Movie.objects.values_list('id', flat=True)))
+    return rows, deleted
+
+
+def movie_terms(title, genre, description):
+    """Bag of terms for a movie: title and logline words plus genre tags."""
+    terms = tokenize(title) + tokenize(description)
+    for name in (genre or '').split(','):
+        name = name.strip().lower()
+        if name:
+            terms.extend([f'genre:{name}'] * GENRE_WEIGHT)
+    return terms
+
+
+class ContentModel:
+    """
+    TF-IDF representation of every movie's title, genres and logline.
+
+    Raw term counts and document frequencies are kept next to the weighted
+    matrix, so adding titles only tokenises the new ones: the vocabulary is
+    extended, the IDF vector recomputed and the counts re-weighted in one
+    vectorised pass.
+    """
+
+    def __init__(self, movie_ids, counts, vocabulary, doc_freq, indexed_at=None):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.counts = counts.tocsr()
+        self.vocabulary = list(vocabulary)
+        self.term_index = {term: i for i, term in enumerate(self.vocabulary)}
+        self.doc_freq = np.asarray(doc_freq, dtype=np.int64)
+        # When the Movie table was read; catch-ups start from here
+        self.indexed_at = indexed_at
+        self.matrix = self._weighted()
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype=np.int64), sp.csr_matrix((0, 0), dtype=np.float32), [], np.zeros(0))
+
+    @classmethod
+    def fit(cls, movies):
+        """Build a model from (id, title, genre, description) tuples."""
+        return cls.empty().add_movies(movies)
+
+    @classmethod
+    def fit_from_db(cls, queryset=None):
+        if queryset is None:
+            Movie = apps.get_model('movies', 'Movie')
+            queryset = Movie.objects.all()
+        indexed_at = timezone.now()
+        rows = queryset.values_list('id', 'title', 'genre', 'description')
+        model = cls.fit(rows.iterator(chunk_size=2000))
+        model.indexed_at = indexed_at
+        return model
+
+    @property
+    def n_items(self):
+        return len(self.movie_ids)
+
+    def _weighted(self):
+        """Sublinear TF x smoothed IDF, L2-normalised per movie."""
+        n_docs = max(self.n_items, 1)
+        idf = np.log((1 + n_docs) / (1 + self.doc_freq)) + 1.0
+        weighted = self.counts.astype(np.float32, copy=True)
+        weighted.data = (1.0 + np.log(weighted.data)) * idf[weighted.indices].astype(np.float32)
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.diags(1.0 / norms).dot(weighted).tocsr().astype(np.float32)
+
+    def add_movies(self, movies):
+        """
+        Return a new model that also covers the given (id, title, genre,
+        description) tuples. Movies already in the model are replaced.
+        """
+        vocabulary = list(self.vocabulary)
+        term_index = dict(self.term_index)
+        new_ids, rows, cols, values = [], [], [], []
+
+        for movie_id, title, genre, description in movies:
+            terms, counts = np.unique(movie_terms(title, genre, description), return_counts=True)
+            row = len(new_ids)
+            new_ids.append(movie_id)
+            for term, count in zip(terms.tolist(), counts.tolist()):
+                col = term_index.get(term)
+                if col is None:
+                    col = term_index[term] = len(vocabulary)
+                    vocabulary.append(term)
+                rows.append(row)
+                cols.append(col)
+                values.append(count)
+
+        if not new_ids:
+            return self
+
+        n_terms = len(vocabulary)
+        new_ids = np.asarray(new_ids, dtype=np.int64)
+        added = sp.csr_matrix((np.asarray(values, dtype=np.float32), (rows, cols)), shape=(len(new_ids), n_terms))
+
+        keep = ~np.isin(self.movie_ids, new_ids)
+        old = self.counts[np.flatnonzero(keep)]
+        old = sp.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], n_terms))
+
+        movie_ids = np.concatenate([self.movie_ids[keep], new_ids])
+        counts = sp.vstack([old, added]).tocsr()
+        order = np.argsort(movie_ids, kind='stable')
+        counts = counts[order]
+        doc_freq = np.bincount(counts.indices, minlength=n_terms)
+
+        return ContentModel(movie_ids[order], counts, vocabulary, doc_freq, self.indexed_at)
+
+    def remove_movies(self, movie_ids):
+        """Return a new model without the given movies."""
+        keep = np.flatnonzero(~np.isin(self.movie_ids, np.asarray(list(movie_ids), dtype=np.int64)))
+        if len(keep) == self.n_items:
+            return self
+        counts = self.counts[keep]
+        doc_freq = np.bincount(counts.indices, minlength=len(self.vocabulary))
+        return ContentModel(self.movie_ids[keep], counts, self.vocabulary, doc_freq, self.indexed_at)
+
+    def item_indices(self, movie_ids):
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if self.n_items == 0:
+            return np.full(len(movie_ids), -1, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.movie_ids, movie_ids), self.n_items - 1)
+        return np.where(self.movie_ids[idx] == movie_ids, idx, -1)
+
+    def score_profile(self, movie_ids, weights=None):
+        """
+        Score every movie against a weighted mix of the given movies with one
+        sparse dot product. Returns None if none of them are known.
+        """
+        items = self.item_indices(movie_ids)
+        known = items >= 0
+        if not known.any():
+            return None
+        weights = np.ones(len(items)) if weights is None else np.asarray(weights, dtype=np.float64)
+        profile = sp.csr_matrix(weights[known].reshape(1, -1)) @ self.matrix[items[known]]
+        return self.matrix.dot(profile.T).toarray().ravel()
+
+    def similar(self, movie_id, n=10):
+        """Return up to n movie IDs most like the given one."""
+        scores = self.score_profile([movie_id])
+        if scores is None:
+            return []
+        scores[self.item_indices([movie_id])] = -np.inf
+        ranked = [i for i in top_k(scores, n) if scores[i] > 0]
+        return self.movie_ids[ranked].tolist()
+
+    def recommend(self, movie_ids, weights=None, n=10, exclude=None):
+        """
+        Rank movies for a user described only by the titles they liked,
+        e.g. a cold-start user with a handful of ratings or a watchlist.
+        """
+        scores = self.score_profile(movie_ids, weights)
+        if scores is None:
+            return []
+        seen = np.concatenate([np.asarray(movie_ids, dtype=np.int64), np.asarray(exclude or [], dtype=np.int64)])
+        items = self.item_indices(seen)
+        scores[items[items >= 0]] = -np.inf
+        ranked = [i for i in top_k(scores, n) if scores[i] > 0]
+        return self.movie_ids[ranked].tolist()
+
+    def save(self):
+        """Publish the model as a new version of the 'content' artifact."""
+        with ArtifactWriter(ARTIFACT_NAME) as writer:
+            np.save(writer.path / 'movie_ids.npy', self.movie_ids)
+            np.save(writer.path / 'doc_freq.npy', self.doc_freq)
+            sp.save_npz(writer.path / 'counts.npz', self.counts)
+            with open(writer.path / 'vocabulary.json', 'w', encoding='utf-8') as f:
+                json.dump(self.vocabulary, f)
+            writer.manifest.update({
+                'movies': self.n_items,
+                'terms': len(self.vocabulary),
+                'indexed_at': self.indexed_at.isoformat() if self.indexed_at else None,
+            })
+        return writer.published_path
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        with open(path / 'vocabulary.json', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        manifest = read_manifest(path)
+        model = cls(
+            np.load(path / 'movie_ids.npy'),
+            sp.load_npz(path / 'counts.npz'),
+            vocabulary,
+            np.load(path / 'doc_freq.npy'),
+            parse_datetime(manifest.get('indexed_at') or ''),
+        )
+        model.path = path
+        model.version = manifest['version']
+        return model
+
+
+def update_content_index(full=False):
+    """
+    Bring the published content model up to date with the Movie table.
+
+    Only movies saved since the current version was built are tokenised,
+    and deleted ones dropped; `full` refits from scratch. Returns (path,
+    number of movies changed).
+    """
+    path = current_version(ARTIFACT_NAME)
+    model = ContentModel.load(path) if path is not None and not full else None
+
+    # Versions published before catch-ups tracked indexed_at need one refit
+    if model is None or model.indexed_at is None:
+        model = ContentModel.fit_from_db()
+        return model.save(), model.n_items
+
+    indexed_at = timezone.now()
+    rows, deleted = movie_changes(model.movie_ids, model.indexed_at)
+    if not rows and not deleted:
+        return path, 0
+    model = model.remove_movies(deleted).add_movies(rows)
+    model.indexed_at = indexed_at
+    return model.save(), len(rows) + len(deleted)
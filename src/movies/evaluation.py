@@ -0,0 +1,215 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from .content import ContentModel
+from .factorization import train_als
+from .matrix import RatingMatrix
+from .popularity import bayesian_average
+from .similarity import ItemSimilarityModel, top_k
+from .strategies import EMPTY, blend
+
+
+def temporal_split(users, movies, ratings, timestamps, test_fraction=0.2):
+    """
+    Split rating events at a single point in time: the latest
+    `test_fraction` of events become the test set, as if the models had
+    been trained at that moment and asked about what came next.
+
+    Returns (train RatingMatrix, test triples, cutoff timestamp).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    cutoff = float(np.quantile(timestamps, 1.0 - test_fraction)) if len(timestamps) else 0.0
+    train = timestamps <= cutoff
+    test = ~train
+    users = np.asarray(users, dtype=object)
+    movies = np.asarray(movies, dtype=np.int64)
+    ratings = np.asarray(ratings, dtype=np.float32)
+
+    matrix = RatingMatrix.from_triples(users[train], movies[train], ratings[train])
+    return matrix, (users[test].astype(str), movies[test], ratings[test]), cutoff
+
+
+def rank_metrics(recommended, relevant, k):
+    """Return (precision@k, recall@k, NDCG@k) for binary relevance."""
+    hits = np.array([movie_id in relevant for movie_id in recommended[:k]], dtype=np.float64)
+    if not relevant:
+        return 0.0, 0.0, 0.0
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = float((hits * discounts[:len(hits)]).sum())
+    idcg = float(discounts[:min(len(relevant), k)].sum())
+    return hits.sum() / k, hits.sum() / len(relevant), dcg / idcg
+
+
+def _ranked(movie_ids, scores, seen, n):
+    """Top-n (movie_ids, scores), skipping seen items and non-positive scores."""
+    scores = np.array(scores, dtype=np.float64)
+    scores[np.isin(movie_ids, seen)] = -np.inf
+    top = [i for i in top_k(scores, n) if scores[i] > 0]
+    return movie_ids[top], scores[top]
+
+
+class Recommender:
+    """
+    An offline recommender: fit() on a training RatingMatrix, then
+    recommend() returns (movie_ids, scores) best first, never including the
+    user's `seen` movies.
+    """
+
+    name = None
+
+    def fit(self, train):
+        raise NotImplementedError
+
+    def recommend(self, user_id, seen, n):
+        raise NotImplementedError
+
+
+class PopularityRecommender(Recommender):
+    name = 'popularity'
+
+    def fit(self, train):
+        counts = train.item_counts()
+        sums = np.asarray(train.matrix.sum(axis=0)).ravel()
+        mean = sums.sum() / max(counts.sum(), 1)
+        self.movie_ids = train.movie_ids
+        self.scores = bayesian_average(sums, counts, mean)
+
+    def recommend(self, user_id, seen, n):
+        return _ranked(self.movie_ids, self.scores, seen, n)
+
+
+class ItemItemRecommender(Recommender):
+    name = 'item_item'
+
+    def fit(self, train):
+        self.model = ItemSimilarityModel(train)
+
+    def recommend(self, user_id, seen, n):
+        profile = self.model.user_profile(user_id)
+        if profile is None:
+            return EMPTY, np.zeros(0)
+        return _ranked(self.model.movie_ids, self.model.score_items(*profile), seen, n)
+
+
+class ALSRecommender(Recommender):
+    name = 'als'
+
+    def __init__(self, factors=64, iterations=15, regularization=0.1, seed=0):
+        self.params = {'factors': factors, 'iterations': iterations,
+                       'regularization': regularization, 'seed': seed}
+
+    def fit(self, train):
+        self.train = train
+        self.user_factors, self.item_factors, _ = train_als(train.matrix, **self.params)
+
+    def recommend(self, user_id, seen, n):
+        row = self.train.user_index(user_id)
+        if row is None:
+            return EMPTY, np.zeros(0)
+        scores = self.item_factors @ self.user_factors[row]
+        # Centred explicit factors can score good items below zero
+        scores = scores - scores.min() + 1e-6
+        return _ranked(self.train.movie_ids, scores, seen, n)
+
+
+class ContentRecommender(Recommender):
+    name = 'content'
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def fit(self, train):
+        self.train = train
+        self.model = ContentModel.fit(self.catalog)
+
+    def recommend(self, user_id, seen, n):
+        row = self.train.user_index(user_id)
+        if row is None:
+            return EMPTY, np.zeros(0)
+        indices, values = self.train.user_row(row)
+        liked = self.train.movie_ids[indices[values >= 4]]
+        scores = self.model.score_profile(liked)
+        if scores is None:
+            return EMPTY, np.zeros(0)
+        return _ranked(self.model.movie_ids, scores, seen, n)
+
+
+class HybridRecommender(Recommender):
+    """Blend already-fitted recommenders the way the serving registry does."""
+
+    name = 'hybrid'
+
+    def __init__(self, components, weights):
+        self.components = components
+        self.weights = weights
+
+    def fit(self, train):
+        pass
+
+    def recommend(self, user_id, seen, n):
+        pool = max(n * 10, 50)
+        scored = []
+        for name, weight in self.weights.items():
+            if weight > 0 and name in self.components:
+                ids, scores = self.components[name].recommend(user_id, seen, pool)
+                if len(ids):
+                    scored.append((weight, ids, scores))
+        return np.asarray(blend(scored, n, np.asarray(seen, dtype=np.int64)), dtype=np.int64), None
+
+
+def fit_measured(recommender, train):
+    """Fit a recommender; return (seconds, peak traced memory in bytes)."""
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        recommender.fit(train)
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def evaluate(recommender, train, test, user_ids, k=10, relevance=4, n_catalog=None):
+    """
+    Score a fitted recommender for each user in `user_ids` and compare with
+    what they rated at least `relevance` stars in `test`.
+
+    Returns a dict of mean precision/recall/NDCG, catalog coverage and
+    per-request latency percentiles.
+    """
+    test_users, test_movies, test_ratings = test
+    relevant = {}
+    for user_id, movie_id, rating in zip(test_users.tolist(), test_movies.tolist(), test_ratings.tolist()):
+        if rating >= relevance:
+            relevant.setdefault(user_id, set()).add(movie_id)
+
+    totals = np.zeros(3)
+    latencies, recommended = [], set()
+    for user_id in user_ids:
+        row = train.user_index(user_id)
+        seen = train.movie_ids[train.user_row(row)[0]] if row is not None else EMPTY
+
+        started = time.perf_counter()
+        movie_ids, _ = recommender.recommend(user_id, seen, k)
+        latencies.append(time.perf_counter() - started)
+
+        movie_ids = list(movie_ids)[:k]
+        recommended.update(movie_ids)
+        totals += rank_metrics(movie_ids, relevant.get(user_id, set()), k)
+
+    n_users = max(len(user_ids), 1)
+    millis = np.asarray(latencies or [0.0]) * 1000
+    n_catalog = n_catalog or train.shape[1]
+    return {
+        'users': len(user_ids),
+        f'precision@{k}': round(totals[0] / n_users, 4),
+        f'recall@{k}': round(totals[1] / n_users, 4),
+        f'ndcg@{k}': round(totals[2] / n_users, 4),
+        'coverage': round(len(recommended) / max(n_catalog, 1), 4),
+        'p50_ms': round(float(np.percentile(millis, 50)), 4),
+        'p95_ms': round(float(np.percentile(millis, 95)), 4),
+        'p99_ms': round(float(np.percentile(millis, 99)), 4),
+    }
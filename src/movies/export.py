@@ -0,0 +1,58 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+MOVIE_FIELDS = [
+    'id', 'title', 'genre', 'release_date', 'poster_url', 'description',
+    'rating_sum', 'rating_count', 'popularity_score', 'updated_at',
+]
+
+# No user e-mails or names: consumers only need who rated what
+RATING_FIELDS = ['id', 'user_id', 'movie_id', 'rating', 'review', 'created_at', 'updated_at']
+
+EXPORTS = {
+    'movies': ('Movie', MOVIE_FIELDS),
+    'ratings': ('Rating', RATING_FIELDS),
+}
+
+
+def parse_since(value):
+    """An aware datetime from an ISO date or datetime string; ValueError if unreadable."""
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"since must be an ISO date or datetime, not {value!r}")
+        since = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def export_rows(name, since=None, chunk_size=2000):
+    """
+    Rows of an export as dicts, oldest change first, streamed from the
+    database in chunks. `since` keeps rows updated after it.
+    """
+    model_name, fields = EXPORTS[name]
+    model = apps.get_model('movies', model_name)
+    rows = model.objects.all()
+    if since is not None:
+        rows = rows.filter(updated_at__gt=since)
+    return rows.order_by('updated_at', 'id').values(*fields).iterator(chunk_size=chunk_size)
+
+
+def ndjson_lines(rows, chunk_size=2000):
+    """Encode rows as newline-delimited JSON, a chunk of lines per yield."""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(row) + '\n')
+        if len(lines) == chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
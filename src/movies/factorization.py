@@ -0,0 +1,278 @@
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .ann import IVFIndex
+from .artifacts import ArtifactWriter, read_manifest
+from .similarity import top_k
+
+ARTIFACT_NAME = 'als'
+
+
+def solve_rows(matrix, fixed, out, start, stop, regularization, implicit=False, alpha=40.0, gram=None):
+    """
+    Solve the ALS least-squares problem for rows [start, stop) of `matrix`
+    against the fixed factors of the other side, writing into `out`.
+
+    Explicit feedback uses weighted-lambda regularisation over the observed
+    entries only. Implicit feedback follows Hu, Koren & Volinsky with
+    confidence 1 + alpha * r and binary preferences; pass the fixed side's
+    `gram` when solving it in blocks to compute it only once.
+    """
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    if implicit and gram is None:
+        gram = fixed.T @ fixed
+
+    for row in range(start, stop):
+        lo, hi = indptr[row], indptr[row + 1]
+        if lo == hi:
+            out[row] = 0
+            continue
+        out[row] = solve_one(fixed[indices[lo:hi]], data[lo:hi], regularization, implicit, alpha, gram)
+
+
+def solve_one(factors, values, regularization, implicit=False, alpha=40.0, gram=None):
+    """
+    Least-squares factor vector for one row given the fixed factors of the
+    items (or users) it interacted with and the matching values. `gram` is
+    the full F^T F of the fixed side, required for implicit feedback.
+    """
+    factors = np.asarray(factors, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    eye = np.eye(factors.shape[1])
+
+    if implicit:
+        confidence = 1.0 + alpha * values
+        a = gram + (factors.T * (confidence - 1.0)) @ factors + regularization * eye
+        b = factors.T @ confidence
+    else:
+        a = factors.T @ factors + regularization * len(values) * eye
+        b = factors.T @ values
+
+    return np.linalg.solve(a, b)
+
+
+class ALSSolver:
+    """Solves each ALS half-sweep over all rows in this process."""
+
+    def __init__(self, matrix, transposed, user_factors, item_factors):
+        self.matrix = matrix
+        self.transposed = transposed
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+
+    def solve_users(self, regularization, implicit=False, alpha=40.0):
+        solve_rows(self.matrix, self.item_factors, self.user_factors, 0, self.matrix.shape[0],
+                   regularization, implicit, alpha)
+
+    def solve_items(self, regularization, implicit=False, alpha=40.0):
+        solve_rows(self.transposed, self.user_factors, self.item_factors, 0, self.transposed.shape[0],
+                   regularization, implicit, alpha)
+
+    def result(self):
+        return self.user_factors, self.item_factors
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def train_als(matrix, factors=64, regularization=0.1, iterations=15, implicit=False,
+              alpha=40.0, seed=0, callback=None, workers=1):
+    """
+    Factorise a user x item CSR matrix into user and item factor matrices.
+
+    Returns (user_factors, item_factors, global_mean). For explicit feedback
+    ratings are centred on `global_mean` before fitting. With `workers` > 1
+    each half-sweep is split across that many processes; the factors are
+    the same as with one.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = matrix.tocsr().astype(np.float32)
+
+    global_mean = 0.0
+    if not implicit and matrix.nnz:
+        global_mean = float(matrix.data.mean())
+        matrix = matrix.copy()
+        matrix.data -= global_mean
+
+    n_users, n_items = matrix.shape
+    user_factors = (rng.standard_normal((n_users, factors)) * 0.01).astype(np.float32)
+    item_factors = (rng.standard_normal((n_items, factors)) * 0.01).astype(np.float32)
+    transposed = matrix.T.tocsr()
+
+    if workers > 1:
+        from .parallel import ParallelALS
+        solver = ParallelALS(matrix, transposed, user_factors, item_factors, workers)
+    else:
+        solver = ALSSolver(matrix, transposed, user_factors, item_factors)
+
+    with solver:
+        for iteration in range(iterations):
+            started = time.perf_counter()
+            solver.solve_users(regularization, implicit, alpha)
+            solver.solve_items(regularization, implicit, alpha)
+            if callback is not None:
+                callback(iteration, time.perf_counter() - started)
+        user_factors, item_factors = solver.result()
+
+    return user_factors, item_factors, global_mean
+
+
+def save_factors(ratings, user_factors, item_factors, index=None, **params):
+    """
+    Publish a trained model as a new version of the 'als' artifact and
+    return its path. `index` is an optional IVFIndex over the item factors
+    whose ids are item column numbers.
+    """
+    matrix = ratings.matrix.tocsr()
+    with ArtifactWriter(ARTIFACT_NAME) as writer:
+        np.save(writer.path / 'user_ids.npy', np.asarray(ratings.user_ids, dtype=str))
+        np.save(writer.path / 'movie_ids.npy', np.asarray(ratings.movie_ids, dtype=np.int64))
+        np.save(writer.path / 'user_factors.npy', np.ascontiguousarray(user_factors, dtype=np.float32))
+        np.save(writer.path / 'item_factors.npy', np.ascontiguousarray(item_factors, dtype=np.float32))
+        np.save(writer.path / 'seen_indptr.npy', matrix.indptr.astype(np.int64))
+        np.save(writer.path / 'seen_indices.npy', matrix.indices.astype(np.int32))
+        if index is not None:
+            index.save(writer.path)
+            writer.manifest['ann_lists'] = index.n_lists
+        writer.manifest.update(params)
+        writer.manifest.update({
+            'users': int(matrix.shape[0]),
+            'items': int(matrix.shape[1]),
+            'ratings': int(matrix.nnz),
+            'factors': int(item_factors.shape[1]),
+        })
+    return writer.published_path
+
+
+class FactorModel:
+    """
+    Read-only view of a trained ALS artifact.
+
+    Every array is opened with np.load(mmap_mode='r'), i.e. as an np.memmap,
+    so all gunicorn workers share one page-cache copy of the factors and
+    nothing is read from the database at serving time. When the artifact
+    carries an IVF index, top-k queries only visit `nprobe` cells instead
+    of scoring the whole catalog.
+
+    Users whose ratings changed after training are folded in: their factor
+    vector is re-solved against the fixed item factors and kept in memory
+    until the next artifact is published.
+    """
+
+    ARRAYS = ('user_ids', 'movie_ids', 'user_factors', 'item_factors', 'seen_indptr', 'seen_indices')
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = read_manifest(self.path)
+        self.version = self.manifest['version']
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(self.path / f'{name}.npy', mmap_mode='r'))
+        self.index = IVFIndex.load(self.path) if IVFIndex.exists(self.path) else None
+        self._item_gram = None
+        # user_id -> (factor vector, rated item indices) for folded-in users
+        self.overrides = {}
+
+    @property
+    def n_items(self):
+        return len(self.movie_ids)
+
+    def user_index(self, user_id):
+        """Binary-search the sorted user IDs; None if the user is unknown."""
+        user_id = str(user_id)
+        i = int(np.searchsorted(self.user_ids, user_id))
+        if i < len(self.user_ids) and self.user_ids[i] == user_id:
+            return i
+        return None
+
+    def seen_items(self, row):
+        return self.seen_indices[self.seen_indptr[row]:self.seen_indptr[row + 1]]
+
+    def user_state(self, user_id):
+        """Return (factor vector, rated item indices) for a user, or None."""
+        override = self.overrides.get(str(user_id))
+        if override is not None:
+            return override
+        row = self.user_index(user_id)
+        if row is None:
+            return None
+        return self.user_factors[row], self.seen_items(row)
+
+    def score(self, vector):
+        """Score every item for a user vector: one matrix-vector product."""
+        return self.item_factors @ vector
+
+    def update_user(self, user_id, movie_ids, ratings):
+        """
+        Fold a user's current ratings into a fresh factor vector without
+        touching the item factors. Unknown movies are ignored.
+        """
+        if self.n_items == 0:
+            return
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        items = np.minimum(np.searchsorted(self.movie_ids, movie_ids), self.n_items - 1)
+        known = self.movie_ids[items] == movie_ids
+        items = items[known]
+        values = np.asarray(ratings, dtype=np.float64)[known]
+
+        if len(items) == 0:
+            self.overrides.pop(str(user_id), None)
+            return
+
+        implicit = self.manifest.get('implicit', False)
+        if implicit and self._item_gram is None:
+            factors = np.asarray(self.item_factors, dtype=np.float64)
+            self._item_gram = factors.T @ factors
+        if not implicit:
+            values = values - self.manifest.get('global_mean', 0.0)
+
+        vector = solve_one(
+            self.item_factors[items], values,
+            self.manifest.get('regularization', 0.1),
+            implicit=implicit,
+            alpha=self.manifest.get('alpha', 40.0),
+            gram=self._item_gram,
+        )
+        self.overrides[str(user_id)] = (vector.astype(np.float32), items)
+
+    def item_index(self, movie_id):
+        i = int(np.searchsorted(self.movie_ids, int(movie_id)))
+        if i < len(self.movie_ids) and self.movie_ids[i] == int(movie_id):
+            return i
+        return None
+
+    def score_movies(self, user_id, movie_ids):
+        """Score the given movies for a user; unknown movies score 0."""
+        state = self.user_state(user_id)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if state is None or self.n_items == 0:
+            return np.zeros(len(movie_ids))
+        items = np.minimum(np.searchsorted(self.movie_ids, movie_ids), self.n_items - 1)
+        known = self.movie_ids[items] == movie_ids
+        scores = np.asarray(self.item_factors[items]) @ state[0]
+        return np.where(known, scores, 0.0)
+
+    def recommend(self, user_id, n=10, nprobe=8):
+        """
+        Return up to n ranked movie IDs, or None if the user was not part of
+        the training data.
+        """
+        state = self.user_state(user_id)
+        if state is None:
+            return None
+        vector, seen = state
+
+        if self.index is not None:
+            ranked, _ = self.index.search(vector, n, nprobe=nprobe, exclude=seen)
+        else:
+            scores = self.score(vector)
+            scores[seen] = -np.inf
+            ranked = [i for i in top_k(scores, n) if np.isfinite(scores[i])]
+        return self.movie_ids[ranked].tolist()
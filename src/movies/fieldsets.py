@@ -0,0 +1,56 @@
+# Fields a movie payload may carry, and the Movie columns each one reads
+MOVIE_FIELDS = {
+    'id': ('id',),
+    'title': ('title',),
+    'genre': ('genre',),
+    'poster_url': ('poster_url',),
+    'release_date': ('release_date',),
+    'description': ('description',),
+    'average_rating': ('rating_sum', 'rating_count'),
+    'rating_count': ('rating_count',),
+}
+
+# What a grid cell shows; the default for list endpoints
+CARD_FIELDS = ('id', 'title', 'genre', 'poster_url')
+
+PRESETS = {
+    'card': CARD_FIELDS,
+    'full': tuple(MOVIE_FIELDS),
+}
+
+
+def parse_fields(value, default=CARD_FIELDS):
+    """
+    Field names from a ?fields= value: a comma-separated list, or a preset
+    ('card', 'full'). 'id' is always included. ValueError on unknown names.
+    """
+    if not value:
+        return tuple(default)
+    names = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        expanded = PRESETS.get(name, (name,))
+        for field in expanded:
+            if field not in MOVIE_FIELDS:
+                raise ValueError(f"Unknown field '{field}'; choose from: {', '.join(MOVIE_FIELDS)}")
+            if field not in names:
+                names.append(field)
+    if 'id' not in names:
+        names.insert(0, 'id')
+    return tuple(names)
+
+
+def movie_columns(fields, prefix=''):
+    """Movie columns to pass to .only() for these fields, e.g. prefix 'movie__'."""
+    columns = []
+    for field in fields:
+        for column in MOVIE_FIELDS[field]:
+            if column not in columns:
+                columns.append(column)
+    return [prefix + column for column in columns]
+
+
+def serialize_movie(movie, fields):
+    return {field: getattr(movie, field) for field in fields}
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Candidates, by shared trigrams, whose edit distance is actually computed
+MAX_CANDIDATES = 64
+
+
+def max_edits(word):
+    """Typos tolerated in a word of this length."""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def trigrams(word):
+    """Distinct character trigrams of a word padded like '  word ', so starts count double."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Levenshtein distance between `a` and `b`, or `limit` + 1 once it is
+    certain to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """
+    Typo correction over a vocabulary.
+
+    Terms are posted under each of their trigrams. A misspelt word first
+    collects the terms sharing the most trigrams with it (an edit changes
+    at most three), and only those few get a bounded edit distance, so
+    the cost follows the word's trigram postings rather than the
+    vocabulary size.
+    """
+
+    def __init__(self, terms, weights=None):
+        self.terms = list(terms)
+        self.lengths = np.array([len(term) for term in self.terms], dtype=np.int32)
+        self.weights = np.ones(len(self.terms)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+        postings = {}
+        for t, term in enumerate(self.terms):
+            for gram in trigrams(term):
+                postings.setdefault(gram, []).append(t)
+        self.gram_index = {gram: i for i, gram in enumerate(postings)}
+        sizes = [len(terms) for terms in postings.values()]
+        self.gram_ptr = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.gram_terms = np.fromiter(
+            (t for terms in postings.values() for t in terms), dtype=np.int32, count=int(sum(sizes))
+        )
+
+    def candidates(self, word, limit):
+        """Term rows sharing enough trigrams with `word` to be within `limit` edits."""
+        grams = [self.gram_index[gram] for gram in trigrams(word) if gram in self.gram_index]
+        if not grams:
+            return np.zeros(0, dtype=np.int32)
+        rows = np.concatenate([self.gram_terms[self.gram_ptr[g]:self.gram_ptr[g + 1]] for g in grams])
+        rows, shared = np.unique(rows, return_counts=True)
+
+        keep = (shared >= len(trigrams(word)) - 3 * limit) & (np.abs(self.lengths[rows] - len(word)) <= limit)
+        rows, shared = rows[keep], shared[keep]
+        if len(rows) > MAX_CANDIDATES:
+            top = np.argpartition(-shared, MAX_CANDIDATES - 1)[:MAX_CANDIDATES]
+            rows = rows[top]
+        return rows
+
+    def correct(self, word):
+        """
+        The closest term within max_edits(word), ties going to the
+        heaviest; None when there is none.
+        """
+        limit = max_edits(word)
+        if not limit:
+            return None
+        best = None
+        for row in self.candidates(word, limit):
+            distance = edit_distance(word, self.terms[row], limit)
+            if distance <= limit:
+                key = (distance, -self.weights[row], self.terms[row])
+                if best is None or key < best:
+                    best = key
+        return best[2] if best else None
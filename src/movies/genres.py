@@ -0,0 +1,90 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count
+
+from .versions import MOVIES, bump
+
+
+def genre_key(name):
+    """The Genre.key a name is stored and looked up under."""
+    return (name or '').strip().lower()
+
+
+def split_genres(genre):
+    """Distinct genre names in a comma-joined string, as written, in order."""
+    names = {}
+    for name in (genre or '').split(','):
+        if name.strip():
+            names.setdefault(genre_key(name), name.strip())
+    return list(names.values())
+
+
+def find_genre(name):
+    """The Genre called `name`, ignoring case, or None."""
+    Genre = apps.get_model('movies', 'Genre')
+    return Genre.objects.filter(key=genre_key(name)).first()
+
+
+def _genre_ids(names):
+    """Genre IDs keyed by Genre.key, creating genres seen for the first time."""
+    Genre = apps.get_model('movies', 'Genre')
+
+    wanted = {genre_key(name): name for name in names}
+    existing = dict(Genre.objects.filter(key__in=wanted).values_list('key', 'id'))
+    missing = [Genre(name=name, key=key) for key, name in wanted.items() if key not in existing]
+    if missing:
+        Genre.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = dict(Genre.objects.filter(key__in=wanted).values_list('key', 'id'))
+    return existing
+
+
+def sync_movie_genres(movies):
+    """
+    Rewrite the MovieGenre links of the given (movie ID, genre string)
+    pairs, e.g. after a movie is saved. Returns the number of links.
+    """
+    MovieGenre = apps.get_model('movies', 'MovieGenre')
+
+    movies = [(movie_id, split_genres(genre)) for movie_id, genre in movies]
+    genre_ids = _genre_ids({name for _, names in movies for name in names})
+    links = [
+        MovieGenre(movie_id=movie_id, genre_id=genre_ids[genre_key(name)])
+        for movie_id, names in movies for name in names
+    ]
+    with transaction.atomic():
+        MovieGenre.objects.filter(movie_id__in=[movie_id for movie_id, _ in movies]).delete()
+        MovieGenre.objects.bulk_create(links, batch_size=5000)
+    return len(links)
+
+
+def rebuild_movie_genres(chunk_size=5000):
+    """Relink every movie, e.g. after bulk imports that bypass the signals."""
+    Movie = apps.get_model('movies', 'Movie')
+
+    linked = 0
+    rows = Movie.objects.order_by('id').values_list('id', 'genre')
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            linked += sync_movie_genres(chunk)
+            chunk = []
+    if chunk:
+        linked += sync_movie_genres(chunk)
+    # Run after bulk imports, which skip the Movie signals
+    bump()
+    bump(MOVIES)
+    return linked
+
+
+def genre_counts():
+    """[(name, movie count)] for every genre with movies, by name, in one aggregate query."""
+    Genre = apps.get_model('movies', 'Genre')
+    genres = Genre.objects.annotate(movie_count=Count('movie_links')).filter(movie_count__gt=0)
+    return list(genres.order_by('name').values_list('name', 'movie_count'))
+
+
+def movies_in_genre(genre):
+    """Movies linked to a Genre, through the (genre, movie) index."""
+    Movie = apps.get_model('movies', 'Movie')
+    return Movie.objects.filter(genre_links__genre=genre)
@@ -0,0 +1,112 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import _increment
+
+# Rating changes are logged in the shared cache as a numbered sequence of
+# user IDs, so every worker (not just the one that took the write) can fold
+# them into its models
+LOG_SEQUENCE_KEY = 'ratings:log'
+
+
+def _entry_key(position):
+    return f'ratings:log:{position}'
+
+
+def log_position():
+    """Sequence number of the newest logged rating change (0 before any)."""
+    value = cache.get(LOG_SEQUENCE_KEY)
+    return int(value) if value is not None else 0
+
+
+def log_rating_change(user_id):
+    position = _increment(LOG_SEQUENCE_KEY)
+    # Workers rebuild at least every RECOMMENDER_MODEL_TTL seconds, so
+    # older entries are never needed
+    cache.set(_entry_key(position), str(user_id), timeout=getattr(settings, 'RECOMMENDER_MODEL_TTL', 3600))
+
+
+def rating_changed(user_id):
+    """Log a user's rating change once the current transaction commits."""
+    if user_id is None:
+        return
+    transaction.on_commit(lambda: log_rating_change(user_id))
+
+
+class RatingLogReader:
+    """
+    One model's position in the rating change log.
+
+    Create it before the model reads the database, so changes committed
+    while it is being built are applied again (updates are idempotent).
+    """
+
+    def __init__(self, position=None):
+        self.position = log_position() if position is None else position
+        self._gap = None
+
+    def read(self, newest):
+        """
+        Return the users whose ratings changed up to log position `newest`,
+        or None if some entries were evicted before this reader saw them and
+        the model needs a full rebuild.
+        """
+        if newest <= self.position:
+            return set()
+
+        keys = [_entry_key(position) for position in range(self.position + 1, newest + 1)]
+        entries = cache.get_many(keys)
+        users = set()
+        for key in keys:
+            if key not in entries:
+                break
+            users.add(entries[key])
+            self.position += 1
+
+        if self.position < newest:
+            # A writer may have taken a number without storing its entry
+            # yet; only once the same entry is still missing on the next
+            # read has it been lost
+            if self._gap == self.position + 1:
+                self.position = newest
+                self._gap = None
+                return None
+            self._gap = self.position + 1
+        else:
+            self._gap = None
+        return users
+
+
+def current_user_ratings(user_id):
+    """Return ([movie_id, ...], [rating, ...]) for a user in one query."""
+    Rating = apps.get_model('movies', 'Rating')
+    rows = list(Rating.objects.filter(user_id=user_id).values_list('movie_id', 'rating'))
+    return [movie_id for movie_id, _ in rows], [rating for _, rating in rows]
+
+
+def apply_logged_updates(models):
+    """
+    Fold the logged rating changes each model has not seen yet into it. Each
+    model must provide update_user(user_id, movie_ids, ratings) and a
+    `rating_log` RatingLogReader; None entries are skipped. Returns the
+    models whose reader lost entries, which only a rebuild can bring up to
+    date.
+    """
+    models = [model for model in models if model is not None]
+    newest = log_position()
+    ratings = {}
+    stale = []
+    for model in models:
+        if model.rating_log.position >= newest:
+            continue
+        users = model.rating_log.read(newest)
+        if users is None:
+            stale.append(model)
+            continue
+        for user_id in users:
+            if user_id not in ratings:
+                ratings[user_id] = current_user_ratings(user_id)
+            model.update_user(user_id, *ratings[user_id])
+    return stale
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.artifacts import current_version, list_versions, read_manifest, set_current
+from movies.cache import bump_generation
+
+
+class Command(BaseCommand):
+    help = 'List the versions of a model artifact, or point workers at one of them (e.g. to roll back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Artifact name, e.g. 'als' or 'content'")
+        parser.add_argument('version', nargs='?', help='Version to make current; omit to list versions')
+
+    def handle(self, *args, **options):
+        name, version = options['name'], options['version']
+        if version:
+            try:
+                set_current(name, version)
+            except ValueError as e:
+                raise CommandError(str(e))
+            # Cached lists were scored with the version being replaced
+            bump_generation()
+            self.stdout.write(self.style.SUCCESS(f'✅ {name} now serves version {version}'))
+            return
+
+        versions = list_versions(name)
+        if not versions:
+            raise CommandError(f'No published versions of {name}')
+        current = current_version(name)
+        for published in versions:
+            manifest = read_manifest(current.parent / published)
+            marker = '*' if published == current.name else ' '
+            details = ', '.join(f'{key}={value}' for key, value in manifest.items()
+                                if key not in ('name', 'version', 'created_at'))
+            self.stdout.write(f'{marker} {published}  {details}')
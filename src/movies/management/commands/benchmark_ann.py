@@ -0,0 +1,103 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.ann import IVFIndex, brute_force_search
+from movies.artifacts import current_version
+from movies.factorization import ARTIFACT_NAME, FactorModel
+
+
+class Command(BaseCommand):
+    help = 'Measure IVF index recall and latency against brute-force top-K search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Benchmark N random clustered vectors instead of the trained item factors')
+        parser.add_argument('--dim', type=int, default=64, help='Dimensionality of synthetic vectors')
+        parser.add_argument('--lists', type=int, default=0, help='IVF cells (0 = sqrt(N))')
+        parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                            help='nprobe values to sweep')
+        parser.add_argument('--queries', type=int, default=200, help='Number of queries')
+        parser.add_argument('-k', type=int, default=10, help='Neighbours per query')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        vectors, queries = self._load_vectors(options, rng)
+        k = options['k']
+
+        started = time.perf_counter()
+        index = IVFIndex.build(vectors, n_lists=options['lists'] or None, seed=options['seed'])
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(f'{len(vectors)} vectors x {vectors.shape[1]} dims, '
+                          f'{index.n_lists} lists, built in {build_seconds:.2f}s')
+
+        exact, brute_latencies = [], []
+        for query in queries:
+            started = time.perf_counter()
+            ids, _ = brute_force_search(vectors, query, k)
+            brute_latencies.append(time.perf_counter() - started)
+            exact.append(set(ids.tolist()))
+
+        results = {
+            'vectors': int(len(vectors)),
+            'dim': int(vectors.shape[1]),
+            'lists': int(index.n_lists),
+            'k': k,
+            'build_seconds': round(build_seconds, 4),
+            'brute_force': self._latency_summary(brute_latencies),
+            'ivf': [],
+        }
+        self.stdout.write(f'brute force: p50 {results["brute_force"]["p50_ms"]:.3f}ms  '
+                          f'p95 {results["brute_force"]["p95_ms"]:.3f}ms')
+
+        for nprobe in options['nprobe']:
+            latencies, hits = [], 0
+            for query, truth in zip(queries, exact):
+                started = time.perf_counter()
+                ids, _ = index.search(query, k, nprobe=nprobe)
+                latencies.append(time.perf_counter() - started)
+                hits += len(truth.intersection(ids.tolist()))
+
+            row = {'nprobe': nprobe, 'recall': round(hits / (k * len(queries)), 4)}
+            row.update(self._latency_summary(latencies))
+            results['ivf'].append(row)
+            self.stdout.write(f'nprobe {nprobe:>4}: recall@{k} {row["recall"]:.3f}  '
+                              f'p50 {row["p50_ms"]:.3f}ms  p95 {row["p95_ms"]:.3f}ms')
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'✅ Results written to {options["json_path"]}'))
+
+    def _load_vectors(self, options, rng):
+        n_queries = options['queries']
+        if options['synthetic']:
+            # Gaussian blobs give the index realistic structure to exploit
+            n, dim = options['synthetic'], options['dim']
+            centres = rng.standard_normal((max(1, int(np.sqrt(n))), dim)).astype(np.float32)
+            vectors = centres[rng.integers(0, len(centres), n)]
+            vectors += 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+            queries = centres[rng.integers(0, len(centres), n_queries)]
+            queries += 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+            return vectors, queries
+
+        path = current_version(ARTIFACT_NAME)
+        if path is None:
+            raise CommandError('No trained ALS model found; run train_als or pass --synthetic N')
+        model = FactorModel(path)
+        vectors = np.asarray(model.item_factors)
+        users = rng.choice(len(model.user_factors), min(n_queries, len(model.user_factors)), replace=False)
+        return vectors, np.asarray(model.user_factors[users])
+
+    @staticmethod
+    def _latency_summary(latencies):
+        millis = np.asarray(latencies) * 1000
+        return {
+            'p50_ms': round(float(np.percentile(millis, 50)), 4),
+            'p95_ms': round(float(np.percentile(millis, 95)), 4),
+            'p99_ms': round(float(np.percentile(millis, 99)), 4),
+        }
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.factorization import train_als
+from movies.matrix import RatingMatrix
+from movies.models import Movie
+from movies.similarity import item_gram
+from movies.synthetic import synthetic_ratings
+
+
+class Command(BaseCommand):
+    help = 'Measure how ALS training and the item similarity build scale with --workers processes'
+
+    def add_arguments(self, parser):
+        cpus = os.cpu_count() or 1
+        parser.add_argument('--workers', type=int, nargs='+',
+                            default=sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1))),
+                            help='Worker counts to compare; the first is the baseline')
+        parser.add_argument('--synthetic-users', type=int, default=0,
+                            help='Synthesize ratings for this many users instead of reading the Rating table')
+        parser.add_argument('--synthetic-ratings', type=int, default=1000000, help='Rating events to synthesize')
+        parser.add_argument('--movies', type=int, default=20000,
+                            help='Catalog size for synthetic ratings when the Movie table is empty')
+        parser.add_argument('--factors', type=int, default=64)
+        parser.add_argument('--iterations', type=int, default=3, help='ALS sweeps timed per run')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+
+    def handle(self, *args, **options):
+        ratings = self._load_ratings(options)
+        if ratings.nnz == 0:
+            raise CommandError('No ratings to train on; pass --synthetic-users N')
+        n_users, n_items = ratings.shape
+        self.stdout.write(f'{ratings.nnz} ratings ({n_users} users x {n_items} movies), '
+                          f'{os.cpu_count()} CPUs')
+
+        results = {
+            'ratings': int(ratings.nnz),
+            'users': int(n_users),
+            'movies': int(n_items),
+            'cpus': os.cpu_count(),
+            'factors': options['factors'],
+            'iterations': options['iterations'],
+            'runs': [],
+        }
+        baseline = None
+        for workers in options['workers']:
+            started = time.perf_counter()
+            user_factors, item_factors, _ = train_als(
+                ratings.matrix, factors=options['factors'], iterations=options['iterations'],
+                seed=options['seed'], workers=workers,
+            )
+            als_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            gram = item_gram(ratings.matrix, workers)
+            gram_seconds = time.perf_counter() - started
+
+            if baseline is None:
+                baseline = {'workers': workers, 'als': als_seconds, 'gram': gram_seconds,
+                            'item_factors': item_factors, 'gram_matrix': gram}
+            # Blocks are solved independently and merged in order, so every
+            # worker count must reproduce the baseline exactly
+            identical = (
+                np.array_equal(item_factors, baseline['item_factors'])
+                and (gram != baseline['gram_matrix']).nnz == 0
+            )
+            scale = workers / baseline['workers']
+            row = {
+                'workers': workers,
+                'als_seconds': round(als_seconds, 3),
+                'als_speedup': round(baseline['als'] / als_seconds, 2),
+                'als_efficiency': round(baseline['als'] / als_seconds / scale, 2),
+                'gram_seconds': round(gram_seconds, 3),
+                'gram_speedup': round(baseline['gram'] / gram_seconds, 2),
+                'gram_efficiency': round(baseline['gram'] / gram_seconds / scale, 2),
+                'identical': bool(identical),
+            }
+            results['runs'].append(row)
+            self.stdout.write(
+                f'{workers:>3} workers: ALS {row["als_seconds"]:.2f}s (x{row["als_speedup"]:.2f}, '
+                f'{row["als_efficiency"]:.0%} efficient)  Gram {row["gram_seconds"]:.2f}s '
+                f'(x{row["gram_speedup"]:.2f}, {row["gram_efficiency"]:.0%} efficient)  '
+                f'{"identical" if identical else "DIFFERS from baseline"}'
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'✅ Results written to {options["json_path"]}'))
+
+    def _load_ratings(self, options):
+        if not options['synthetic_users']:
+            return RatingMatrix.from_db()
+        catalog = list(Movie.objects.values_list('id', 'genre'))
+        if not catalog:
+            catalog = [(i, '') for i in range(1, options['movies'] + 1)]
+        users, movies, ratings, _ = synthetic_ratings(
+            [movie_id for movie_id, _ in catalog], [genre for _, genre in catalog],
+            options['synthetic_users'], options['synthetic_ratings'], seed=options['seed'],
+        )
+        return RatingMatrix.from_triples(users.astype(str), movies, ratings)
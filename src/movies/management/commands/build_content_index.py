@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.artifacts import prune_versions
+from movies.cache import bump_generation
+from movies.content import ARTIFACT_NAME, update_content_index
+
+
+class Command(BaseCommand):
+    help = 'Fit or extend the TF-IDF content model over movie titles, genres and descriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Refit every movie instead of only those saved since the last version')
+        parser.add_argument('--keep', type=int, default=3, help='Number of artifact versions to keep')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        path, added = update_content_index(full=options['full'])
+        prune_versions(ARTIFACT_NAME, keep=options['keep'])
+
+        if added:
+            bump_generation()
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Re-indexed {added} changed movies in {time.perf_counter() - started:.1f}s, saved to {path}'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(f'ℹ️ No movies changed, content model at {path} is current'))
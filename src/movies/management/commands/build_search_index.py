@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.artifacts import prune_versions
+from movies.search import ARTIFACT_NAME, update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Build or extend the BM25 search index snapshot that workers load at startup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-tokenise every movie instead of only those saved since the last snapshot')
+        parser.add_argument('--keep', type=int, default=3, help='Number of snapshot versions to keep')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        path, added = update_search_index(full=options['full'])
+        prune_versions(ARTIFACT_NAME, keep=options['keep'])
+        if added:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Re-indexed {added} changed movies in {time.perf_counter() - started:.1f}s, saved to {path}'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(f'ℹ️ No movies changed, search index at {path} is current'))
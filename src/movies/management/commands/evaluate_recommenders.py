@@ -0,0 +1,147 @@
+import csv
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.evaluation import (
+    ALSRecommender, ContentRecommender, HybridRecommender, ItemItemRecommender,
+    PopularityRecommender, evaluate, fit_measured, temporal_split,
+)
+from movies.models import Movie, Rating
+from movies.synthetic import synthetic_ratings
+
+STRATEGIES = ['popularity', 'item_item', 'als', 'content', 'hybrid']
+
+
+class Command(BaseCommand):
+    help = 'Evaluate recommenders offline on a temporal train/test split (accuracy, coverage, latency, memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic-users', type=int, default=0,
+                            help='Synthesize ratings for this many users instead of reading the Rating table')
+        parser.add_argument('--synthetic-ratings', type=int, default=100000,
+                            help='Rating events to synthesize')
+        parser.add_argument('--test-fraction', type=float, default=0.2,
+                            help='Latest share of ratings held out for testing')
+        parser.add_argument('-k', type=int, default=10, help='Recommendations scored per user')
+        parser.add_argument('--relevance', type=int, default=4,
+                            help='Minimum held-out rating that counts as a hit')
+        parser.add_argument('--max-users', type=int, default=1000,
+                            help='Evaluate a random sample of at most this many test users')
+        parser.add_argument('--strategies', nargs='+', choices=STRATEGIES, default=STRATEGIES)
+        parser.add_argument('--factors', type=int, default=64)
+        parser.add_argument('--iterations', type=int, default=15)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        catalog = self._load_catalog()
+        users, movies, ratings, timestamps, source = self._load_ratings(options, catalog)
+        if len(ratings) == 0:
+            raise CommandError('No ratings to evaluate; pass --synthetic-users N')
+
+        train, test, cutoff = temporal_split(users, movies, ratings, timestamps, options['test_fraction'])
+        k = options['k']
+
+        # Users who have history to learn from and liked something afterwards
+        liked = np.unique(test[0][test[2] >= options['relevance']])
+        eval_users = [user_id for user_id in liked.tolist() if train.user_index(user_id) is not None]
+        if len(eval_users) > options['max_users']:
+            eval_users = rng.choice(eval_users, options['max_users'], replace=False).tolist()
+
+        results = {
+            'dataset': {
+                'source': source,
+                'movies': len(catalog),
+                'users': int(len(np.unique(users))),
+                'ratings': int(len(ratings)),
+                'train_ratings': int(train.nnz),
+                'test_ratings': int(len(test[2])),
+                'cutoff': cutoff,
+            },
+            'k': k,
+            'relevance': options['relevance'],
+            'strategies': {},
+        }
+        self.stdout.write(f'{len(ratings)} ratings ({source}), {train.nnz} train / {len(test[2])} test, '
+                          f'{len(eval_users)} users evaluated')
+
+        recommenders = {
+            'popularity': PopularityRecommender(),
+            'item_item': ItemItemRecommender(),
+            'als': ALSRecommender(options['factors'], options['iterations'], seed=options['seed']),
+            'content': ContentRecommender(catalog),
+        }
+        fitted = {}
+        for name in options['strategies']:
+            if name == 'hybrid':
+                recommender, build_seconds, peak = self._hybrid(fitted, results['strategies'])
+            else:
+                recommender = recommenders[name]
+                build_seconds, peak = fit_measured(recommender, train)
+                fitted[name] = recommender
+
+            row = evaluate(recommender, train, test, eval_users, k, options['relevance'], len(catalog))
+            row['build_seconds'] = round(build_seconds, 4)
+            row['peak_memory_mb'] = round(peak / 2 ** 20, 2)
+            results['strategies'][name] = row
+            self.stdout.write(
+                f'{name:>10}: P@{k} {row[f"precision@{k}"]:.4f}  R@{k} {row[f"recall@{k}"]:.4f}  '
+                f'NDCG {row[f"ndcg@{k}"]:.4f}  coverage {row["coverage"]:.3f}  '
+                f'p50 {row["p50_ms"]:.2f}ms  p99 {row["p99_ms"]:.2f}ms  '
+                f'build {row["build_seconds"]:.2f}s  peak {row["peak_memory_mb"]:.1f}MB'
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'✅ Results written to {options["json_path"]}'))
+
+    def _hybrid(self, fitted, measured):
+        """Blend the fitted strategies with the serving weights."""
+        weights = getattr(settings, 'RECOMMENDER_STRATEGY_WEIGHTS', {})
+        collaborative = 'als' if 'als' in fitted else 'item_item'
+        components = {
+            name: fitted[source]
+            for name, source in [('collaborative', collaborative), ('content', 'content'), ('popularity', 'popularity')]
+            if source in fitted
+        }
+        if not components:
+            raise CommandError('hybrid needs at least one other strategy evaluated before it')
+        sources = [collaborative if name == 'collaborative' else name for name in components]
+        build_seconds = sum(measured[source]['build_seconds'] for source in sources)
+        peak = max(measured[source]['peak_memory_mb'] for source in sources) * 2 ** 20
+        return HybridRecommender(components, weights), build_seconds, peak
+
+    def _load_catalog(self):
+        """(id, title, genre, description) for every movie, from the database or the CSV."""
+        catalog = list(Movie.objects.values_list('id', 'title', 'genre', 'description'))
+        if catalog:
+            return catalog
+        try:
+            with open('Movies_dataset.csv', newline='', encoding='utf-8') as csvfile:
+                rows = list(csv.DictReader(csvfile))
+        except FileNotFoundError:
+            raise CommandError('No movies in the database and no Movies_dataset.csv; run load_movies first')
+        return [(i, row['Movie_title'], row['genres'], row['Logline']) for i, row in enumerate(rows, start=1)]
+
+    def _load_ratings(self, options, catalog):
+        if options['synthetic_users']:
+            movie_ids = [movie[0] for movie in catalog]
+            genres = [movie[2] for movie in catalog]
+            users, movies, ratings, seconds = synthetic_ratings(
+                movie_ids, genres, options['synthetic_users'], options['synthetic_ratings'], seed=options['seed']
+            )
+            return users.astype(str), movies, ratings, seconds, 'synthetic'
+
+        users, movies, ratings, timestamps = [], [], [], []
+        rows = Rating.objects.exclude(user_id=None).values_list('user_id', 'movie_id', 'rating', 'created_at')
+        for user_id, movie_id, rating, created_at in rows.iterator(chunk_size=20000):
+            users.append(user_id)
+            movies.append(movie_id)
+            ratings.append(rating)
+            timestamps.append(created_at.timestamp())
+        return np.asarray(users, dtype=object), np.asarray(movies), np.asarray(ratings), np.asarray(timestamps), 'database'
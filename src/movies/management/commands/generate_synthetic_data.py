@@ -0,0 +1,192 @@
+import io
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from movies.content import update_content_index
+from movies.genres import rebuild_movie_genres
+from movies.models import Movie, Rating, Watchlist
+from movies.popularity import rebuild_popularity
+from movies.rating_stats import rebuild_rating_stats
+from movies.synthetic import synthetic_ratings, zipf_weights
+from movies.trending import rebuild_trending
+
+USER_PREFIX = 'synthetic-'
+
+GENRES = [
+    'Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family',
+    'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Science Fiction',
+    'Thriller', 'War', 'Western',
+]
+
+# Title and logline vocabulary; each genre adds its own words so the
+# content model sees genre-correlated text
+WORDS = [
+    'last', 'dark', 'silent', 'broken', 'golden', 'hidden', 'lost', 'final', 'wild', 'midnight',
+    'city', 'river', 'empire', 'kingdom', 'road', 'storm', 'shadow', 'heart', 'secret', 'dream',
+]
+GENRE_WORDS = {
+    'Action': ['mission', 'chase', 'explosive'], 'Adventure': ['quest', 'journey', 'treasure'],
+    'Animation': ['magical', 'talking', 'colourful'], 'Comedy': ['hilarious', 'misfit', 'prank'],
+    'Crime': ['heist', 'detective', 'gang'], 'Documentary': ['true', 'footage', 'interviews'],
+    'Drama': ['family', 'grief', 'struggle'], 'Family': ['kids', 'holiday', 'parents'],
+    'Fantasy': ['wizard', 'dragon', 'spell'], 'History': ['war', 'dynasty', 'revolution'],
+    'Horror': ['haunted', 'demon', 'terror'], 'Music': ['band', 'singer', 'concert'],
+    'Mystery': ['clue', 'murder', 'vanished'], 'Romance': ['love', 'wedding', 'affair'],
+    'Science Fiction': ['alien', 'robot', 'galaxy'], 'Thriller': ['hostage', 'conspiracy', 'killer'],
+    'War': ['soldier', 'battle', 'frontline'], 'Western': ['sheriff', 'outlaw', 'frontier'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic movies, users, ratings and watchlists with long-tail popularity for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=0, help='Synthetic movies to add to the catalog')
+        parser.add_argument('--users', type=int, default=10000, help='Synthetic users')
+        parser.add_argument('--ratings', type=int, default=100000, help='Ratings to generate')
+        parser.add_argument('--watchlist', type=int, default=10000, help='Watchlist rows to generate')
+        parser.add_argument('--days', type=int, default=365, help='Spread rating times over this many days')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows written per INSERT/COPY batch')
+        parser.add_argument('--no-copy', action='store_true', help='Use batched INSERTs even on PostgreSQL')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete ratings and watchlists from earlier synthetic runs first')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rng = np.random.default_rng(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+
+        synthetic = Rating.objects.filter(user_id__startswith=USER_PREFIX)
+        if options['clear']:
+            synthetic.delete()
+            Watchlist.objects.filter(user_id__startswith=USER_PREFIX).delete()
+        elif synthetic.exists():
+            raise CommandError('Synthetic ratings already exist; pass --clear to replace them')
+
+        if options['movies']:
+            self._create_movies(options['movies'], rng)
+        catalog = list(Movie.objects.order_by('id').values_list('id', 'genre'))
+        if not catalog:
+            raise CommandError('No movies; run load_movies or pass --movies N')
+        movie_ids = np.array([movie_id for movie_id, _ in catalog], dtype=np.int64)
+        user_names = np.array([f'{USER_PREFIX}{i:07d}' for i in range(options['users'])], dtype=object)
+
+        step = time.perf_counter()
+        users, movies, ratings, seconds = synthetic_ratings(
+            movie_ids, [genre for _, genre in catalog], options['users'], options['ratings'],
+            seed=options['seed'], days=options['days'],
+        )
+        self.stdout.write(f'Generated {len(ratings)} ratings in {time.perf_counter() - step:.1f}s')
+
+        step = time.perf_counter()
+        start = timezone.now() - timedelta(days=options['days'])
+        # Raw rows skip auto_now, so updated_at is written as the rating time
+        self._insert(Rating, ['user_id', 'movie_id', 'rating', 'created_at', 'updated_at'], len(ratings),
+                     lambda s, e: (
+                         (user, movie, rating, stamp, stamp) for user, movie, rating, stamp in zip(
+                             user_names[users[s:e]].tolist(), movies[s:e].tolist(), ratings[s:e].tolist(),
+                             self._timestamps(start, seconds[s:e]),
+                         )
+                     ))
+        self.stdout.write(f'Wrote {len(ratings)} ratings in {time.perf_counter() - step:.1f}s')
+
+        step = time.perf_counter()
+        watch_users, watch_movies = self._watchlist(options['users'], movie_ids, options['watchlist'], rng)
+        added_at = self._timestamps(start, rng.random(len(watch_users)) * options['days'] * 86400)
+        self._insert(Watchlist, ['user_id', 'movie_id', 'added_at'], len(watch_users), lambda s, e: zip(
+            user_names[watch_users[s:e]].tolist(), watch_movies[s:e].tolist(), added_at[s:e],
+        ))
+        self.stdout.write(f'Wrote {len(watch_users)} watchlist rows in {time.perf_counter() - step:.1f}s')
+
+        # Bulk writes bypass the signals that keep rating aggregates,
+        # popularity and trending current
+        step = time.perf_counter()
+        rebuild_rating_stats()
+        self.stdout.write(f'Rebuilt rating aggregates in {time.perf_counter() - step:.1f}s')
+        step = time.perf_counter()
+        rebuild_popularity()
+        self.stdout.write(f'Rebuilt popularity in {time.perf_counter() - step:.1f}s')
+        step = time.perf_counter()
+        rebuild_trending()
+        self.stdout.write(f'Rebuilt trending in {time.perf_counter() - step:.1f}s')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(catalog)} movies, {options["users"]} users, {len(ratings)} ratings, '
+            f'{len(watch_users)} watchlist rows in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _create_movies(self, n, rng):
+        step = time.perf_counter()
+        epoch = np.datetime64('1950-01-01')
+        for start in range(0, n, self.chunk_size):
+            size = min(self.chunk_size, n - start)
+            days = rng.integers(0, 75 * 365, size)
+            movies = []
+            for i in range(size):
+                genres = list(rng.choice(GENRES, size=rng.integers(1, 4), replace=False))
+                words = WORDS + [word for genre in genres for word in GENRE_WORDS[genre]]
+                title = ' '.join(rng.choice(WORDS, size=2)).title()
+                movies.append(Movie(
+                    title=f'{title} {start + i + 1}',
+                    genre=', '.join(genres),
+                    release_date=(epoch + days[i]).item(),
+                    poster_url='',
+                    description=' '.join(rng.choice(words, size=12)).capitalize() + '.',
+                ))
+            Movie.objects.bulk_create(movies, batch_size=2000)
+        self.stdout.write(f'Wrote {n} movies in {time.perf_counter() - step:.1f}s')
+
+        step = time.perf_counter()
+        linked = rebuild_movie_genres()
+        self.stdout.write(f'Linked {linked} movie genres in {time.perf_counter() - step:.1f}s')
+
+        step = time.perf_counter()
+        path, indexed = update_content_index()
+        self.stdout.write(f'Content model updated with {indexed} movies in {time.perf_counter() - step:.1f}s: {path}')
+
+    def _watchlist(self, n_users, movie_ids, n_rows, rng):
+        """Distinct (user index, movie ID) pairs, both drawn from long tails."""
+        if n_rows <= 0 or n_users <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        users = rng.choice(n_users, size=n_rows, p=zipf_weights(n_users, 0.9, rng))
+        items = rng.choice(len(movie_ids), size=n_rows, p=zipf_weights(len(movie_ids), 1.1, rng))
+        keys = np.sort(users.astype(np.int64) * len(movie_ids) + items)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        return keys // len(movie_ids), movie_ids[keys % len(movie_ids)]
+
+    @staticmethod
+    def _timestamps(start, seconds):
+        """UTC 'YYYY-MM-DD HH:MM:SS' strings, built in bulk with NumPy."""
+        base = np.datetime64(start.astimezone(dt_timezone.utc).replace(tzinfo=None), 's')
+        stamps = base + np.asarray(seconds).astype('timedelta64[s]')
+        return [stamp.replace('T', ' ') for stamp in np.datetime_as_string(stamps, unit='s').tolist()]
+
+    def _insert(self, model, fields, n_rows, chunk):
+        """
+        Write n_rows rows in chunks; chunk(start, stop) yields row tuples for
+        `fields`. Uses COPY on PostgreSQL, batched INSERTs elsewhere.
+        """
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = [model._meta.get_field(name).column for name in fields]
+        quoted = ', '.join(connection.ops.quote_name(column) for column in columns)
+
+        for start in range(0, n_rows, self.chunk_size):
+            rows = chunk(start, min(start + self.chunk_size, n_rows))
+            with transaction.atomic(), connection.cursor() as cursor:
+                if self.use_copy:
+                    buffer = io.StringIO()
+                    for row in rows:
+                        buffer.write('\t'.join(map(str, row)))
+                        buffer.write('\n')
+                    buffer.seek(0)
+                    cursor.cursor.copy_expert(f'COPY {table} ({quoted}) FROM STDIN', buffer)
+                else:
+                    placeholders = ', '.join(['%s'] * len(columns))
+                    cursor.executemany(f'INSERT INTO {table} ({quoted}) VALUES ({placeholders})', list(rows))
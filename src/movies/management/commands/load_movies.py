@@ -1,12 +1,15 @@
 import csv
 from datetime import datetime
 from django.core.management.base import BaseCommand
+from movies.content import update_content_index
+from movies.search import update_search_index
 from movies.models import Movie
 
 class Command(BaseCommand):
     help = 'Load movies from CSV file into the Movie model'
 
     def handle(self, *args, **kwargs):
+        added = 0
         with open('Movies_dataset.csv', newline='', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
 
@@ -35,6 +38,14 @@ class Command(BaseCommand):
                 )
 
                 if created:
+                    added += 1
                     self.stdout.write(self.style.SUCCESS(f"✅ Added: {title}"))
                 else:
                     self.stdout.write(self.style.WARNING(f"ℹ️ Already exists: {title}"))
+
+        # Tokenise only the new titles into the content model
+        if added:
+            path, indexed = update_content_index()
+            self.stdout.write(self.style.SUCCESS(f"✅ Content model updated with {indexed} movies: {path}"))
+            path, indexed = update_search_index()
+            self.stdout.write(self.style.SUCCESS(f"✅ Search index updated with {indexed} movies: {path}"))
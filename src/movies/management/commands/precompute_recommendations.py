@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from movies.artifacts import new_version_id
+from movies.cache import bump_generation
+from movies.models import Rating, UserRecommendation
+from movies.recommendation import get_factor_model, get_similarity_model, recommend_movie_ids
+
+
+class Command(BaseCommand):
+    help = 'Compute top-N recommendations for every active user into the UserRecommendation table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--num', type=int, default=20, help='Recommendations stored per user')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users written per transaction')
+        parser.add_argument('--active-days', type=int, default=0,
+                            help='Only users who rated within this many days (0 = everyone)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        version = new_version_id()
+        generated_at = timezone.now()
+
+        # Build fresh models so the run reflects every rating written so far
+        get_similarity_model(force=True)
+        get_factor_model()
+
+        users = Rating.objects.exclude(user_id=None)
+        if options['active_days']:
+            users = users.filter(created_at__gte=generated_at - timedelta(days=options['active_days']))
+        user_ids = list(users.order_by('user_id').values_list('user_id', flat=True).distinct())
+
+        written = 0
+        chunk_size = options['chunk_size']
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            rows = []
+            for user_id in chunk:
+                # Offline, so every strategy runs regardless of the serving budget
+                result = recommend_movie_ids(user_id, options['num'], budget_ms=float('inf'))
+                for rank, movie_id in enumerate(result.movie_ids, start=1):
+                    rows.append(UserRecommendation(
+                        user_id=user_id,
+                        movie_id=movie_id,
+                        rank=rank,
+                        version=version,
+                        generated_at=generated_at,
+                    ))
+
+            with transaction.atomic():
+                UserRecommendation.objects.filter(user_id__in=chunk).delete()
+                UserRecommendation.objects.bulk_create(rows, batch_size=5000)
+            written += len(rows)
+            self.stdout.write(f'  {min(start + chunk_size, len(user_ids))}/{len(user_ids)} users')
+
+        # Every active user now has rows from this run; anything older belongs
+        # to users who dropped out of the active set
+        UserRecommendation.objects.exclude(version=version).delete()
+        bump_generation()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Stored {written} recommendations for {len(user_ids)} users '
+            f'(version {version}) in {time.perf_counter() - started:.1f}s'
+        ))
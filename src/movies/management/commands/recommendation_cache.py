@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from movies.cache import bump_generation, cache_stats, is_shared, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show recommendation cache hit/miss counters, or invalidate every cached list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flush', action='store_true', help='Bump the generation, orphaning every entry')
+        parser.add_argument('--reset-stats', action='store_true', help='Zero the hit/miss counters')
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            self.stdout.write(self.style.WARNING(
+                'The cache backend is local to this process: these counters, and any flush, '
+                'do not reach the web server. Configure REDIS_URL or a file-based cache.'
+            ))
+        if options['flush']:
+            self.stdout.write(self.style.SUCCESS(f'✅ Cache generation is now {bump_generation()}'))
+        if options['reset_stats']:
+            reset_stats()
+
+        stats = cache_stats()
+        self.stdout.write(
+            f'generation {stats["generation"]}: {stats["hits"]} hits, {stats["misses"]} misses '
+            f'({stats["hit_rate"]:.1%} hit rate)'
+        )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.neighbours import NeighbourScorer, refresh_neighbours
+from movies.parallel import default_workers
+
+
+class Command(BaseCommand):
+    help = 'Refresh the precomputed "more like this" lists, rescoring only movies whose ratings changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rescore every movie instead of only changed ones')
+        parser.add_argument('-k', type=int, default=None,
+                            help='Neighbours stored per movie (default RECOMMENDER_SIMILAR_MOVIES)')
+        parser.add_argument('--chunk-size', type=int, default=256, help='Movies scored per batch')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes to build the rating similarity matrix with (0 = one per CPU)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scorer = NeighbourScorer.from_db(workers=options['workers'] or default_workers())
+        rescored, patched = refresh_neighbours(
+            k=options['k'], full=options['full'], chunk_size=options['chunk_size'], scorer=scorer,
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rescored {rescored} movies and patched {patched} other lists '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.trending import expire_trending, rebuild_trending
+
+
+class Command(BaseCommand):
+    help = 'Slide the trending window (run hourly), or rebuild trending buckets from rating and watchlist history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute every bucket from Rating.created_at and Watchlist.added_at')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT when rebuilding')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['rebuild']:
+            buckets, movies = rebuild_trending(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Rebuilt {buckets} hourly buckets for {movies} trending movies '
+                f'in {time.perf_counter() - started:.1f}s'
+            ))
+            return
+
+        deleted, rescored = expire_trending()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Expired {deleted} buckets and rescored {rescored} movies in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.ann import IVFIndex
+from movies.artifacts import prune_versions
+from movies.cache import bump_generation
+from movies.factorization import ARTIFACT_NAME, save_factors, train_als
+from movies.matrix import RatingMatrix
+from movies.parallel import default_workers
+
+
+class Command(BaseCommand):
+    help = 'Train ALS matrix-factorisation factors from the Rating table and publish them as an artifact'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=64, help='Latent dimensions')
+        parser.add_argument('--iterations', type=int, default=15, help='ALS sweeps')
+        parser.add_argument('--regularization', type=float, default=0.1, help='L2 penalty')
+        parser.add_argument('--implicit', action='store_true', help='Treat ratings as implicit confidence')
+        parser.add_argument('--alpha', type=float, default=40.0, help='Implicit confidence scaling')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for factor initialisation')
+        parser.add_argument('--ann-lists', type=int, default=0,
+                            help='IVF cells for the item index (0 = sqrt(items) once --ann-min-items is reached)')
+        parser.add_argument('--ann-min-items', type=int, default=10000,
+                            help='Build an ANN index automatically above this many movies')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes to split each ALS sweep across (0 = one per CPU)')
+        parser.add_argument('--keep', type=int, default=3, help='Number of artifact versions to keep')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        ratings = RatingMatrix.from_db()
+        n_users, n_items = ratings.shape
+
+        if ratings.nnz == 0:
+            self.stdout.write(self.style.WARNING('⚠️ No ratings found, nothing to train.'))
+            return
+
+        self.stdout.write(f'Loaded {ratings.nnz} ratings ({n_users} users x {n_items} movies) '
+                          f'in {time.perf_counter() - started:.1f}s')
+
+        def report(iteration, seconds):
+            self.stdout.write(f'  iteration {iteration + 1}/{options["iterations"]}: {seconds:.2f}s')
+
+        fit_started = time.perf_counter()
+        user_factors, item_factors, global_mean = train_als(
+            ratings.matrix,
+            factors=options['factors'],
+            regularization=options['regularization'],
+            iterations=options['iterations'],
+            implicit=options['implicit'],
+            alpha=options['alpha'],
+            seed=options['seed'],
+            callback=report,
+            workers=options['workers'] or default_workers(),
+        )
+        fit_seconds = time.perf_counter() - fit_started
+
+        index = None
+        if options['ann_lists'] or n_items >= options['ann_min_items']:
+            index_started = time.perf_counter()
+            index = IVFIndex.build(item_factors, n_lists=options['ann_lists'] or None, seed=options['seed'])
+            self.stdout.write(f'Built IVF index with {index.n_lists} lists in '
+                              f'{time.perf_counter() - index_started:.1f}s')
+
+        path = save_factors(
+            ratings, user_factors, item_factors,
+            index=index,
+            implicit=options['implicit'],
+            regularization=options['regularization'],
+            iterations=options['iterations'],
+            alpha=options['alpha'],
+            global_mean=global_mean,
+            train_seconds=round(fit_seconds, 3),
+        )
+        prune_versions(ARTIFACT_NAME, keep=options['keep'])
+        # Cached lists were scored with the previous factors
+        bump_generation()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Trained ALS model in {fit_seconds:.1f}s, saved to {path}'))
@@ -0,0 +1,91 @@
+import numpy as np
+import scipy.sparse as sp
+from django.apps import apps
+
+
+class RatingMatrix:
+    """
+    Sparse user x item view of the Rating table.
+
+    Rows are indexed by the sorted unique Clerk user IDs and columns by the
+    sorted unique movie IDs that have at least one rating.
+    """
+
+    def __init__(self, user_ids, movie_ids, matrix):
+        self.user_ids = user_ids
+        self.movie_ids = movie_ids
+        self.matrix = matrix
+        self._user_lookup = None
+
+    @classmethod
+    def from_triples(cls, users, movies, ratings):
+        """
+        Build the matrix from parallel arrays of (user_id, movie_id, rating).
+        """
+        users = np.asarray(users, dtype=object)
+        movies = np.asarray(movies, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float32)
+
+        user_ids, rows = np.unique(users.astype(str), return_inverse=True)
+        movie_ids, cols = np.unique(movies, return_inverse=True)
+
+        matrix = sp.csr_matrix(
+            (ratings, (rows, cols)),
+            shape=(len(user_ids), len(movie_ids)),
+            dtype=np.float32,
+        )
+        matrix.sum_duplicates()
+
+        return cls(user_ids.astype(object), movie_ids, matrix)
+
+    @classmethod
+    def from_db(cls, queryset=None, chunk_size=20000):
+        """
+        Load every rating in a single streaming query.
+        """
+        if queryset is None:
+            Rating = apps.get_model('movies', 'Rating')
+            queryset = Rating.objects.all()
+
+        users, movies, ratings = [], [], []
+        rows = queryset.exclude(user_id=None).values_list('user_id', 'movie_id', 'rating')
+        for user_id, movie_id, rating in rows.iterator(chunk_size=chunk_size):
+            users.append(user_id)
+            movies.append(movie_id)
+            ratings.append(rating)
+
+        return cls.from_triples(users, movies, ratings)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def nnz(self):
+        return self.matrix.nnz
+
+    def user_index(self, user_id):
+        """Return the row for a user, or None if they have no ratings."""
+        if self._user_lookup is None:
+            self._user_lookup = {uid: i for i, uid in enumerate(self.user_ids)}
+        return self._user_lookup.get(str(user_id))
+
+    def item_indices(self, movie_ids):
+        """
+        Map movie IDs to column indices. Unknown movies map to -1.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self.movie_ids) == 0:
+            return np.full(len(movie_ids), -1, dtype=np.int64)
+        idx = np.searchsorted(self.movie_ids, movie_ids)
+        idx = np.minimum(idx, len(self.movie_ids) - 1)
+        return np.where(self.movie_ids[idx] == movie_ids, idx, -1)
+
+    def user_row(self, row):
+        """Return (item indices, ratings) for a matrix row."""
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return self.matrix.indices[start:end], self.matrix.data[start:end]
+
+    def item_counts(self):
+        """Number of ratings per item column."""
+        return np.bincount(self.matrix.indices, minlength=self.matrix.shape[1])
@@ -1,4 +1,4 @@
-from django.db import migrations, models
+from django.db import migrations
 
 class Migration(migrations.Migration):
 
@@ -6,15 +6,8 @@ class Migration(migrations.Migration):
         ('movies', '0001_initial'),
     ]
 
-    operations = [
-        migrations.AddField(
-            model_name='rating',
-            name='user_email',
-            field=models.EmailField(max_length=254, blank=True, null=True),
-        ),
-        migrations.AddField(
-            model_name='rating',
-            name='user_name',
-            field=models.CharField(max_length=255, blank=True, null=True),
-        ),
-    ]
+    # user_email and user_name are already created by 0001_initial, which was
+    # regenerated after this migration was written; adding them again breaks
+    # every fresh database (including the test database). Databases that
+    # applied the old version already have both columns.
+    operations = []
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0003_watchlist_poster_url_watchlist_title"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.CharField(max_length=255)),
+                ("rank", models.PositiveIntegerField()),
+                ("version", models.CharField(max_length=32)),
+                ("generated_at", models.DateTimeField()),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="movies.movie",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["version"], name="movies_user_version_2d2f74_idx"
+                    )
+                ],
+                "unique_together": {("user_id", "rank")},
+            },
+        ),
+    ]
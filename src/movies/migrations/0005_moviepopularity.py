@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0004_userrecommendation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MoviePopularity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("genre", models.CharField(blank=True, default="", max_length=64)),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("bayesian_rating", models.FloatField(default=0)),
+                ("last_rated_at", models.DateTimeField(blank=True, null=True)),
+                ("score", models.FloatField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="popularity",
+                        to="movies.movie",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["genre", "-score"], name="movies_movi_genre_48d881_idx"
+                    )
+                ],
+                "unique_together": {("genre", "movie")},
+            },
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split_genres(apps, schema_editor):
+    """Create a Genre per distinct name in Movie.genre and link every movie."""
+    Movie = apps.get_model("movies", "Movie")
+    Genre = apps.get_model("movies", "Genre")
+    MovieGenre = apps.get_model("movies", "MovieGenre")
+
+    # Names differing only in case are one genre, named as first seen
+    genre_ids = {}
+    links = []
+    for movie_id, genre in Movie.objects.values_list("id", "genre").iterator():
+        names = {}
+        for name in (genre or "").split(","):
+            if name.strip():
+                names.setdefault(name.strip().lower(), name.strip())
+        for key, name in names.items():
+            if key not in genre_ids:
+                genre_ids[key] = Genre.objects.create(name=name).id
+            links.append(MovieGenre(movie_id=movie_id, genre_id=genre_ids[key]))
+    MovieGenre.objects.bulk_create(links, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0007_trending"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Genre",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="MovieGenre",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "genre",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movie_links",
+                        to="movies.genre",
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="genre_links",
+                        to="movies.movie",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="genres",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="movies",
+                through="movies.MovieGenre",
+                to="movies.genre",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="moviegenre",
+            index=models.Index(
+                fields=["genre", "movie"], name="movies_movi_genre_i_decaf6_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="moviegenre",
+            unique_together={("movie", "genre")},
+        ),
+        migrations.RunPython(split_genres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:25
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    Rating = apps.get_model("movies", "Rating")
+
+    rows = (
+        Rating.objects.values("movie_id")
+        .annotate(
+            rating_sum=Sum("rating"),
+            rating_count=Count("id"),
+            **{
+                f"ratings_{star}": Count("id", filter=Q(rating=star))
+                for star in range(1, 6)
+            },
+        )
+        .order_by()
+    )
+    movies = []
+    for row in rows.iterator():
+        movie = Movie(id=row.pop("movie_id"))
+        for field, value in row.items():
+            setattr(movie, field, value or 0)
+        movies.append(movie)
+    fields = ["rating_sum", "rating_count"] + [
+        f"ratings_{star}" for star in range(1, 6)
+    ]
+    Movie.objects.bulk_update(movies, fields, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0008_genre"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_sum",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="ratings_1",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="ratings_2",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="ratings_3",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="ratings_4",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="ratings_5",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
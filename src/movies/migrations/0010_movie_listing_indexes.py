@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+def copy_popularity_scores(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    MoviePopularity = apps.get_model("movies", "MoviePopularity")
+
+    movies = [
+        Movie(id=movie_id, popularity_score=score)
+        for movie_id, score in MoviePopularity.objects.filter(genre="").values_list(
+            "movie_id", "score"
+        )
+    ]
+    Movie.objects.bulk_update(movies, ["popularity_score"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0009_movie_rating_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="popularity_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["title", "id"], name="movies_movi_title_5260dc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-popularity_score", "id"],
+                name="movies_movi_popular_f53adc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-release_date", "id"], name="movies_movi_release_113978_idx"
+            ),
+        ),
+        migrations.RunPython(copy_popularity_scores, migrations.RunPython.noop),
+    ]
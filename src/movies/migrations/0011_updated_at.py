@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def ratings_updated_when_created(apps, schema_editor):
+    Rating = apps.get_model("movies", "Rating")
+    Rating.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0010_movie_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name="rating",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(ratings_updated_when_created, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 23:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def content_updated_when_updated(apps, schema_editor):
+    # The closest record of the last edit; at worst a movie rated since
+    # its last edit is re-indexed once more
+    Movie = apps.get_model("movies", "Movie")
+    Movie.objects.update(content_updated_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0012_version_stamps"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="content_updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(content_updated_when_updated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+
+def fill_genre_keys(apps, schema_editor):
+    # 0008 and sync_movie_genres already merge names differing in case,
+    # so the lower-cased names are unique
+    Genre = apps.get_model("movies", "Genre")
+    genres = list(Genre.objects.all())
+    for genre in genres:
+        genre.key = genre.name.strip().lower()
+    Genre.objects.bulk_update(genres, ["key"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0013_movie_content_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="genre",
+            name="key",
+            field=models.CharField(default="", max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_genre_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="genre",
+            name="key",
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
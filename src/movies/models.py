@@ -7,12 +7,96 @@ class Movie(models.Model):
     release_date = models.DateField()
     poster_url = models.URLField()
     description = models.TextField()
+    # Split out of `genre`, which stays as the display string
+    genres = models.ManyToManyField('Genre', through='MovieGenre', related_name='movies', blank=True)
+    
+    # Rating aggregates, adjusted with F() on every rating write (see
+    # rating_stats.py) so pages never have to scan Rating
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    ratings_1 = models.PositiveIntegerField(default=0)
+    ratings_2 = models.PositiveIntegerField(default=0)
+    ratings_3 = models.PositiveIntegerField(default=0)
+    ratings_4 = models.PositiveIntegerField(default=0)
+    ratings_5 = models.PositiveIntegerField(default=0)
+    # Overall MoviePopularity score (0 when unrated), copied here so
+    # "highest rated" listings sort and page on a Movie index
+    popularity_score = models.FloatField(default=0)
+    # Bumped by saves and rating changes; drives incremental exports
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped by saves only, never by rating writes: the text indexes
+    # re-tokenise movies changed after their snapshot (content.movie_changes)
+    content_updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Incremented alongside updated_at; the movie's ETag (see versions.py)
+    version = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        # Keyset pagination orders by (sort field, id)
+        indexes = [
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['-popularity_score', 'id']),
+            models.Index(fields=['-release_date', 'id']),
+        ]
+    
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+    
+    @property
+    def rating_histogram(self):
+        """Number of ratings per star, 1 to 5."""
+        return {star: getattr(self, f'ratings_{star}') for star in range(1, 6)}
     
     def __str__(self):
         if not hasattr(self, 'title') or self.title is None:
             return f"Movie {getattr(self, 'id', 'New')}"
         return str(self.title)
 
+class CatalogVersion(models.Model):
+    """
+    Change counter for a scope of data, e.g. 'catalog' for every movie and
+    its aggregates, so a conditional GET is answered from one row.
+    """
+    name = models.CharField(max_length=32, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+class Genre(models.Model):
+    name = models.CharField(max_length=64, unique=True)
+    # Lower-cased name; lookups match it exactly so they use its index
+    key = models.CharField(max_length=64, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        # Kept in step with the name for genres edited one at a time
+        self.key = self.name.strip().lower()
+        super().save(*args, **kwargs)
+
+class MovieGenre(models.Model):
+    """
+    Through table for Movie.genres. The unique constraint indexes it by
+    movie; the second index serves "movies in genre X" joins.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='genre_links')
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='movie_links')
+
+    class Meta:
+        unique_together = ('movie', 'genre')
+        indexes = [
+            models.Index(fields=['genre', 'movie']),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} - {self.genre_id}"
+
 class Rating(models.Model):
     # Store Clerk user ID
     user_id = models.CharField(max_length=255, null=True, blank=True)
@@ -20,6 +104,7 @@ class Rating(models.Model):
     rating = models.IntegerField()
     review = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     # Store user information for display
     user_email = models.EmailField(blank=True, null=True)
@@ -54,4 +139,100 @@ class Watchlist(models.Model):
         unique_together = ('user_id', 'movie')
         
     def __str__(self):
-        return f"{self.user_id} - {self.movie.title if self.movie else 'Unknown'}"
\ No newline at end of file
+        return f"{self.user_id} - {self.movie.title if self.movie else 'Unknown'}"
+
+class UserRecommendation(models.Model):
+    """Precomputed top-N recommendations, one row per (user, rank)."""
+    user_id = models.CharField(max_length=255)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveIntegerField()
+    # Batch run that produced this row
+    version = models.CharField(max_length=32)
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user_id', 'rank')
+        indexes = [
+            models.Index(fields=['version']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - #{self.rank} - {self.movie_id}"
+
+class MoviePopularity(models.Model):
+    """
+    Precomputed popularity per movie, overall (genre '') and per genre, so
+    "most popular" is a single indexed ordered query.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='popularity')
+    # '' for the overall ranking, otherwise a lower-cased genre name
+    genre = models.CharField(max_length=64, blank=True, default='')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    # Mean rating shrunk towards the slice-wide mean for thinly rated titles
+    bayesian_rating = models.FloatField(default=0)
+    last_rated_at = models.DateTimeField(null=True, blank=True)
+    # bayesian_rating plus a recency boost; what rankings order by
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('genre', 'movie')
+        indexes = [
+            models.Index(fields=['genre', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} - {self.genre or 'all'} - {self.score:.3f}"
+
+class MovieNeighbour(models.Model):
+    """Precomputed "more like this" list, one row per (movie, rank)."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveIntegerField()
+    # Blend of rating co-occurrence and content similarity
+    score = models.FloatField()
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('movie', 'rank')
+
+    def __str__(self):
+        return f"{self.movie_id} - #{self.rank} - {self.neighbour_id}"
+
+class TrendingBucket(models.Model):
+    """Weighted rating and watchlist activity per movie per hour."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    # Hours since movies.trending.TRENDING_EPOCH
+    hour = models.IntegerField()
+    activity = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('movie', 'hour')
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} - hour {self.hour} - {self.activity:g}"
+
+class MovieTrending(models.Model):
+    """
+    Exponentially decayed activity over the trending window, one row per
+    movie with recent activity, so "trending now" is one indexed query.
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, related_name='trending')
+    # log2 of the activity decayed forward to the epoch; comparable across
+    # rows whenever they were written
+    score = models.FloatField()
+    # Newest bucket with activity; rows older than the window are ignored
+    last_hour = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} - {self.score:.3f}"
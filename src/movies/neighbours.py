@@ -0,0 +1,243 @@
+import numpy as np
+import scipy.sparse as sp
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from .artifacts import current_version
+from .catalog import CatalogIndex
+from .content import ARTIFACT_NAME as CONTENT_ARTIFACT, ContentModel
+from .similarity import ItemSimilarityModel, top_k
+
+
+class NeighbourScorer:
+    """
+    Movie-to-movie similarity over the whole catalog, blending adjusted
+    cosine over co-ratings with TF-IDF cosine over titles, genres and
+    loglines. Rating similarities are shrunk towards zero for thinly rated
+    titles, whose co-ratings are mostly noise.
+
+    Both parts are symmetric, so the blend is too: the score of A for B is
+    the score of B for A.
+    """
+
+    def __init__(self, catalog, similarity_model=None, content_model=None, weights=None, shrinkage=None):
+        self.catalog = catalog
+        if weights is None:
+            weights = getattr(settings, 'RECOMMENDER_SIMILAR_WEIGHTS', {'ratings': 0.7, 'content': 0.3})
+        if shrinkage is None:
+            shrinkage = getattr(settings, 'RECOMMENDER_SIMILAR_SHRINKAGE', 10)
+        self.rating_weight = weights.get('ratings', 0.0)
+        self.content_weight = weights.get('content', 0.0)
+
+        self.similarity_model = similarity_model
+        if similarity_model is not None:
+            # Catalog row -> model item and back; -1 where a side lacks the movie
+            self.rating_items = similarity_model.ratings.item_indices(catalog.movie_ids)
+            self.rating_columns = catalog.item_indices(similarity_model.movie_ids)
+            counts = np.zeros(catalog.n_items)
+            known = self.rating_items >= 0
+            counts[known] = similarity_model.item_counts[self.rating_items[known]]
+            self.rating_shrink = (counts / (counts + shrinkage)).astype(np.float32)
+
+        self.content_model = content_model
+        if content_model is not None:
+            self.content_items = content_model.item_indices(catalog.movie_ids)
+            self.content_columns = catalog.item_indices(content_model.movie_ids)
+
+    @classmethod
+    def from_db(cls, workers=1):
+        """Score with a fresh rating model and the published content model."""
+        path = current_version(CONTENT_ARTIFACT)
+        content_model = ContentModel.load(path) if path is not None else ContentModel.fit_from_db()
+        return cls(CatalogIndex.from_db(), ItemSimilarityModel.from_db(workers=workers), content_model)
+
+    @property
+    def movie_ids(self):
+        return self.catalog.movie_ids
+
+    @staticmethod
+    def _block(known, block, columns, weight):
+        """(rows, catalog columns, weight * values) of a sparse model-column block."""
+        block = block.tocoo()
+        cols = columns[block.col]
+        valid = cols >= 0
+        return known[block.row[valid]], cols[valid], weight * block.data[valid].astype(np.float32)
+
+    def scores(self, rows):
+        """
+        Sparse (len(rows), n_items) CSR similarities of the given catalog
+        rows to every movie, without each movie's similarity to itself.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        parts = []
+
+        if self.similarity_model is not None and self.rating_weight:
+            items = self.rating_items[rows]
+            known = np.flatnonzero(items >= 0)
+            if len(known):
+                block = self.similarity_model.similarity_rows(items[known])
+                r, c, v = self._block(known, block, self.rating_columns, self.rating_weight)
+                parts.append((r, c, v * self.rating_shrink[rows[r]] * self.rating_shrink[c]))
+
+        if self.content_model is not None and self.content_weight:
+            items = self.content_items[rows]
+            known = np.flatnonzero(items >= 0)
+            if len(known):
+                matrix = self.content_model.matrix
+                block = matrix[items[known]] @ matrix.T
+                parts.append(self._block(known, block, self.content_columns, self.content_weight))
+
+        if parts:
+            r, c, v = (np.concatenate(arrays) for arrays in zip(*parts))
+        else:
+            r = c = np.zeros(0, dtype=np.int64)
+            v = np.zeros(0, dtype=np.float32)
+        other = c != rows[r]
+        # Duplicate (row, column) pairs from the two parts are summed
+        out = sp.csr_matrix((v[other], (r[other], c[other])), shape=(len(rows), self.catalog.n_items), dtype=np.float32)
+        out.sum_duplicates()
+        out.eliminate_zeros()
+        return out
+
+
+def changed_movies(since):
+    """
+    Movies whose ratings changed after `since`: their popularity row is
+    rewritten on every rating write.
+    """
+    MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+    return set(MoviePopularity.objects.filter(genre='', updated_at__gt=since).values_list('movie_id', flat=True))
+
+
+def _ranked(scores, i, k):
+    """(columns, scores) of the k best positive scores in row i of a CSR matrix."""
+    start, end = scores.indptr[i], scores.indptr[i + 1]
+    columns, values = scores.indices[start:end], scores.data[start:end]
+    top = [j for j in top_k(values, k) if values[j] > 0]
+    return columns[top], values[top]
+
+
+def _write(movie_ids, neighbours, generated_at):
+    """Replace the stored lists of `movie_ids`; neighbours maps movie -> [(id, score)]."""
+    MovieNeighbour = apps.get_model('movies', 'MovieNeighbour')
+    rows = [
+        MovieNeighbour(movie_id=movie_id, neighbour_id=neighbour_id, rank=rank, score=score,
+                       generated_at=generated_at)
+        for movie_id in movie_ids
+        for rank, (neighbour_id, score) in enumerate(neighbours.get(movie_id, []), start=1)
+    ]
+    with transaction.atomic():
+        MovieNeighbour.objects.filter(movie_id__in=list(movie_ids)).delete()
+        MovieNeighbour.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def refresh_neighbours(k=None, full=False, chunk_size=256, scorer=None, log=None):
+    """
+    Bring the MovieNeighbour table up to date.
+
+    Only movies whose ratings changed since the last run, and movies with no
+    stored list yet, are rescored; `full` rescores the whole catalog. Since
+    similarity is symmetric, each rescored row also says how the changed
+    movie now ranks for every other movie, so other lists are patched in
+    place: the changed movie's entry is updated, and it is added wherever it
+    now beats the last stored neighbour. Shifts between two unchanged movies
+    wait for the next full run.
+
+    Returns (movies rescored, other movies patched).
+    """
+    MovieNeighbour = apps.get_model('movies', 'MovieNeighbour')
+    k = k or getattr(settings, 'RECOMMENDER_SIMILAR_MOVIES', 20)
+    generated_at = timezone.now()
+    last_run = MovieNeighbour.objects.aggregate(last=Max('generated_at'))['last']
+
+    scorer = scorer or NeighbourScorer.from_db()
+    movie_ids = scorer.movie_ids
+    if full or last_run is None:
+        targets = movie_ids
+    else:
+        listed = set(MovieNeighbour.objects.values_list('movie_id', flat=True).distinct())
+        stale = changed_movies(last_run) | (set(movie_ids.tolist()) - listed)
+        targets = movie_ids[np.isin(movie_ids, list(stale))]
+    rows = scorer.catalog.item_indices(targets)
+
+    # A changed movie enters another list once it beats that list's weakest
+    # entry, or any positive score while the list is short of k
+    thresholds = np.zeros(len(movie_ids), dtype=np.float32)
+    patching = len(targets) < len(movie_ids)
+    if patching:
+        full_lists = list(MovieNeighbour.objects.values('movie_id').annotate(
+            count=Count('id'), lowest=Min('score')
+        ).filter(count__gte=k).values_list('movie_id', 'lowest'))
+        if full_lists:
+            indices = scorer.catalog.item_indices([movie_id for movie_id, _ in full_lists])
+            lowest = np.array([score for _, score in full_lists], dtype=np.float32)
+            thresholds[indices[indices >= 0]] = lowest[indices >= 0]
+        thresholds[rows] = np.inf
+
+    patches = {}
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        scores = scorer.scores(chunk)
+        chunk_ids = movie_ids[chunk].tolist()
+
+        neighbours = {}
+        for i, movie_id in enumerate(chunk_ids):
+            top, values = _ranked(scores, i, k)
+            neighbours[movie_id] = list(zip(movie_ids[top].tolist(), values.tolist()))
+        _write(chunk_ids, neighbours, generated_at)
+
+        if patching:
+            entries = scores.tocoo()
+            beats = entries.data > thresholds[entries.col]
+            for i, index, score in zip(entries.row[beats], entries.col[beats], entries.data[beats]):
+                patches.setdefault(int(movie_ids[index]), []).append((chunk_ids[i], float(score)))
+            # Lists holding a changed movie need its new score, even a lower
+            # (or no longer positive) one, which the merge below then applies
+            listing = list(MovieNeighbour.objects.filter(
+                neighbour_id__in=chunk_ids
+            ).values_list('movie_id', 'neighbour_id'))
+            if listing:
+                positions = {movie_id: i for i, movie_id in enumerate(chunk_ids)}
+                indices = scorer.catalog.item_indices([movie_id for movie_id, _ in listing])
+                for index, (movie_id, neighbour_id) in zip(indices.tolist(), listing):
+                    if index < 0 or not np.isfinite(thresholds[index]):
+                        continue
+                    patch = patches.setdefault(movie_id, [])
+                    score = float(scores[positions[neighbour_id], index])
+                    if score <= thresholds[index]:
+                        patch.append((neighbour_id, score))
+
+        if log:
+            log(f'  {min(start + chunk_size, len(rows))}/{len(rows)} movies')
+
+    changed = set(targets.tolist())
+    patched = sorted(patches)
+    for start in range(0, len(patched), chunk_size):
+        chunk = patched[start:start + chunk_size]
+        merged = {movie_id: {} for movie_id in chunk}
+        existing = MovieNeighbour.objects.filter(movie_id__in=chunk).values_list('movie_id', 'neighbour_id', 'score')
+        for movie_id, neighbour_id, score in existing:
+            if neighbour_id not in changed:
+                merged[movie_id][neighbour_id] = score
+        for movie_id in chunk:
+            merged[movie_id].update(patches[movie_id])
+            ranked = sorted(merged[movie_id].items(), key=lambda item: -item[1])
+            merged[movie_id] = [(neighbour_id, score) for neighbour_id, score in ranked[:k] if score > 0]
+        _write(chunk, merged, generated_at)
+
+    return len(targets), len(patched)
+
+
+def stored_neighbours(movie_id, num_movies=10):
+    """
+    A movie's precomputed neighbours, best first, with the neighbouring
+    Movie fetched in the same indexed query.
+    """
+    MovieNeighbour = apps.get_model('movies', 'MovieNeighbour')
+    return list(MovieNeighbour.objects.filter(
+        movie_id=movie_id
+    ).select_related('neighbour').order_by('rank')[:num_movies])
@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import date
+
+from django.db.models import Q
+
+# sort name -> (field, descending); ties are broken by ascending id, and
+# each (field, id) order is served by an index on Movie
+SORTS = {
+    'title': ('title', False),
+    'rating': ('popularity_score', True),
+    'release_date': ('release_date', True),
+}
+
+# JSON types a cursor may carry for each sort field; dates travel as ISO strings
+CURSOR_TYPES = {
+    'title': str,
+    'popularity_score': (int, float),
+    'release_date': str,
+}
+
+
+def sort_ordering(sort):
+    """order_by() arguments for a sort name."""
+    field, descending = SORTS[sort]
+    return (f'-{field}' if descending else field, 'id')
+
+
+def encode_cursor(sort, direction, value, pk):
+    if isinstance(value, date):
+        value = value.isoformat()
+    payload = json.dumps([sort, direction, value, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(sort, 'next' or 'prev', value, id); ValueError when malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort, direction, value, pk = json.loads(base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError) as e:
+        # Bad base64, bad JSON, or not a four-item list
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(sort, str) or sort not in SORTS or direction not in ('next', 'prev') or not isinstance(pk, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    # A tampered value of the wrong type would otherwise fail in the query
+    if not isinstance(value, CURSOR_TYPES[SORTS[sort][0]]) or isinstance(value, bool):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if SORTS[sort][0] == 'release_date':
+        try:
+            value = date.fromisoformat(value)
+        except ValueError as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+    return sort, direction, value, pk
+
+
+def _row_value(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def keyset_page(queryset, sort, cursor=None, limit=20):
+    """
+    One page of `queryset` in `sort` order, seeking past the cursor's
+    (sort value, id) instead of counting an OFFSET, so every page costs
+    the same as the first. Rows may be model instances or .values() dicts
+    that include the sort field and 'id'.
+
+    Returns (rows, next cursor, prev cursor); a cursor is None at either end.
+    """
+    field, descending = SORTS[sort]
+    direction = 'next'
+    if cursor:
+        cursor_sort, direction, value, pk = decode_cursor(cursor)
+        if cursor_sort != sort:
+            raise ValueError("Cursor belongs to a different sort order")
+        # Rows after (value, pk) in this order, or before it going back.
+        # The inclusive bound lets the database seek into the index
+        forward = (direction == 'next') != descending
+        op = 'gt' if forward else 'lt'
+        tie = Q(**{'id__gt' if direction == 'next' else 'id__lt': pk})
+        queryset = queryset.filter(Q(**{f'{field}__{op}e': value}) & (Q(**{f'{field}__{op}': value}) | tie))
+
+    ordering = sort_ordering(sort)
+    if direction == 'prev':
+        # Walk backwards from the cursor, then restore display order
+        ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    def cursor_for(row, towards):
+        return encode_cursor(sort, towards, _row_value(row, field), _row_value(row, 'id'))
+
+    has_next = more if direction == 'next' else True
+    has_prev = (cursor is not None) if direction == 'next' else more
+    return (
+        rows,
+        cursor_for(rows[-1], 'next') if has_next else None,
+        cursor_for(rows[0], 'prev') if has_prev else None,
+    )
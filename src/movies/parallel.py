@@ -0,0 +1,192 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import scipy.sparse as sp
+
+from .factorization import ALSSolver, solve_rows
+
+# Worker side: arrays mapped from the parent's shared memory at start-up
+_arrays = {}
+_segments = []
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _open_segment(name):
+    """Attach to a segment the parent created; only the parent unlinks it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment again with the
+        # parent's resource tracker, which ignores the duplicate
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedArrays:
+    """
+    NumPy arrays copied once into POSIX shared memory, so pool workers map
+    the same pages instead of each receiving a pickled copy.
+
+    Workers treat inputs as read-only; outputs are written by disjoint row
+    blocks, so no locking is needed.
+    """
+
+    def __init__(self):
+        self.specs = {}
+        self._segments = {}
+        self._views = {}
+
+    def put(self, name, array):
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+        view[...] = array
+        self._segments[name] = segment
+        self._views[name] = view
+        self.specs[name] = (segment.name, array.shape, array.dtype.str)
+        return view
+
+    def put_csr(self, name, matrix):
+        matrix = matrix.tocsr()
+        self.put(f'{name}.data', matrix.data)
+        self.put(f'{name}.indices', matrix.indices)
+        self.put(f'{name}.indptr', matrix.indptr)
+        self.put(f'{name}.shape', np.asarray(matrix.shape, dtype=np.int64))
+
+    def __getitem__(self, name):
+        return self._views[name]
+
+    def close(self):
+        self._views.clear()
+        for segment in self._segments.values():
+            segment.close()
+            segment.unlink()
+        self._segments.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(specs):
+    for name, (segment_name, shape, dtype) in specs.items():
+        segment = _open_segment(segment_name)
+        _segments.append(segment)
+        _arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+
+def _csr(name):
+    """A CSR matrix over shared buffers, without copying them."""
+    shape = tuple(int(n) for n in _arrays[f'{name}.shape'])
+    matrix = sp.csr_matrix(shape, dtype=_arrays[f'{name}.data'].dtype)
+    matrix.data, matrix.indices, matrix.indptr = (
+        _arrays[f'{name}.data'], _arrays[f'{name}.indices'], _arrays[f'{name}.indptr'],
+    )
+    return matrix
+
+
+def row_blocks(indptr, n_blocks):
+    """
+    Split the rows of a CSR matrix into up to n_blocks contiguous
+    [start, stop) ranges holding roughly equal numbers of entries.
+    """
+    n_rows = len(indptr) - 1
+    if n_rows <= 0:
+        return []
+    # Count every row as one entry too, so empty rows still spread out
+    work = np.asarray(indptr, dtype=np.float64) + np.arange(n_rows + 1)
+    cuts = np.searchsorted(work, np.linspace(0, work[-1], n_blocks + 1)[1:-1])
+    bounds = np.unique(np.concatenate(([0], cuts, [n_rows])))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def process_pool(arrays, workers):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(arrays.specs,))
+
+
+def _solve_block(task):
+    matrix, fixed, out, start, stop, regularization, implicit, alpha, gram = task
+    solve_rows(_csr(matrix), _arrays[fixed], _arrays[out], start, stop, regularization, implicit, alpha, gram)
+    return stop - start
+
+
+class ParallelALS(ALSSolver):
+    """
+    ALS half-sweeps spread over a process pool.
+
+    Both orientations of the rating matrix and both factor matrices live in
+    shared memory. Each half-sweep solves disjoint blocks of rows against
+    the other side's fixed factors, so the result is identical to the
+    serial solver whatever the number of workers.
+    """
+
+    blocks_per_worker = 4
+
+    def __init__(self, matrix, transposed, user_factors, item_factors, workers):
+        self.workers = workers
+        self.arrays = SharedArrays()
+        self.arrays.put_csr('users', matrix)
+        self.arrays.put_csr('items', transposed)
+        self.arrays.put('user_factors', user_factors)
+        self.arrays.put('item_factors', item_factors)
+        self.blocks = {
+            side: row_blocks(self.arrays[f'{side}.indptr'], workers * self.blocks_per_worker)
+            for side in ('users', 'items')
+        }
+        self.pool = process_pool(self.arrays, workers)
+
+    def _solve(self, side, fixed, out, regularization, implicit, alpha):
+        gram = None
+        if implicit:
+            factors = self.arrays[fixed]
+            gram = factors.T @ factors
+        tasks = [
+            (side, fixed, out, start, stop, regularization, implicit, alpha, gram)
+            for start, stop in self.blocks[side]
+        ]
+        # Blocks write disjoint rows, so completion order does not matter
+        list(self.pool.map(_solve_block, tasks))
+
+    def solve_users(self, regularization, implicit=False, alpha=40.0):
+        self._solve('users', 'item_factors', 'user_factors', regularization, implicit, alpha)
+
+    def solve_items(self, regularization, implicit=False, alpha=40.0):
+        self._solve('items', 'user_factors', 'item_factors', regularization, implicit, alpha)
+
+    def result(self):
+        return self.arrays['user_factors'].copy(), self.arrays['item_factors'].copy()
+
+    def close(self):
+        self.pool.shutdown()
+        self.arrays.close()
+
+
+def _gram_block(task):
+    start, stop = task
+    return (_csr('transposed')[start:stop] @ _csr('matrix')).tocsr()
+
+
+def parallel_gram(matrix, workers, blocks_per_worker=4):
+    """
+    X^T X for a user x item CSR matrix, computed as row blocks of items on
+    a process pool and stacked in block order. Each block is the same
+    sparse product the serial version computes for those rows, so the
+    result matches it exactly.
+    """
+    matrix = matrix.tocsr()
+    transposed = matrix.T.tocsr()
+    with SharedArrays() as arrays:
+        arrays.put_csr('matrix', matrix)
+        arrays.put_csr('transposed', transposed)
+        tasks = row_blocks(transposed.indptr, workers * blocks_per_worker)
+        if not tasks:
+            return sp.csr_matrix((matrix.shape[1], matrix.shape[1]), dtype=matrix.dtype)
+        with process_pool(arrays, workers) as pool:
+            blocks = list(pool.map(_gram_block, tasks))
+    return sp.vstack(blocks, format='csr')
@@ -0,0 +1,215 @@
+import threading
+import time
+from datetime import timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .versions import bump
+
+# Slice -> (mean rating, time it was computed)
+_prior_cache = {}
+_prior_lock = threading.Lock()
+
+
+def genre_keys(genre):
+    """Popularity slices a movie belongs to: '' plus each of its genres."""
+    keys = ['']
+    for name in (genre or '').split(','):
+        name = name.strip().lower()
+        if name and name not in keys:
+            keys.append(name)
+    return keys
+
+
+def bayesian_average(rating_sum, rating_count, prior_mean, prior_weight=None):
+    """
+    Mean rating with `prior_weight` phantom ratings at `prior_mean`, so a
+    single 5-star review does not outrank hundreds of 4.5s.
+    """
+    if prior_weight is None:
+        prior_weight = getattr(settings, 'RECOMMENDER_POPULARITY_PRIOR_WEIGHT', 10)
+    return (prior_weight * prior_mean + rating_sum) / (prior_weight + rating_count)
+
+
+def recency_boost(last_rated_at, now=None):
+    """
+    Score added for having been rated recently: RECOMMENDER_POPULARITY_RECENCY_WEIGHT
+    stars for a rating made now, halving every RECOMMENDER_POPULARITY_RECENCY_DAYS.
+
+    Bounded by the weight, so it can reorder titles with similar ratings but
+    never outweighs the ratings themselves. Stored boosts are as of the last
+    write to a movie; refresh_popularity re-decays every row.
+    """
+    if last_rated_at is None:
+        return 0.0
+    weight = getattr(settings, 'RECOMMENDER_POPULARITY_RECENCY_WEIGHT', 0.25)
+    days = getattr(settings, 'RECOMMENDER_POPULARITY_RECENCY_DAYS', 30)
+    if last_rated_at.tzinfo is None:
+        last_rated_at = last_rated_at.replace(tzinfo=dt_timezone.utc)
+    age_days = max(((now or timezone.now()) - last_rated_at).total_seconds(), 0.0) / 86400
+    return weight * 0.5 ** (age_days / days)
+
+
+def slice_mean(genre=''):
+    """
+    Mean rating across a slice, read from the popularity table itself and
+    cached for RECOMMENDER_MODEL_TTL seconds. Falls back to the overall mean,
+    then to the middle of the 1-5 scale.
+    """
+    ttl = getattr(settings, 'RECOMMENDER_MODEL_TTL', 3600)
+    cached = _prior_cache.get(genre)
+    if cached is not None and time.time() - cached[1] < ttl:
+        return cached[0]
+
+    MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+    totals = MoviePopularity.objects.filter(genre=genre).aggregate(
+        total=Sum('rating_sum'), count=Sum('rating_count')
+    )
+    if totals['count']:
+        mean = totals['total'] / totals['count']
+    elif genre:
+        mean = slice_mean('')
+    else:
+        mean = 3.0
+
+    with _prior_lock:
+        _prior_cache[genre] = (mean, time.time())
+    return mean
+
+
+def _popularity_rows(stats, genres, priors):
+    """
+    Build MoviePopularity rows from per-movie (count, sum, last_rated_at)
+    stats. `priors` maps slice -> mean rating.
+    """
+    MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+    now = timezone.now()
+    rows = []
+    for movie_id, (count, total, last_rated_at) in stats.items():
+        boost = recency_boost(last_rated_at, now)
+        for key in genre_keys(genres.get(movie_id)):
+            bayesian = bayesian_average(total, count, priors.get(key, priors['']))
+            rows.append(MoviePopularity(
+                movie_id=movie_id,
+                genre=key,
+                rating_count=count,
+                rating_sum=total,
+                bayesian_rating=bayesian,
+                last_rated_at=last_rated_at,
+                score=bayesian + boost,
+            ))
+    return rows
+
+
+def _store_overall_scores(rows, movie_ids=None, batch_size=2000):
+    """
+    Copy the overall scores onto Movie.popularity_score for listings,
+    after resetting `movie_ids` (every movie when None) to 0.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+    movies = [Movie(id=row.movie_id, popularity_score=row.score) for row in rows if row.genre == '']
+    stale = Movie.objects.all() if movie_ids is None else Movie.objects.filter(id__in=movie_ids)
+    stale.exclude(popularity_score=0).update(popularity_score=0)
+    Movie.objects.bulk_update(movies, ['popularity_score'], batch_size=batch_size)
+
+
+def _rating_stats(ratings):
+    # A movie was last rated when any of its ratings was last written
+    rows = ratings.values('movie_id').annotate(
+        count=Count('id'), total=Sum('rating'), last_rated_at=Max('updated_at')
+    )
+    return {row['movie_id']: (row['count'], row['total'], row['last_rated_at']) for row in rows}
+
+
+def refresh_movie_popularity(movie_ids, rated_at=None):
+    """
+    Recompute the popularity rows of the given movies only, from the rating
+    aggregates stored on Movie (see rating_stats) rather than their ratings.
+
+    `rated_at` is the time of the rating write that triggered the refresh;
+    without one (e.g. after a delete) each movie keeps its last known rating
+    time. Movies left without ratings drop out.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+    MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+
+    movie_ids = list(set(movie_ids))
+    last_rated = dict(
+        MoviePopularity.objects.filter(movie_id__in=movie_ids, genre='').values_list('movie_id', 'last_rated_at')
+    )
+    stats, genres = {}, {}
+    movies = Movie.objects.filter(id__in=movie_ids, rating_count__gt=0)
+    for movie_id, genre, total, count in movies.values_list('id', 'genre', 'rating_sum', 'rating_count'):
+        stats[movie_id] = (count, total, rated_at or last_rated.get(movie_id))
+        genres[movie_id] = genre
+    keys = {key for genre in genres.values() for key in genre_keys(genre)} | {''}
+    rows = _popularity_rows(stats, genres, {key: slice_mean(key) for key in keys})
+
+    with transaction.atomic():
+        MoviePopularity.objects.filter(movie_id__in=movie_ids).delete()
+        MoviePopularity.objects.bulk_create(rows)
+        _store_overall_scores(rows, movie_ids)
+    return len(rows)
+
+
+def rebuild_popularity(batch_size=5000):
+    """Recompute the whole popularity table from the Rating table."""
+    Movie = apps.get_model('movies', 'Movie')
+    Rating = apps.get_model('movies', 'Rating')
+    MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+
+    stats = _rating_stats(Rating.objects.all())
+    genres = dict(Movie.objects.filter(id__in=list(stats)).values_list('id', 'genre'))
+
+    # Slice means straight from the aggregates, so the priors match this run
+    sums, counts = {}, {}
+    for movie_id, (count, total, _) in stats.items():
+        for key in genre_keys(genres.get(movie_id)):
+            sums[key] = sums.get(key, 0) + total
+            counts[key] = counts.get(key, 0) + count
+    priors = {key: sums[key] / counts[key] for key in counts}
+    priors.setdefault('', 3.0)
+
+    rows = _popularity_rows(stats, genres, priors)
+    with transaction.atomic():
+        MoviePopularity.objects.all().delete()
+        MoviePopularity.objects.bulk_create(rows, batch_size=batch_size)
+        _store_overall_scores(rows, batch_size=batch_size)
+    # Listings sort by the stored scores
+    bump()
+
+    now = time.time()
+    with _prior_lock:
+        _prior_cache.clear()
+        _prior_cache.update({key: (mean, now) for key, mean in priors.items()})
+    return len(rows)
+
+
+def popularity_changed(movie_id, rated_at=None):
+    """Refresh a movie's popularity once the current transaction commits."""
+    def refresh():
+        try:
+            refresh_movie_popularity([movie_id], rated_at)
+        except Exception as e:
+            print(f"Error refreshing popularity for movie {movie_id}: {str(e)}")
+
+    transaction.on_commit(refresh)
+
+
+def popular_queryset(genre=None):
+    """Popularity rows for a slice, best first; served by the (genre, -score) index."""
+    MoviePopularity = apps.get_model('movies', 'MoviePopularity')
+    key = (genre or '').strip().lower()
+    return MoviePopularity.objects.filter(genre=key).order_by('-score')
+
+
+def popular_movies(num_movies=10, genre=None, exclude=None):
+    """Return the most popular Movie objects, optionally within one genre."""
+    rows = popular_queryset(genre).select_related('movie')
+    if exclude:
+        rows = rows.exclude(movie_id__in=list(exclude))
+    return [row.movie for row in rows[:num_movies]]
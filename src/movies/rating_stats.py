@@ -0,0 +1,72 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Now
+
+from .versions import bump
+
+STARS = range(1, 6)
+
+STAT_FIELDS = ['rating_sum', 'rating_count'] + [f'ratings_{star}' for star in STARS]
+
+
+def _delta(rating, sign):
+    """Field -> change for adding (sign 1) or removing (sign -1) one rating."""
+    rating = int(rating)
+    delta = {'rating_sum': sign * rating, 'rating_count': sign}
+    if rating in STARS:
+        delta[f'ratings_{rating}'] = sign
+    return delta
+
+
+def apply_rating_change(movie_id, old=None, new=None):
+    """
+    Move one rating of a movie from `old` to `new` stars (None for no
+    rating, i.e. created or deleted) with a single UPDATE of F()
+    expressions, so concurrent writers never lose each other's changes.
+
+    The movie's version and updated_at move even when the stars do not
+    (e.g. a review-only edit): its ratings page has still changed. Its
+    content_updated_at does not, so the text indexes leave it alone.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+
+    changes = {}
+    for rating, sign in [(old, -1), (new, 1)]:
+        if rating is not None:
+            for field, value in _delta(rating, sign).items():
+                changes[field] = changes.get(field, 0) + value
+    changes = {field: F(field) + value for field, value in changes.items() if value}
+    # update() skips the Movie save signals: nothing else depends on these
+    Movie.objects.filter(id=movie_id).update(updated_at=Now(), version=F('version') + 1, **changes)
+
+
+def rating_stats_rows():
+    """Per-movie {movie_id, rating_sum, rating_count, ratings_1..5} from one GROUP BY over Rating."""
+    Rating = apps.get_model('movies', 'Rating')
+    return Rating.objects.values('movie_id').annotate(
+        rating_sum=Sum('rating'),
+        rating_count=Count('id'),
+        **{f'ratings_{star}': Count('id', filter=Q(rating=star)) for star in STARS},
+    ).order_by()
+
+
+def rebuild_rating_stats(batch_size=2000):
+    """
+    Recompute every movie's aggregates from Rating, e.g. after bulk imports
+    that bypass the signals. Returns the number of movies with ratings.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+
+    movies = []
+    for row in rating_stats_rows().iterator(chunk_size=batch_size):
+        movie = Movie(id=row.pop('movie_id'))
+        for field, value in row.items():
+            setattr(movie, field, value or 0)
+        movies.append(movie)
+
+    with transaction.atomic():
+        Movie.objects.update(updated_at=Now(), version=F('version') + 1, **{field: 0 for field in STAT_FIELDS})
+        Movie.objects.bulk_update(movies, STAT_FIELDS, batch_size=batch_size)
+        bump()
+    return len(movies)
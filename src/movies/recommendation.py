@@ -1,61 +1,243 @@
+import threading
+import time
+
 from django.apps import apps
+from django.conf import settings
+from django.db import connection
+
+from . import content, factorization
+from .artifacts import current_version, pointer_stamp
+from .content import ContentModel
+from .factorization import FactorModel
+from .incremental import RatingLogReader, apply_logged_updates
+from .similarity import ItemSimilarityModel
+
+_model = None
+_model_built_at = 0.0
+_model_lock = threading.Lock()
+# Held while a background rebuild is running
+_rebuild_lock = threading.Lock()
+
+# Artifact name -> [loaded model or None, time last checked, pointer stamp]
+_artifact_models = {}
+_artifact_locks = {}
+
+
+def _build_similarity_model():
+    reader = RatingLogReader()
+    model = ItemSimilarityModel.from_db()
+    model.rating_log = reader
+    return model
+
+
+def _rebuild_similarity_model():
+    """Build a fresh model and swap it in; runs on a background thread."""
+    global _model, _model_built_at
+    try:
+        model = _build_similarity_model()
+        with _model_lock:
+            _model = model
+            _model_built_at = time.time()
+    finally:
+        _rebuild_lock.release()
+        # The thread's own connection; request threads close theirs per request
+        connection.close()
+
+
+def _start_rebuild():
+    if _rebuild_lock.acquire(blocking=False):
+        threading.Thread(target=_rebuild_similarity_model, name='similarity-rebuild', daemon=True).start()
+
+
+def get_similarity_model(force=False):
+    """
+    Return the process-wide item similarity model.
+
+    Only the first call (or force=True) builds it on the calling thread.
+    Once it is older than RECOMMENDER_MODEL_TTL seconds, or missed rating
+    changes that were evicted from the log, a background thread rebuilds
+    it while requests keep being served from the current one.
+    """
+    global _model, _model_built_at
+
+    if force or _model is None:
+        with _model_lock:
+            if force or _model is None:
+                _model = _build_similarity_model()
+                _model_built_at = time.time()
+        return _model
+
+    ttl = getattr(settings, 'RECOMMENDER_MODEL_TTL', 3600)
+    if time.time() - _model_built_at >= ttl:
+        _start_rebuild()
+    return _model
+
+
+def _get_artifact_model(name, loader):
+    """
+    Return the model loaded from the current version of an artifact, or None
+    if none has been published.
+
+    At most every RECOMMENDER_ARTIFACT_CHECK_SECONDS the worker stats the
+    artifact's "current" pointer; when it moved, the new version is loaded
+    by one thread while the others keep serving the old model, and the
+    reference is then swapped. Requests already holding the old model
+    finish with it.
+    """
+    entry = _artifact_models.setdefault(name, [None, 0.0, None])
+    interval = getattr(settings, 'RECOMMENDER_ARTIFACT_CHECK_SECONDS', 2)
+    if time.time() - entry[1] < interval:
+        return entry[0]
+
+    lock = _artifact_locks.setdefault(name, threading.Lock())
+    # Only block when there is nothing to serve yet
+    if not lock.acquire(blocking=entry[0] is None):
+        return entry[0]
+    try:
+        stamp = pointer_stamp(name)
+        if stamp != entry[2]:
+            path = current_version(name)
+            if path is None:
+                entry[0] = None
+            elif entry[0] is None or entry[0].path != path:
+                entry[0] = loader(path)
+            entry[2] = stamp
+        entry[1] = time.time()
+    finally:
+        lock.release()
+    return entry[0]
+
+
+def model_version():
+    """
+    Versions of the artifacts this worker is serving, e.g.
+    'als=20250405T025300-123456;content=...', or 'live' when recommendations
+    come only from models built in-process.
+    """
+    parts = [
+        f'{name}={entry[0].version}'
+        for name, entry in sorted(_artifact_models.items()) if entry[0] is not None
+    ]
+    return ';'.join(parts) or 'live'
+
+
+def _load_factor_model(path):
+    reader = RatingLogReader()
+    model = FactorModel(path)
+    model.rating_log = reader
+    return model
+
 
-def get_recommendations(user_id, num_recommendations=5):
+def get_factor_model():
+    """Return the newest published ALS model, or None if none has been trained."""
+    return _get_artifact_model(factorization.ARTIFACT_NAME, _load_factor_model)
+
+
+def get_content_model():
+    """Return the newest published TF-IDF content model, or None."""
+    return _get_artifact_model(content.ARTIFACT_NAME, ContentModel.load)
+
+
+def apply_rating_updates():
+    """
+    Fold ratings written by any worker since the last call into the loaded
+    models, patching only the affected users instead of rebuilding.
+    """
+    with _model_lock:
+        factor_model = _artifact_models.get(factorization.ARTIFACT_NAME, [None])[0]
+        stale = apply_logged_updates([_model, factor_model])
+    if _model is not None and _model in stale:
+        _start_rebuild()
+
+
+def movies_in_order(movie_ids, only=None):
     """
-    Generate movie recommendations for a user.
+    Fetch Movie objects for the given IDs, preserving their order; `only`
+    limits the columns read.
     """
-    # Get model classes using apps.get_model
     Movie = apps.get_model('movies', 'Movie')
-    Rating = apps.get_model('movies', 'Rating')
-    
+    movies = Movie.objects.all()
+    if only:
+        movies = movies.only(*only)
+    movies = movies.in_bulk(movie_ids)
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+
+def recommend_movie_ids(user_id, num_recommendations=5, budget_ms=None, filters=None):
+    """
+    Rank movie IDs for a user by blending the registered strategies, without
+    touching the Movie table. Returns a RecommendationResult; its movie_ids
+    are empty only when there is nothing to rank at all.
+    """
+    from .strategies import registry
+
+    # Load the factor model first so a newly loaded version catches up on
+    # the changes logged while it was loading
+    get_factor_model()
+    apply_rating_updates()
+    result = registry.recommend(user_id, num_recommendations, budget_ms=budget_ms, filters=filters)
+    result.model_version = model_version()
+    return result
+
+
+def get_recommendations(user_id, num_recommendations=5, result=None, filters=None, only=None):
+    """
+    Generate ranked movie recommendations for a user, optionally restricted
+    by RecommendationFilters.
+
+    A strategy that fails is left out of the blend rather than failing the
+    request, and the popularity strategy fills whatever slots the others
+    leave open. Pass a list as `result` to receive the RecommendationResult
+    with per-strategy timings, and Movie column names as `only` to read
+    just those.
+    """
+    outcome = recommend_movie_ids(user_id, num_recommendations, filters=filters)
+    if result is not None:
+        result.append(outcome)
+    return movies_in_order(outcome.movie_ids, only=only)
+
+
+def get_precomputed_recommendations(user_id, num_recommendations=5, result=None, only=None):
+    """
+    Read a user's batch-computed recommendations with a single indexed
+    query. Returns an empty list if the user has no precomputed rows.
+    """
+    from .strategies import RecommendationResult
+
+    UserRecommendation = apps.get_model('movies', 'UserRecommendation')
+    rows = UserRecommendation.objects.filter(user_id=user_id).select_related('movie')
+    if only:
+        rows = rows.only('movie_id', 'rank', 'version', *[f'movie__{column}' for column in only])
+    rows = list(rows.order_by('rank')[:num_recommendations])
+    if rows and result is not None:
+        result.append(RecommendationResult(
+            [row.movie_id for row in rows], {}, [], False, model_version=f'precomputed={rows[0].version}'
+        ))
+    return [row.movie for row in rows]
+
+
+def get_user_recommendations(user_id, num_recommendations=5, result=None, filters=None, only=None):
+    """
+    Serve precomputed recommendations, scoring live only for users the last
+    batch run did not cover (or whose ratings changed since) and for
+    filtered requests.
+    """
+    if user_id is not None and not filters:
+        recommendations = get_precomputed_recommendations(user_id, num_recommendations, result=result, only=only)
+        if recommendations:
+            return recommendations
+    return get_recommendations(user_id, num_recommendations, result=result, filters=filters, only=only)
+
+
+def get_similar_movies(movie_id, num_movies=10):
+    """
+    Return movies similar to the given one, best first, from the lists
+    refresh_similar_movies precomputes; nothing is scored per request.
+    """
+    from .neighbours import stored_neighbours
+
     try:
-        # Get popular movies as fallback
-        popular_movies = list(Movie.objects.all()[:num_recommendations])
-        
-        # Check if we have any ratings at all
-        if Rating.objects.count() == 0:
-            return popular_movies
-        
-        # Check if this user has any ratings
-        user_ratings = Rating.objects.filter(user_id=user_id)
-        if not user_ratings.exists():
-            return popular_movies
-            
-        # Get movies this user has already rated
-        rated_movie_ids = [rating.movie_id for rating in user_ratings]
-        
-        # Find users with similar tastes
-        # Get all users who rated at least one movie that this user rated
-        similar_user_ratings = Rating.objects.filter(movie_id__in=rated_movie_ids).exclude(user_id=user_id)
-        similar_user_ids = similar_user_ratings.values_list('user_id', flat=True).distinct()
-        
-        # Get movies rated highly by similar users that this user hasn't rated yet
-        recommended_movies = Rating.objects.filter(
-            user_id__in=similar_user_ids,
-            rating__gte=4  # Only consider high ratings (4 or 5)
-        ).exclude(
-            movie_id__in=rated_movie_ids
-        ).values_list('movie_id', flat=True).distinct()
-        
-        # Get the actual movie objects
-        recommendations = list(Movie.objects.filter(id__in=recommended_movies)[:num_recommendations])
-        
-        # If we don't have enough recommendations, add some popular movies
-        if len(recommendations) < num_recommendations:
-            # Get IDs of movies we already recommended
-            recommended_ids = [movie.id for movie in recommendations]
-            
-            # Add popular movies not already in recommendations
-            additional_movies = list(Movie.objects.exclude(
-                id__in=recommended_ids + rated_movie_ids
-            )[:num_recommendations - len(recommendations)])
-            
-            # Combine the recommendations
-            recommendations = recommendations + additional_movies
-        
-        return recommendations
-        
+        return [row.neighbour for row in stored_neighbours(movie_id, num_movies)]
     except Exception as e:
-        # If anything goes wrong, return some popular movies
-        print(f"Error in recommendation system: {str(e)}")
-        return list(Movie.objects.all()[:num_recommendations])
\ No newline at end of file
+        print(f"Error finding similar movies: {str(e)}")
+        return []
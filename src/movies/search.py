@@ -0,0 +1,383 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .artifacts import ArtifactWriter, current_version, read_manifest
+from .content import movie_changes, tokenize
+from .fuzzy import TrigramIndex
+from .versions import MOVIES, counter
+
+ARTIFACT_NAME = 'search'
+
+# Each occurrence of a term counts this many times, per field
+FIELD_WEIGHTS = (('title', 3.0), ('genre', 2.0), ('description', 1.0))
+
+_index = None
+_index_built_at = 0.0
+_index_checked_at = 0.0
+# The MOVIES counter the index has caught up to
+_index_movies_version = None
+_index_lock = threading.Lock()
+# Movie IDs saved or deleted in this process since the index was built
+_pending = set()
+
+
+def document_terms(title, genre, description):
+    """(term, weight) pairs for a movie, before aggregation."""
+    fields = {'title': title, 'genre': (genre or '').replace(',', ' '), 'description': description}
+    return [(term, weight) for name, weight in FIELD_WEIGHTS for term in tokenize(fields[name])]
+
+
+class SearchIndex:
+    """
+    BM25 inverted index over movie titles, genres and loglines.
+
+    Field-weighted term frequencies are kept as a docs x terms matrix; from
+    it every posting's BM25 contribution is precomputed, so a query only
+    adds up the postings of its few terms. Postings are stored term-major
+    (CSC), one contiguous slice of doc rows and impacts per term.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, movie_ids, counts, vocabulary, indexed_at=None):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.counts = counts.tocsr()
+        self.vocabulary = list(vocabulary)
+        self.term_index = {term: i for i, term in enumerate(self.vocabulary)}
+        # When the Movie table was read; catch-ups start from here
+        self.indexed_at = indexed_at
+        self._build_postings()
+        self._fuzzy = None
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype=np.int64), sp.csr_matrix((0, 0), dtype=np.float32), [])
+
+    @classmethod
+    def fit(cls, movies):
+        """Build an index from (id, title, genre, description) tuples."""
+        return cls.empty().add_movies(movies)
+
+    @classmethod
+    def fit_from_db(cls):
+        Movie = apps.get_model('movies', 'Movie')
+        indexed_at = timezone.now()
+        rows = Movie.objects.values_list('id', 'title', 'genre', 'description')
+        index = cls.fit(rows.iterator(chunk_size=2000))
+        index.indexed_at = indexed_at
+        return index
+
+    @property
+    def n_docs(self):
+        return len(self.movie_ids)
+
+    @property
+    def fuzzy(self):
+        """Trigram index over the vocabulary, built on first use."""
+        if self._fuzzy is None:
+            self._fuzzy = TrigramIndex(self.vocabulary, weights=np.diff(self.term_ptr))
+        return self._fuzzy
+
+    def _build_postings(self):
+        n_docs, n_terms = self.counts.shape
+        doc_len = np.asarray(self.counts.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if n_docs else 1.0
+
+        postings = self.counts.tocsc()
+        postings.sort_indices()
+        doc_freq = np.diff(postings.indptr)
+        idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        tf = postings.data.astype(np.float64)
+        docs = postings.indices
+        terms = np.repeat(np.arange(n_terms), doc_freq)
+        norm = self.k1 * (1.0 - self.b + self.b * doc_len[docs] / max(avg_len, 1e-9))
+        self.term_ptr = postings.indptr.astype(np.int64)
+        self.post_docs = docs.astype(np.int32)
+        self.post_impacts = (idf[terms] * tf * (self.k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+    def add_movies(self, movies):
+        """
+        Return a new index that also covers the given (id, title, genre,
+        description) tuples. Movies already indexed are replaced.
+        """
+        vocabulary = list(self.vocabulary)
+        term_index = dict(self.term_index)
+        new_ids, rows, cols, values = [], [], [], []
+
+        for movie_id, title, genre, description in movies:
+            row = len(new_ids)
+            new_ids.append(movie_id)
+            for term, weight in document_terms(title, genre, description):
+                col = term_index.get(term)
+                if col is None:
+                    col = term_index[term] = len(vocabulary)
+                    vocabulary.append(term)
+                rows.append(row)
+                cols.append(col)
+                values.append(weight)
+
+        if not new_ids:
+            return self
+
+        n_terms = len(vocabulary)
+        new_ids = np.asarray(new_ids, dtype=np.int64)
+        # Duplicate (row, col) entries are summed into term frequencies
+        added = sp.csr_matrix((np.asarray(values, dtype=np.float32), (rows, cols)), shape=(len(new_ids), n_terms))
+        return self._replace(new_ids, added, vocabulary)
+
+    def remove_movies(self, movie_ids):
+        """Return a new index without the given movies."""
+        if not len(movie_ids):
+            return self
+        return self._replace(np.asarray(list(movie_ids), dtype=np.int64), None, self.vocabulary)
+
+    def _replace(self, movie_ids, added, vocabulary):
+        n_terms = len(vocabulary)
+        keep = np.flatnonzero(~np.isin(self.movie_ids, movie_ids))
+        old = self.counts[keep]
+        old = sp.csr_matrix((old.data, old.indices, old.indptr), shape=(len(keep), n_terms))
+        if added is None:
+            return SearchIndex(self.movie_ids[keep], old, vocabulary, self.indexed_at)
+
+        ids = np.concatenate([self.movie_ids[keep], movie_ids])
+        counts = sp.vstack([old, added]).tocsr()
+        order = np.argsort(ids, kind='stable')
+        return SearchIndex(ids[order], counts[order], vocabulary, self.indexed_at)
+
+    def score(self, query):
+        """
+        (doc rows, BM25 scores) of every movie matching any query term, in
+        doc order.
+        """
+        rows = sorted({self.term_index[term] for term in tokenize(query) if term in self.term_index})
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if len(rows) == 1:
+            lo, hi = self.term_ptr[rows[0]], self.term_ptr[rows[0] + 1]
+            return self.post_docs[lo:hi], self.post_impacts[lo:hi]
+
+        # Dense accumulator: cheaper than merging postings once they are long
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for row in rows:
+            lo, hi = self.term_ptr[row], self.term_ptr[row + 1]
+            scores[self.post_docs[lo:hi]] += self.post_impacts[lo:hi]
+        matched = np.nonzero(scores > 0)[0]
+        return matched, scores[matched]
+
+    def search(self, query, offset=0, limit=20):
+        """
+        Rank movies for a free-text query. Returns (movie IDs, scores, total
+        matches) for results [offset, offset + limit), best first; ties go
+        to the lower movie ID. `limit` None returns every match.
+        """
+        docs, scores = self.score(query)
+        total = len(docs)
+        stop = total if limit is None else min(offset + limit, total)
+        if offset >= stop:
+            return [], [], total
+
+        if stop < total:
+            # Partial sort: only the first `stop` results are ordered
+            top = np.argpartition(-scores, stop - 1)[:stop]
+        else:
+            top = np.arange(total)
+        top = top[np.lexsort((docs[top], -scores[top]))][offset:stop]
+        return self.movie_ids[docs[top]].tolist(), scores[top].tolist(), total
+
+    def correct_query(self, query):
+        """
+        The query with each unknown term replaced by the closest indexed
+        term (the most common one on ties), or None when nothing changed.
+        """
+        terms = tokenize(query)
+        corrected = [
+            term if term in self.term_index else (self.fuzzy.correct(term) or term)
+            for term in terms
+        ]
+        return ' '.join(corrected) if corrected != terms else None
+
+    def save(self):
+        """Publish the index as a new version of the 'search' artifact."""
+        with ArtifactWriter(ARTIFACT_NAME) as writer:
+            np.save(writer.path / 'movie_ids.npy', self.movie_ids)
+            sp.save_npz(writer.path / 'counts.npz', self.counts)
+            with open(writer.path / 'vocabulary.json', 'w', encoding='utf-8') as f:
+                json.dump(self.vocabulary, f)
+            writer.manifest.update({
+                'movies': self.n_docs,
+                'terms': len(self.vocabulary),
+                'indexed_at': self.indexed_at.isoformat() if self.indexed_at else None,
+            })
+        return writer.published_path
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        with open(path / 'vocabulary.json', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        manifest = read_manifest(path)
+        index = cls(
+            np.load(path / 'movie_ids.npy'), sp.load_npz(path / 'counts.npz'), vocabulary,
+            parse_datetime(manifest.get('indexed_at') or ''),
+        )
+        index.path = path
+        index.version = manifest['version']
+        return index
+
+
+def _catch_up(index):
+    """
+    Fold in movies saved since the index read the Movie table (new or
+    edited) and drop deleted ones. Returns (index, movies changed).
+    """
+    if index.indexed_at is None:
+        # Snapshot from before catch-ups tracked indexed_at
+        index = SearchIndex.fit_from_db()
+        return index, index.n_docs
+
+    indexed_at = timezone.now()
+    rows, deleted = movie_changes(index.movie_ids, index.indexed_at)
+    index = index.remove_movies(deleted).add_movies(rows)
+    index.indexed_at = indexed_at
+    return index, len(rows) + len(deleted)
+
+
+def update_search_index(full=False):
+    """
+    Bring the published search snapshot up to date with the Movie table,
+    tokenising only movies saved since it was built unless `full`.
+    Returns (path, movies changed).
+    """
+    path = current_version(ARTIFACT_NAME)
+    if full or path is None:
+        index = SearchIndex.fit_from_db()
+        return index.save(), index.n_docs
+
+    index, changed = _catch_up(SearchIndex.load(path))
+    if not changed:
+        return path, 0
+    return index.save(), changed
+
+
+def _apply_pending(index):
+    Movie = apps.get_model('movies', 'Movie')
+    changed = set(_pending)
+    _pending.difference_update(changed)
+    rows = list(Movie.objects.filter(id__in=changed).values_list('id', 'title', 'genre', 'description'))
+    deleted = changed - {row[0] for row in rows}
+    if deleted:
+        index = index.remove_movies(deleted)
+    return index.add_movies(rows)
+
+
+def get_search_index(force=False):
+    """
+    Return the process-wide search index.
+
+    It starts from the published snapshot (or the Movie table when there
+    is none) plus the movies saved or deleted since, and is rebuilt that
+    way every RECOMMENDER_MODEL_TTL seconds. Movies saved or deleted in this
+    process are folded in before the next query; every
+    RECOMMENDER_ARTIFACT_CHECK_SECONDS the MOVIES change counter is read so
+    changes made by other workers are caught up too.
+    """
+    global _index, _index_built_at, _index_checked_at, _index_movies_version
+
+    ttl = getattr(settings, 'RECOMMENDER_MODEL_TTL', 3600)
+    interval = getattr(settings, 'RECOMMENDER_ARTIFACT_CHECK_SECONDS', 2)
+    now = time.time()
+    if (not force and _index is not None and now - _index_built_at < ttl
+            and now - _index_checked_at < interval and not _pending):
+        return _index
+
+    with _index_lock:
+        if force or _index is None or time.time() - _index_built_at >= ttl:
+            # Read before catching up, so a save racing the catch-up is
+            # caught on the next check
+            version = counter(MOVIES)[0]
+            path = current_version(ARTIFACT_NAME)
+            index = SearchIndex.load(path) if path is not None else SearchIndex.fit_from_db()
+            _index, _ = _catch_up(index)
+            _index_built_at = time.time()
+            _index_movies_version = version
+        elif time.time() - _index_checked_at >= interval:
+            version = counter(MOVIES)[0]
+            if version != _index_movies_version:
+                _index, _ = _catch_up(_index)
+                _index_movies_version = version
+        _index_checked_at = time.time()
+        if _pending:
+            _index = _apply_pending(_index)
+    return _index
+
+
+def search_changed(movie_id):
+    """Re-index a movie in this process once the current transaction commits."""
+    transaction.on_commit(lambda: _pending.add(movie_id))
+
+
+def search_movie_ids(query, offset=0, limit=20):
+    """Ranked (movie IDs, scores, total matches) for a query."""
+    return get_search_index().search(query, offset, limit)
+
+
+def fuzzy_search_movie_ids(query, offset=0, limit=20):
+    """
+    Like search_movie_ids, but when nothing matches the query as typed it
+    is retried with misspelt terms corrected. Returns (movie IDs, scores,
+    total matches, corrected query or None).
+    """
+    index = get_search_index()
+    movie_ids, scores, total = index.search(query, offset, limit)
+    if total:
+        return movie_ids, scores, total, None
+    corrected = index.correct_query(query)
+    if corrected is None:
+        return movie_ids, scores, total, None
+    return (*index.search(corrected, offset, limit), corrected)
+
+
+class SearchResults:
+    """
+    Lazily ranked results for a query that a Paginator can page through:
+    only the requested page is sorted and fetched from the database.
+    """
+
+    def __init__(self, query, serialize=None, only=None):
+        self.query = query
+        self.serialize = serialize
+        # Movie columns to read, None for all
+        self.only = only
+        # Set when nothing matched `query` and a spelling correction did
+        self.corrected_query = None
+        self._total = None
+
+    def count(self):
+        if self._total is None:
+            _, _, self._total, self.corrected_query = fuzzy_search_movie_ids(self.query, 0, 0)
+        return self._total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        from .recommendation import movies_in_order
+
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, _ = key.indices(self.count())
+        movie_ids, _, self._total = search_movie_ids(self.corrected_query or self.query, start, max(stop - start, 0))
+        movies = movies_in_order(movie_ids, only=self.only)
+        return [self.serialize(movie) for movie in movies] if self.serialize else movies
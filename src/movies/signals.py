@@ -0,0 +1,91 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import autocomplete_changed
+from .cache import evict_user
+from .catalog import catalog_changed
+from .genres import sync_movie_genres
+from .incremental import rating_changed
+from .models import Movie, Rating, UserRecommendation, Watchlist
+from .popularity import popularity_changed
+from .rating_stats import apply_rating_change
+from .search import search_changed
+from .trending import trending_changed
+from .versions import MOVIES, bump
+
+
+def _invalidate_user(user_id):
+    rating_changed(user_id)
+    evict_user(user_id)
+    # Precomputed rows may now include the title just rated; serve this
+    # user live until the next batch run
+    UserRecommendation.objects.filter(user_id=user_id).delete()
+
+
+@receiver(pre_save, sender=Rating)
+def rating_saving(sender, instance, **kwargs):
+    # The stored aggregates need the stars (and movie) being replaced
+    previous = None
+    if instance.pk is not None:
+        previous = Rating.objects.filter(pk=instance.pk).values_list('movie_id', 'rating').first()
+    instance._previous_rating = previous
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if previous and previous[0] != instance.movie_id:
+        # Moved to another movie: the old one loses the rating
+        apply_rating_change(previous[0], old=previous[1])
+        popularity_changed(previous[0])
+        previous = None
+    apply_rating_change(instance.movie_id, old=previous[1] if previous else None, new=instance.rating)
+    _invalidate_user(instance.user_id)
+    popularity_changed(instance.movie_id, rated_at=instance.updated_at)
+    trending_changed(instance.movie_id, 'rating')
+    # Listings carry the aggregates; queued after the popularity refresh
+    bump()
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    apply_rating_change(instance.movie_id, old=instance.rating)
+    _invalidate_user(instance.user_id)
+    popularity_changed(instance.movie_id)
+    bump()
+
+
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+def watchlist_changed(sender, instance, **kwargs):
+    # Watchlisted titles feed the content strategy and are never recommended
+    evict_user(instance.user_id)
+    UserRecommendation.objects.filter(user_id=instance.user_id).delete()
+    if kwargs.get('created'):
+        trending_changed(instance.movie_id, 'watchlist')
+
+
+@receiver(pre_save, sender=Movie)
+def movie_saving(sender, instance, **kwargs):
+    # Incremented in the save's own UPDATE, so a stale instance never
+    # writes back an older version (and reuses its ETag)
+    if not instance._state.adding:
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def movie_changed(sender, instance, **kwargs):
+    catalog_changed()
+    autocomplete_changed()
+    search_changed(instance.id)
+    bump()
+    bump(MOVIES)
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, **kwargs):
+    sync_movie_genres([(instance.id, instance.genre)])
+    if not isinstance(instance.version, int):
+        instance.refresh_from_db(fields=['version'])
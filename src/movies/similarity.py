@@ -0,0 +1,268 @@
+import numpy as np
+import scipy.sparse as sp
+
+from .matrix import RatingMatrix
+
+
+class ItemSimilarityModel:
+    """
+    Item-item collaborative filtering model.
+
+    Similarities are kept as the item x item Gram matrix of the (optionally
+    mean-centred) rating matrix together with the inverse item norms, so that
+    cosine similarity is S = D G D with D = diag(inv_norms). Scoring a user is
+    then a single sparse product over the rows of the items they rated.
+
+    Keeping G rather than S makes rating changes cheap to apply: replacing a
+    user's row x with x' changes G by x'x'^T - xx^T, which only touches the
+    items that user rated. Such patches accumulate in a small delta matrix
+    that is folded into G once it grows past `compact_ratio` of G.
+    """
+
+    # Above this many rated items only the changed items' rows and columns
+    # are patched, ignoring the user's mean shift for the rest.
+    max_patch_items = 2000
+    compact_ratio = 0.1
+
+    def __init__(self, ratings, adjusted=True, workers=1):
+        self.ratings = ratings
+        self.adjusted = adjusted
+        self.movie_ids = ratings.movie_ids
+
+        centred = self._centre(ratings.matrix) if adjusted else ratings.matrix
+        self.gram = item_gram(centred, workers)
+        self.gram.eliminate_zeros()
+        self.diagonal = self.gram.diagonal().astype(np.float64)
+        self.inv_norms = self._inverse_norms(self.diagonal)
+        self.item_counts = ratings.item_counts()
+
+        # Users whose ratings changed since the build: user_id -> (items, ratings)
+        self.overrides = {}
+        self._delta_parts = []
+        self._delta = None
+
+    @classmethod
+    def from_db(cls, adjusted=True, workers=1):
+        return cls(RatingMatrix.from_db(), adjusted=adjusted, workers=workers)
+
+    @property
+    def n_items(self):
+        return len(self.movie_ids)
+
+    def _centre(self, matrix):
+        """Subtract each user's mean rating from their stored ratings."""
+        matrix = matrix.tocsr(copy=True).astype(np.float32)
+        counts = np.diff(matrix.indptr)
+        rows = np.repeat(np.arange(matrix.shape[0]), counts)
+        sums = np.bincount(rows, weights=matrix.data, minlength=matrix.shape[0])
+        means = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+        matrix.data -= means[rows].astype(np.float32)
+        return matrix
+
+    @staticmethod
+    def _inverse_norms(diagonal):
+        norms = np.sqrt(np.maximum(diagonal, 0))
+        return np.divide(1.0, norms, out=np.zeros_like(norms, dtype=np.float64), where=norms > 0)
+
+    def user_ratings(self, user_id):
+        """
+        Return (item indices, ratings) currently known for a user, or None.
+        """
+        user_id = str(user_id)
+        if user_id in self.overrides:
+            return self.overrides[user_id]
+        row = self.ratings.user_index(user_id)
+        if row is None:
+            return None
+        return self.ratings.user_row(row)
+
+    def user_profile(self, user_id):
+        """
+        Return (item indices, weights) describing a user's ratings, or None.
+        """
+        known = self.user_ratings(user_id)
+        if known is None or len(known[0]) == 0:
+            return None
+        items, values = known
+        return items, self._profile_weights(values)
+
+    def _centred(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.adjusted and len(values):
+            return values - values.mean()
+        return values
+
+    def update_user(self, user_id, movie_ids, ratings):
+        """
+        Replace a user's ratings and patch the Gram matrix in place.
+
+        Costs O(|items rated by the user|^2); movies that were not in the
+        catalog when the model was built are ignored until the next rebuild.
+        """
+        items = self.ratings.item_indices(movie_ids)
+        known = items >= 0
+        items = items[known]
+        values = np.asarray(ratings, dtype=np.float64)[known]
+        order = np.argsort(items)
+        items, values = items[order], values[order]
+
+        previous = self.user_ratings(user_id)
+        old_items, old_values = previous if previous is not None else (np.zeros(0, dtype=np.int64), np.zeros(0))
+        self.overrides[str(user_id)] = (items, values.astype(np.float32))
+
+        union = np.union1d(old_items, items)
+        if len(union) == 0:
+            return
+        old_pos = np.searchsorted(union, old_items)
+        new_pos = np.searchsorted(union, items)
+        old_present = np.zeros(len(union), dtype=bool)
+        new_present = np.zeros(len(union), dtype=bool)
+        old_present[old_pos] = True
+        new_present[new_pos] = True
+        old_raw = np.zeros(len(union))
+        new_raw = np.zeros(len(union))
+        old_raw[old_pos] = old_values
+        new_raw[new_pos] = values
+        old_vec = np.zeros(len(union))
+        new_vec = np.zeros(len(union))
+        old_vec[old_pos] = self._centred(old_values)
+        new_vec[new_pos] = self._centred(values)
+
+        changed = (old_raw != new_raw) | (old_present != new_present)
+        if len(union) > self.max_patch_items:
+            keep = np.flatnonzero(changed)
+            patch = np.zeros((len(union), len(union)))
+            patch[keep, :] = np.outer(new_vec[keep], new_vec) - np.outer(old_vec[keep], old_vec)
+            patch[:, keep] = patch[keep, :].T
+        else:
+            patch = np.outer(new_vec, new_vec) - np.outer(old_vec, old_vec)
+
+        rows, cols = np.nonzero(patch)
+        self._delta_parts.append((union[rows], union[cols], patch[rows, cols]))
+        self._delta = None
+
+        self.diagonal[union] += np.diag(patch)
+        self.inv_norms[union] = self._inverse_norms(self.diagonal[union])
+        self.item_counts[union] += new_present.astype(self.item_counts.dtype) - old_present
+
+        if self._delta_matrix().nnz > self.compact_ratio * self.gram.nnz + 1000:
+            self.compact()
+
+    def _delta_matrix(self):
+        if not self._delta_parts:
+            return None
+        if self._delta is None:
+            rows, cols, values = (np.concatenate(part) for part in zip(*self._delta_parts))
+            self._delta = sp.csr_matrix((values, (rows, cols)), shape=self.gram.shape)
+            self._delta_parts = [(rows, cols, values)]
+        return self._delta
+
+    def compact(self):
+        """Fold accumulated patches into the Gram matrix."""
+        delta = self._delta_matrix()
+        if delta is not None:
+            self.gram = (self.gram + delta).tocsr()
+            self.gram.eliminate_zeros()
+        self._delta_parts = []
+        self._delta = None
+
+    def _profile_weights(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not self.adjusted:
+            return values
+        weights = values - values.mean()
+        # A user who gave every title the same score has no relative
+        # preference, so fall back to their raw ratings as weights.
+        if not np.any(weights):
+            return values
+        return weights
+
+    def score_items(self, items, weights):
+        """
+        Score every item for a profile in one vectorised pass.
+
+        Equivalent to sum_j S[:, j] * w_j restricted to the rated items j.
+        """
+        items = np.asarray(items, dtype=np.int64)
+        if len(items) == 0:
+            return np.zeros(self.n_items)
+        scaled = np.asarray(weights, dtype=np.float64) * self.inv_norms[items]
+        scores = np.asarray(self.gram[items].T @ scaled).ravel()
+        delta = self._delta_matrix()
+        if delta is not None:
+            scores += np.asarray(delta[items].T @ scaled).ravel()
+        return scores * self.inv_norms
+
+    def similarity_rows(self, items):
+        """
+        Rows of the cosine similarity matrix S = D G D for the given items,
+        as a sparse (len(items), n_items) matrix.
+        """
+        items = np.asarray(items, dtype=np.int64)
+        rows = self.gram[items]
+        delta = self._delta_matrix()
+        if delta is not None:
+            rows = rows + delta[items]
+        return (sp.diags(self.inv_norms[items]) @ rows @ sp.diags(self.inv_norms)).tocsr()
+
+    def score_movies(self, user_id, movie_ids):
+        """Score the given movies for a user; unknown movies score 0."""
+        items = self.ratings.item_indices(movie_ids)
+        profile = self.user_profile(user_id)
+        if profile is None:
+            return np.zeros(len(items))
+        scores = self.score_items(*profile)
+        return np.where(items >= 0, scores[items], 0.0)
+
+    def recommend(self, user_id, n=10, exclude=None, popular_fill=True):
+        """
+        Return up to n ranked movie IDs for the user.
+
+        Items the user has rated are never returned; unless `popular_fill`
+        is off, remaining slots are filled with the most-rated titles.
+        """
+        profile = self.user_profile(user_id)
+        excluded = np.zeros(self.n_items, dtype=bool)
+        if exclude is not None:
+            indices = self.ratings.item_indices(exclude)
+            excluded[indices[indices >= 0]] = True
+
+        if profile is None:
+            scores = np.zeros(self.n_items)
+        else:
+            items, weights = profile
+            scores = self.score_items(items, weights)
+            excluded[items] = True
+
+        scores[excluded] = -np.inf
+        ranked = [i for i in top_k(scores, n) if scores[i] > 0]
+
+        if popular_fill and len(ranked) < n:
+            popularity = self.item_counts.astype(np.float64)
+            popularity[excluded] = -np.inf
+            popularity[ranked] = -np.inf
+            ranked += [i for i in top_k(popularity, n - len(ranked)) if np.isfinite(popularity[i])]
+
+        return self.movie_ids[ranked].tolist()
+
+
+def item_gram(matrix, workers=1):
+    """
+    Item x item Gram matrix X^T X of a user x item CSR matrix, split into
+    row blocks across `workers` processes when more than one is asked for.
+    """
+    if workers > 1:
+        from .parallel import parallel_gram
+        return parallel_gram(matrix, workers)
+    return (matrix.T @ matrix).tocsr()
+
+
+def top_k(scores, k):
+    """
+    Indices of the k largest scores, best first, via a partial sort.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
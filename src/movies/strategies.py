@@ -0,0 +1,392 @@
+import threading
+import time
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+
+from .similarity import top_k
+
+EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class RecommendationContext:
+    """
+    Per-request state shared by every strategy: who is asking, how many
+    titles they want, any query-time filters, and their rating/watchlist
+    history loaded at most once.
+    """
+
+    def __init__(self, user_id, num_recommendations, exclude=None, filters=None):
+        self.user_id = user_id
+        self.num_recommendations = num_recommendations
+        self.exclude = set(exclude or [])
+        self.filters = filters
+        self._rated = None
+        self._watchlist = None
+        self._allowed = None
+        # Scratch space for strategies to hand work from one stage to the next
+        self.cache = {}
+
+    @property
+    def pool_size(self):
+        """Candidates each strategy generates before filtering and re-ranking."""
+        pool = getattr(settings, 'RECOMMENDER_CANDIDATE_POOL', 300)
+        return max(self.num_recommendations * 10, pool)
+
+    @property
+    def catalog(self):
+        from .catalog import get_catalog_index
+
+        return get_catalog_index()
+
+    @property
+    def allowed(self):
+        """
+        Boolean mask over the catalog of movies that may be returned: passes
+        the filters, not rated, not on the watchlist, not excluded.
+        """
+        if self._allowed is None:
+            self._allowed = self.catalog.mask(self.filters, self.excluded_ids())
+        return self._allowed
+
+    @property
+    def rated(self):
+        """{movie_id: rating} for the user, one query on first use."""
+        if self._rated is None:
+            if self.user_id is None:
+                self._rated = {}
+            else:
+                Rating = apps.get_model('movies', 'Rating')
+                self._rated = dict(Rating.objects.filter(user_id=self.user_id).values_list('movie_id', 'rating'))
+        return self._rated
+
+    @property
+    def watchlist(self):
+        if self._watchlist is None:
+            if self.user_id is None:
+                self._watchlist = []
+            else:
+                Watchlist = apps.get_model('movies', 'Watchlist')
+                self._watchlist = list(Watchlist.objects.filter(user_id=self.user_id).values_list('movie_id', flat=True))
+        return self._watchlist
+
+    def excluded_ids(self):
+        return np.fromiter(set(self.rated) | set(self.watchlist) | self.exclude, dtype=np.int64)
+
+
+class Strategy:
+    """
+    A source of recommendations, run in two stages:
+
+    * candidates(context) returns an array of movie IDs worth considering,
+      typically a few hundred (context.pool_size)
+    * score(context, candidates) re-ranks the candidates that survived the
+      request's filters, returning one score each, higher is better; scores
+      are min-max normalised before blending
+
+    Strategies that can rank the whole catalog cheaply may apply
+    context.allowed themselves so every candidate survives.
+
+    `fast` strategies are cheap enough to always run; the others are skipped
+    when the request's time budget is used up or their typical latency would
+    exceed what is left of it.
+    """
+
+    name = None
+    fast = False
+
+    def candidates(self, context):
+        raise NotImplementedError
+
+    def score(self, context, candidates):
+        raise NotImplementedError
+
+
+class StageStats:
+    """Running latency statistics for one strategy stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.skipped = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.ewma_ms = 0.0
+
+    def record(self, millis):
+        self.calls += 1
+        self.total_ms += millis
+        self.max_ms = max(self.max_ms, millis)
+        self.ewma_ms = millis if self.calls == 1 else 0.8 * self.ewma_ms + 0.2 * millis
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'mean_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'ewma_ms': round(self.ewma_ms, 3),
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+class RecommendationResult:
+    def __init__(self, movie_ids, timings, skipped, degraded, model_version=None):
+        self.movie_ids = movie_ids
+        # {strategy: {'candidates': ms, 'score': ms}}
+        self.timings = timings
+        self.skipped = skipped
+        self.degraded = degraded
+        self.model_version = model_version
+
+    def server_timing(self):
+        """Render the stage timings as a Server-Timing header value."""
+        parts = []
+        for name, stages in self.timings.items():
+            for stage, millis in stages.items():
+                parts.append(f'{name}-{stage};dur={millis:.2f}')
+        return ', '.join(parts)
+
+
+class StrategyRegistry:
+    """
+    Named strategies plus the blender that merges their score vectors.
+    """
+
+    def __init__(self):
+        self._strategies = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, strategy_class):
+        """Class decorator adding a strategy under its `name`."""
+        self._strategies[strategy_class.name] = strategy_class()
+        return strategy_class
+
+    def __contains__(self, name):
+        return name in self._strategies
+
+    def get(self, name):
+        return self._strategies[name]
+
+    def _stage_stats(self, name, stage):
+        with self._lock:
+            return self._stats.setdefault((name, stage), StageStats())
+
+    def stats(self):
+        """Process-wide latency statistics per strategy stage."""
+        with self._lock:
+            return {f'{name}.{stage}': stats.as_dict() for (name, stage), stats in sorted(self._stats.items())}
+
+    def _timed(self, name, stage, func, *args):
+        stats = self._stage_stats(name, stage)
+        started = time.perf_counter()
+        try:
+            return func(*args), (time.perf_counter() - started) * 1000
+        except Exception as e:
+            stats.errors += 1
+            print(f"Error in {name} strategy ({stage}): {str(e)}")
+            return None, (time.perf_counter() - started) * 1000
+        finally:
+            stats.record((time.perf_counter() - started) * 1000)
+
+    def _expected_ms(self, name):
+        return sum(self._stage_stats(name, stage).ewma_ms for stage in ('candidates', 'score'))
+
+    def recommend(self, user_id, num_recommendations=5, exclude=None, weights=None, budget_ms=None,
+                  filters=None):
+        """
+        Run the weighted strategies and blend them into a ranked list of
+        movie IDs. Fast strategies always run first; slower ones only while
+        the budget allows.
+
+        Candidates are checked against the catalog mask for `filters` and the
+        user's rated and watchlisted titles before scoring, so only
+        survivors are re-ranked.
+        """
+        if weights is None:
+            weights = getattr(settings, 'RECOMMENDER_STRATEGY_WEIGHTS', {})
+        if budget_ms is None:
+            budget_ms = getattr(settings, 'RECOMMENDER_TIME_BUDGET_MS', 50)
+
+        context = RecommendationContext(user_id, num_recommendations, exclude, filters)
+        active = [(name, w) for name, w in weights.items() if w > 0 and name in self._strategies]
+        active.sort(key=lambda item: not self._strategies[item[0]].fast)
+
+        started = time.perf_counter()
+        timings, skipped, scored = {}, [], []
+
+        for name, weight in active:
+            strategy = self._strategies[name]
+            elapsed = (time.perf_counter() - started) * 1000
+            if not strategy.fast and elapsed + self._expected_ms(name) > budget_ms:
+                self._stage_stats(name, 'candidates').skipped += 1
+                # Let the estimate decay while skipped, so one slow call (a
+                # cold model load, say) does not shut a strategy out for good
+                for stage in ('candidates', 'score'):
+                    self._stage_stats(name, stage).ewma_ms *= 0.8
+                skipped.append(name)
+                continue
+
+            candidates, candidate_ms = self._timed(name, 'candidates', strategy.candidates, context)
+            timings[name] = {'candidates': candidate_ms}
+            if candidates is None or len(candidates) == 0:
+                continue
+
+            candidates = np.asarray(candidates, dtype=np.int64)
+            candidates = candidates[context.catalog.allowed(candidates, context.allowed)]
+            if len(candidates) == 0:
+                continue
+            scores, score_ms = self._timed(name, 'score', strategy.score, context, candidates)
+            timings[name]['score'] = score_ms
+            if scores is not None:
+                scored.append((weight, candidates, np.asarray(scores, dtype=np.float64)))
+
+        movie_ids = blend(scored, num_recommendations)
+        return RecommendationResult(movie_ids, timings, skipped, degraded=bool(skipped))
+
+
+def blend(scored, n, excluded=None):
+    """
+    Weighted sum of min-max normalised strategy scores over the union of
+    their candidates. `scored` is a list of (weight, movie_ids, scores).
+    """
+    if not scored:
+        return []
+
+    universe = np.unique(np.concatenate([candidates for _, candidates, _ in scored]))
+    total = np.zeros(len(universe))
+    for weight, candidates, scores in scored:
+        finite = np.isfinite(scores)
+        if not finite.any():
+            continue
+        low, high = scores[finite].min(), scores[finite].max()
+        normalised = np.where(finite, (scores - low) / (high - low) if high > low else 1.0, 0.0)
+        np.add.at(total, np.searchsorted(universe, candidates), weight * normalised)
+
+    if excluded is not None and len(excluded):
+        total[np.isin(universe, excluded)] = -np.inf
+    ranked = [i for i in top_k(total, n) if np.isfinite(total[i])]
+    return universe[ranked].tolist()
+
+
+registry = StrategyRegistry()
+
+
+@registry.register
+class CollaborativeStrategy(Strategy):
+    """ALS factors when the user has them, otherwise item-item similarity."""
+
+    name = 'collaborative'
+
+    def _model(self, context):
+        from .recommendation import get_factor_model, get_similarity_model
+
+        factor_model = get_factor_model()
+        if factor_model is not None and factor_model.user_state(context.user_id) is not None:
+            return factor_model
+        model = get_similarity_model()
+        if model.user_ratings(context.user_id) is not None:
+            return model
+        return None
+
+    def candidates(self, context):
+        model = self._model(context)
+        if model is None:
+            return EMPTY
+        if hasattr(model, 'user_state'):
+            nprobe = getattr(settings, 'RECOMMENDER_ANN_NPROBE', 8)
+            return model.recommend(context.user_id, context.pool_size, nprobe=nprobe)
+        return model.recommend(context.user_id, context.pool_size, popular_fill=False)
+
+    def score(self, context, candidates):
+        return self._model(context).score_movies(context.user_id, candidates)
+
+
+@registry.register
+class ContentStrategy(Strategy):
+    """TF-IDF similarity to the titles the user rated highly or saved."""
+
+    name = 'content'
+
+    def _liked(self, context):
+        liked = [movie_id for movie_id, rating in context.rated.items() if rating >= 4]
+        return liked + list(context.watchlist)
+
+    def candidates(self, context):
+        from .recommendation import get_content_model
+
+        content_model = get_content_model()
+        liked = self._liked(context)
+        if content_model is None or not liked:
+            return EMPTY
+        scores = content_model.score_profile(liked)
+        if scores is None:
+            return EMPTY
+        context.cache['content'] = (content_model, scores)
+        return content_model.movie_ids[[i for i in top_k(scores, context.pool_size) if scores[i] > 0]]
+
+    def score(self, context, candidates):
+        content_model, scores = context.cache['content']
+        return scores[content_model.item_indices(candidates)]
+
+
+@registry.register
+class PopularityStrategy(Strategy):
+    """
+    Bayesian-average popularity over the whole catalog; cheap, and the
+    safety net for every request. The filter mask is applied before taking
+    the top, so it fills any number of slots the filters leave open.
+    """
+
+    name = 'popularity'
+    fast = True
+
+    def candidates(self, context):
+        catalog = context.catalog
+        scores = np.where(context.allowed, catalog.popularity, -np.inf)
+        return catalog.movie_ids[[i for i in top_k(scores, context.pool_size) if np.isfinite(scores[i])]]
+
+    def score(self, context, candidates):
+        catalog = context.catalog
+        return catalog.popularity[catalog.item_indices(candidates)]
+
+
+@registry.register
+class TrendingStrategy(Strategy):
+    """
+    Titles with the most decayed rating and watchlist activity over the last
+    RECOMMENDER_TRENDING_DAYS days, read from the MovieTrending table.
+    """
+
+    name = 'trending'
+    refresh_seconds = 60
+
+    def __init__(self):
+        self._activity = {}
+        self._limit = 0
+        self._loaded_at = 0.0
+
+    def _top_activity(self, limit):
+        """Movie ID -> current activity for the `limit` hottest titles."""
+        if limit > self._limit or time.time() - self._loaded_at >= self.refresh_seconds:
+            from .trending import current_activity, current_hour, trending_queryset
+
+            hour = current_hour()
+            rows = trending_queryset(hour).values_list('movie_id', 'score')[:limit]
+            self._activity = {movie_id: current_activity(score, hour) for movie_id, score in rows}
+            self._limit = limit
+            self._loaded_at = time.time()
+        return self._activity
+
+    def candidates(self, context):
+        activity = self._top_activity(context.pool_size)
+        if not activity:
+            return EMPTY
+        # Insertion order is hottest first
+        return np.fromiter(activity.keys(), dtype=np.int64)[:context.pool_size]
+
+    def score(self, context, candidates):
+        activity = self._top_activity(context.pool_size)
+        return np.log1p([activity.get(movie_id, 0.0) for movie_id in candidates.tolist()])
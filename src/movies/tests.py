@@ -1,3 +1,1014 @@
-from django.test import TestCase
+import base64
+import json
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import autocomplete, catalog, recommendation, search, strategies, trending, views
+from .ann import IVFIndex, brute_force_search
+from .cache import bump_generation, evict_user, get_cached_recommendations
+from .catalog import RecommendationFilters, get_catalog_index
+from .content import ContentModel, update_content_index
+from .evaluation import Recommender, evaluate, rank_metrics, temporal_split
+from .factorization import train_als
+from .genres import find_genre, genre_counts, movies_in_genre, split_genres
+from .incremental import apply_logged_updates, log_position
+from .matrix import RatingMatrix
+from .models import Genre, Movie, MovieNeighbour, MoviePopularity, Rating, UserRecommendation
+from .neighbours import NeighbourScorer, refresh_neighbours
+from .pagination import decode_cursor, keyset_page
+from .parallel import parallel_gram
+from .popularity import recency_boost, refresh_movie_popularity
+from .similarity import ItemSimilarityModel
+from .strategies import Strategy, StrategyRegistry, blend
+
+
+def make_movies(n, genre='Drama'):
+    return [
+        Movie.objects.create(
+            title=f'Movie {i}', genre=genre, release_date=date(2000 + i % 20, 1, 1),
+            description=f'A film about thing {i}',
+        )
+        for i in range(n)
+    ]
+
+
+class SyntheticDataTests(TestCase):
+    def test_generated_ratings_carry_updated_at(self):
+        make_movies(10)
+        call_command('generate_synthetic_data', users=20, ratings=100, watchlist=10, stdout=StringIO())
+
+        ratings = Rating.objects.filter(user_id__startswith='synthetic-')
+        self.assertGreater(ratings.count(), 0)
+        for rating in ratings:
+            self.assertEqual(rating.updated_at, rating.created_at)
+
+
+def clerk_user(user_id):
+    """The kind of user object ClerkJWTAuthentication returns."""
+    return type('ClerkUser', (), {'id': user_id, 'is_authenticated': True})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.movie = make_movies(1)[0]
+        self.rating = Rating.objects.create(user_id='u1', movie=self.movie, rating=4, review='Good')
+        self.factory = APIRequestFactory()
+
+    def get_ratings(self, **headers):
+        request = self.factory.get(f'/api/ratings/movie/{self.movie.id}/', **headers)
+        force_authenticate(request, user=clerk_user('u1'))
+        return views.get_movie_ratings(request, movie_id=self.movie.id)
+
+    def test_unchanged_movie_answers_304(self):
+        response = self.client.get(f'/api/movies/{self.movie.id}/', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            again = self.client.get(
+                f'/api/movies/{self.movie.id}/', HTTP_HOST='localhost', HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(again.status_code, 304)
+
+    def test_review_only_edit_changes_ratings_etag(self):
+        first = self.get_ratings()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.get_ratings(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.rating.review = 'Better on a second watch'
+        self.rating.save()
+
+        response = self.get_ratings(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['ratings'][0]['review'], 'Better on a second watch')
+
+    def test_rating_delete_changes_catalog_etag(self):
+        first = self.client.get('/api/movies/', HTTP_HOST='localhost')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rating.delete()
+        response = self.client.get('/api/movies/', HTTP_HOST='localhost', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+def cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        make_movies(25)
+
+    def test_pages_cover_every_movie_once_in_both_directions(self):
+        seen, pages, next_cursor = [], [], None
+        while True:
+            rows, next_cursor, prev_cursor = keyset_page(Movie.objects.values(), 'release_date', next_cursor, 10)
+            seen.extend(row['id'] for row in rows)
+            pages.append((rows, prev_cursor))
+            if next_cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(Movie.objects.values_list('id', flat=True)))
+        self.assertEqual(seen, list(Movie.objects.order_by('-release_date', 'id').values_list('id', flat=True)))
+
+        back, _, _ = keyset_page(Movie.objects.values(), 'release_date', pages[-1][1], 10)
+        self.assertEqual(back, pages[-2][0])
+
+    def test_malformed_cursors_are_rejected(self):
+        for payload in [
+            ['release_date', 'next', 5, 1],
+            ['release_date', 'next', 'not a date', 1],
+            ['title', 'next', ['a'], 1],
+            [['title'], 'next', 'a', 1],
+            ['rating', 'sideways', 1.0, 1],
+            ['title', 'next'],
+            5,
+        ]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor(payload))
+        with self.assertRaises(ValueError):
+            decode_cursor('!!not base64!!')
+
+    def test_api_answers_400_for_a_tampered_cursor(self):
+        response = self.client.get(
+            '/api/movies/', {'sort': 'release_date', 'cursor': cursor(['release_date', 'next', 5, 1])},
+            HTTP_HOST='localhost',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_returns_cards_unless_fields_are_asked_for(self):
+        response = self.client.get('/api/movies/', {'sort': 'release_date', 'limit': 5}, HTTP_HOST='localhost')
+        results = response.json()['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(set(results[0]), {'id', 'title', 'genre', 'poster_url'})
+
+        response = self.client.get(
+            '/api/movies/', {'cursor': response.json()['next'], 'sort': 'release_date', 'limit': 5,
+                             'fields': 'title,release_date'},
+            HTTP_HOST='localhost',
+        )
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title', 'release_date'})
+
+        response = self.client.get('/api/movies/', {'fields': 'budget'}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 400)
+
+    def test_html_list_pages_by_cursor(self):
+        first = self.client.get('/movies/', HTTP_HOST='localhost')
+        self.assertEqual(len(first.context['movies']), 12)
+        self.assertIsNone(first.context['prev_cursor'])
+
+        second = self.client.get('/movies/', {'cursor': first.context['next_cursor']}, HTTP_HOST='localhost')
+        self.assertEqual(len(second.context['movies']), 12)
+        self.assertIsNotNone(second.context['prev_cursor'])
+        first_ids = {movie['id'] for movie in first.context['movies']}
+        self.assertFalse(first_ids & {movie['id'] for movie in second.context['movies']})
+
+
+# One in-memory cache per test run, so cached lists never leak between runs
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecommendationCacheTests(TestCase):
+    def setUp(self):
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return {'run': self.computed}, True
+
+    def test_evictions_and_generation_bumps_reach_cached_lists(self):
+        self.assertEqual(get_cached_recommendations('cache-user', 5, self.compute), {'run': 1})
+        self.assertEqual(get_cached_recommendations('cache-user', 5, self.compute), {'run': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            evict_user('cache-user')
+        self.assertEqual(get_cached_recommendations('cache-user', 5, self.compute), {'run': 2})
+
+        bump_generation()
+        self.assertEqual(get_cached_recommendations('cache-user', 5, self.compute), {'run': 3})
+
+    def test_flush_warns_when_the_cache_is_process_local(self):
+        out = StringIO()
+        call_command('recommendation_cache', flush=True, stdout=out)
+        self.assertIn('local to this process', out.getvalue())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PrecomputedRecommendationTests(TestCase):
+    def test_precomputed_list_sends_no_server_timing(self):
+        movies = make_movies(3)
+        for rank, movie in enumerate(movies, start=1):
+            UserRecommendation.objects.create(
+                user_id='precomputed-user', movie=movie, rank=rank, version='batch-1', generated_at=timezone.now(),
+            )
+
+        request = APIRequestFactory().get('/api/recommendations/')
+        force_authenticate(request, user=clerk_user('precomputed-user'))
+        response = views.get_movie_recommendations(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([movie['id'] for movie in response.data['recommendations']], [movie.id for movie in movies])
+        self.assertEqual(response['X-Model-Version'], 'precomputed=batch-1')
+        self.assertNotIn('Server-Timing', response)
+
+
+class PopularityTests(TestCase):
+    def test_recency_boost_is_bounded_and_decays(self):
+        now = timezone.now()
+        weight = settings.RECOMMENDER_POPULARITY_RECENCY_WEIGHT
+        half_life = timedelta(days=settings.RECOMMENDER_POPULARITY_RECENCY_DAYS)
+
+        self.assertAlmostEqual(recency_boost(now, now), weight)
+        self.assertAlmostEqual(recency_boost(now - half_life, now), weight / 2)
+        self.assertLess(recency_boost(now - 20 * half_life, now), weight / 1000)
+        self.assertEqual(recency_boost(None, now), 0.0)
+
+    def test_scores_stay_on_the_rating_scale(self):
+        movie = make_movies(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user_id='u1', movie=movie, rating=5)
+        movie.refresh_from_db()
+        self.assertLessEqual(movie.popularity_score, 5 + settings.RECOMMENDER_POPULARITY_RECENCY_WEIGHT)
+
+    def test_refresh_reads_the_stored_aggregates_not_the_ratings(self):
+        movie = make_movies(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user_id='u1', movie=movie, rating=4)
+            Rating.objects.create(user_id='u2', movie=movie, rating=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            refresh_movie_popularity([movie.id])
+        self.assertFalse(any('movies_rating' in query['sql'] for query in queries.captured_queries))
+
+        row = MoviePopularity.objects.get(movie=movie, genre='')
+        self.assertEqual((row.rating_count, row.rating_sum), (2, 6))
+        self.assertIsNotNone(row.last_rated_at)
+
+    def test_moving_a_rating_refreshes_both_movies(self):
+        old, new = make_movies(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            rating = Rating.objects.create(user_id='u1', movie=old, rating=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.movie = new
+            rating.save()
+
+        self.assertFalse(MoviePopularity.objects.filter(movie=old).exists())
+        self.assertEqual(MoviePopularity.objects.get(movie=new, genre='').rating_count, 1)
+        old.refresh_from_db()
+        self.assertEqual(old.popularity_score, 0)
+
+
+def use_temp_artifacts(test):
+    """Publish artifacts into a directory removed after the test."""
+    artifacts = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, artifacts, ignore_errors=True)
+    override = override_settings(RECOMMENDER_ARTIFACT_DIR=artifacts)
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+class ContentIndexTests(TestCase):
+    def setUp(self):
+        use_temp_artifacts(self)
+        self.movies = make_movies(5)
+
+    def test_published_content_model_picks_up_edits_and_deletes(self):
+        update_content_index(full=True)
+        edited, deleted = self.movies[0], self.movies[4]
+        edited.description = 'Pirates sail for treasure'
+        edited.save()
+        deleted.delete()
+
+        path, changed = update_content_index()
+        self.assertGreaterEqual(changed, 2)
+        model = ContentModel.load(path)
+        self.assertNotIn(deleted.id, model.movie_ids.tolist())
+        self.assertIn('pirates', model.vocabulary)
+        self.assertGreater(model.counts[model.item_indices([edited.id])[0], model.term_index['pirates']], 0)
+
+    def test_rating_a_movie_does_not_reindex_it_but_editing_it_does(self):
+        # Saved well before the snapshot, outside the catch-up overlap
+        Movie.objects.update(content_updated_at=timezone.now() - timedelta(days=1))
+        update_content_index(full=True)
+        search.update_search_index(full=True)
+        movie = self.movies[0]
+
+        Rating.objects.create(user_id='u1', movie=movie, rating=5)
+        call_command('backfill_rating_stats', stdout=StringIO())
+        path, changed = update_content_index()
+        self.assertEqual(changed, 0)
+        self.assertEqual(search.update_search_index()[1], 0)
+
+        movie.refresh_from_db()
+        movie.description = 'Pirates sail for treasure'
+        movie.save()
+        path, changed = update_content_index()
+        self.assertEqual(changed, 1)
+        self.assertIn('pirates', ContentModel.load(path).vocabulary)
+
+
+@override_settings(RECOMMENDER_ARTIFACT_CHECK_SECONDS=0)
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        use_temp_artifacts(self)
+        self.movies = make_movies(5)
+        search.get_search_index(force=True)
+
+    def save_elsewhere(self, change):
+        """Apply a change as another worker would: only the shared counter tells this one."""
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        search._pending.clear()
+
+    def test_edits_and_deletes_from_other_workers_are_caught_up(self):
+        edited, deleted = self.movies[0], self.movies[1]
+
+        def change():
+            edited.title = 'Zeppelin Odyssey'
+            edited.save()
+            deleted.delete()
+        self.save_elsewhere(change)
+
+        self.assertEqual(search.search_movie_ids('zeppelin')[0], [edited.id])
+        # Neither the old title of the edited movie nor the deleted one match
+        self.assertEqual(sorted(search.search_movie_ids('movie')[0]), [movie.id for movie in self.movies[2:]])
+        self.assertNotIn(deleted.id, search.get_search_index().movie_ids.tolist())
+
+    def test_published_snapshot_picks_up_edits_and_deletes(self):
+        search.update_search_index(full=True)
+        edited, deleted = self.movies[2], self.movies[3]
+        edited.description = 'A submarine heist'
+        edited.save()
+        deleted.delete()
+
+        path, changed = search.update_search_index()
+        self.assertGreaterEqual(changed, 2)
+        index = search.SearchIndex.load(path)
+        self.assertEqual(index.search('submarine')[0], [edited.id])
+        self.assertNotIn(deleted.id, index.movie_ids.tolist())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class IncrementalUpdateTests(TestCase):
+    def setUp(self):
+        self.movies = make_movies(4)
+        for i, movie in enumerate(self.movies[:3]):
+            Rating.objects.create(user_id='existing', movie=movie, rating=3 + i % 2)
+        self.addCleanup(setattr, recommendation, '_model', None)
+
+    def rate(self, user_id, movie, stars):
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user_id=user_id, movie=movie, rating=stars)
+
+    def test_every_worker_applies_a_logged_rating(self):
+        # Two workers' models, built before the write
+        first = recommendation._build_similarity_model()
+        second = recommendation._build_similarity_model()
+        self.rate('new-user', self.movies[0], 5)
+
+        self.assertEqual(apply_logged_updates([first]), [])
+        self.assertEqual(apply_logged_updates([second]), [])
+        for model in (first, second):
+            self.assertIsNotNone(model.user_ratings('new-user'))
+            self.assertEqual(model.rating_log.position, log_position())
+
+    def test_lost_entries_rebuild_in_the_background(self):
+        model = recommendation.get_similarity_model(force=True)
+        self.rate('new-user', self.movies[0], 5)
+        self.rate('new-user', self.movies[1], 4)
+        cache.delete(f'ratings:log:{log_position() - 1}')
+
+        with mock.patch.object(recommendation.threading, 'Thread') as thread:
+            # The first read may race a writer; the second knows it is lost
+            recommendation.apply_rating_updates()
+            thread.assert_not_called()
+            recommendation.apply_rating_updates()
+            thread.return_value.start.assert_called_once()
+        recommendation._rebuild_lock.release()
+        self.assertEqual(model.rating_log.position, log_position())
+
+    def test_expired_model_keeps_serving_while_it_rebuilds(self):
+        model = recommendation.get_similarity_model(force=True)
+        recommendation._model_built_at = 0.0
+
+        with mock.patch.object(recommendation, 'connection'):
+            with mock.patch.object(recommendation.threading, 'Thread') as thread:
+                self.assertIs(recommendation.get_similarity_model(), model)
+                thread.return_value.start.assert_called_once()
+            recommendation._rebuild_similarity_model()
+
+        self.assertIsNot(recommendation.get_similarity_model(), model)
+        self.assertFalse(recommendation._rebuild_lock.locked())
+
+
+class ExportTests(TestCase):
+    def get(self, name, **params):
+        request = APIRequestFactory().get(f'/api/export/{name}/', params)
+        force_authenticate(request, user=clerk_user('exporter'))
+        return views.export_data(request, name=name)
+
+    def export(self, name, **params):
+        response = self.get(name, **params)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        return response, rows
+
+    def test_since_returns_only_rows_changed_after_it(self):
+        old, new = make_movies(2)
+        Rating.objects.create(user_id='u1', movie=old, rating=3)
+        Rating.objects.filter(movie=old).update(updated_at=timezone.now() - timedelta(days=2))
+
+        response, rows = self.export('ratings')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(rows), 1)
+        self.assertNotIn('user_email', rows[0])
+
+        Rating.objects.create(user_id='u2', movie=new, rating=5)
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        _, rows = self.export('ratings', since=since)
+        self.assertEqual([(row['user_id'], row['movie_id']) for row in rows], [('u2', new.id)])
+
+    def test_unreadable_since_is_rejected(self):
+        self.assertEqual(self.get('ratings', since='yesterday').status_code, 400)
+
+
+class SearchViewTests(TestCase):
+    def setUp(self):
+        use_temp_artifacts(self)
+        self.movie = Movie.objects.create(
+            title='Pirates of the Lagoon', genre='Adventure', release_date=date(2003, 7, 9),
+            description='A crew hunts for buried treasure', rating_sum=9, rating_count=2,
+        )
+        make_movies(3)
+        search.get_search_index(force=True)
+
+    def search(self, **params):
+        request = APIRequestFactory().get('/api/movies/search/', params)
+        force_authenticate(request, user=clerk_user('searcher'))
+        return views.search_movies(request)
+
+    def test_results_default_to_the_compact_card(self):
+        response = self.search(q='pirates')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'genre', 'poster_url', 'score'})
+
+    def test_fields_pick_the_payload(self):
+        response = self.search(q='pirates', fields='title,average_rating')
+        self.assertEqual(response.data['results'], [
+            {'id': self.movie.id, 'title': self.movie.title, 'average_rating': 4.5,
+             'score': response.data['results'][0]['score']},
+        ])
+        self.assertEqual(self.search(q='pirates', fields='budget').status_code, 400)
+
+    def test_misspelt_query_is_corrected(self):
+        response = self.search(q='pirtaes')
+        self.assertEqual(response.data['corrected_query'], 'pirates')
+        self.assertEqual([movie['id'] for movie in response.data['results']], [self.movie.id])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.darkness, self.dark = (
+            Movie.objects.create(title=title, genre='Drama', release_date=date(2008, 1, 1))
+            for title in ['Darkness Falls', 'The Dark Knight']
+        )
+        # Popularity comes from ratings, so the later, better-rated title ranks first
+        with self.captureOnCommitCallbacks(execute=True):
+            for user_id in ['u1', 'u2', 'u3']:
+                Rating.objects.create(user_id=user_id, movie=self.dark, rating=5)
+            Rating.objects.create(user_id='u1', movie=self.darkness, rating=1)
+        autocomplete.get_autocomplete_index(force=True)
+
+    def suggest(self, q):
+        response = self.client.get('/api/movies/autocomplete/', {'q': q}, HTTP_HOST='localhost')
+        return [movie['id'] for movie in response.json()['results']]
+
+    def test_prefixes_match_any_title_word_most_popular_first(self):
+        self.assertEqual(self.suggest('dar'), [self.dark.id, self.darkness.id])
+        self.assertEqual(self.suggest('kni'), [self.dark.id])
+        # A finished word no longer matches longer words
+        self.assertEqual(self.suggest('dark '), [self.dark.id])
+
+
+class RatingAggregateTests(TestCase):
+    def test_writes_keep_the_stored_aggregates_in_step(self):
+        movie = make_movies(1)[0]
+        first = Rating.objects.create(user_id='u1', movie=movie, rating=4)
+        Rating.objects.create(user_id='u2', movie=movie, rating=2)
+        first.rating = 5
+        first.save()
+        movie.refresh_from_db()
+        self.assertEqual((movie.rating_sum, movie.rating_count), (7, 2))
+        self.assertEqual(movie.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        first.delete()
+        movie.refresh_from_db()
+        self.assertEqual((movie.rating_sum, movie.rating_count), (2, 1))
+        self.assertEqual(movie.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+
+        Movie.objects.filter(id=movie.id).update(rating_sum=0, rating_count=0, ratings_2=0)
+        call_command('backfill_rating_stats', stdout=StringIO())
+        movie.refresh_from_db()
+        self.assertEqual((movie.rating_sum, movie.rating_count, movie.ratings_2), (2, 1, 1))
+
+
+class TrendingTests(TestCase):
+    def test_recent_activity_outranks_decayed_activity_until_it_expires(self):
+        older, newer = make_movies(2)
+        now = timezone.now()
+        for _ in range(2):
+            trending.record_activity(older.id, 'rating', when=now - timedelta(hours=30))
+        trending.record_activity(newer.id, 'rating', when=now)
+
+        # Two events 30 hours ago (half-life 24h) weigh less than one now
+        self.assertEqual([movie.id for movie in trending.trending_movies(2)], [newer.id, older.id])
+        self.assertAlmostEqual(
+            trending.current_activity(trending.trending_queryset().get(movie=older).score), 2 * 0.5 ** (30 / 24), 2,
+        )
+
+        trending.expire_trending(hour=trending.current_hour(now) + trending.window_hours() - 1)
+        self.assertEqual([movie.id for movie in trending.trending_movies(2)], [newer.id])
+
+
+def rate_blocks(movies, users=12):
+    """Two taste groups: even users like the first half of `movies`, odd users the second."""
+    half = len(movies) // 2
+    for user in range(users):
+        liked, other = (movies[:half], movies[half:]) if user % 2 == 0 else (movies[half:], movies[:half])
+        for i, movie in enumerate(liked):
+            # Everyone leaves one liked title unrated, for the model to find
+            if i != user % half:
+                Rating.objects.create(user_id=f'user-{user}', movie=movie, rating=5)
+        Rating.objects.create(user_id=f'user-{user}', movie=other[0], rating=1)
+
+
+@override_settings(RECOMMENDER_ARTIFACT_CHECK_SECONDS=0, CACHES=TEST_CACHES)
+class FactorModelTests(TestCase):
+    def setUp(self):
+        use_temp_artifacts(self)
+        self.addCleanup(recommendation._artifact_models.clear)
+        self.movies = make_movies(8)
+        rate_blocks(self.movies)
+
+    def train(self, **options):
+        call_command('train_als', factors=4, iterations=10, stdout=StringIO(), **options)
+
+    def test_trained_factors_are_served_and_skip_rated_movies(self):
+        self.assertIsNone(recommendation.get_factor_model())
+        self.train()
+
+        model = recommendation.get_factor_model()
+        self.assertIsNotNone(model)
+        rated = set(Rating.objects.filter(user_id='user-0').values_list('movie_id', flat=True))
+        ranked = model.recommend('user-0', n=3)
+        self.assertFalse(rated & set(ranked))
+        # The one liked title user-0 left unrated comes first
+        self.assertEqual(ranked[0], self.movies[0].id)
+        self.assertIsNone(model.recommend('never-rated'))
+
+    def test_workers_switch_to_a_new_or_rolled_back_version(self):
+        self.train()
+        first = recommendation.get_factor_model()
+        self.train(seed=1)
+        second = recommendation.get_factor_model()
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(recommendation.model_version(), f'als={second.version}')
+
+        cached = get_cached_recommendations('user-0', 5, lambda: (second.version, True))
+        self.assertEqual(cached, second.version)
+
+        call_command('activate_artifact', 'als', first.version, stdout=StringIO())
+        self.assertEqual(recommendation.get_factor_model().version, first.version)
+        # Lists cached from the rolled-back version are not served again
+        cached = get_cached_recommendations('user-0', 5, lambda: (first.version, True))
+        self.assertEqual(cached, first.version)
+
+
+class ANNIndexTests(SimpleTestCase):
+    def test_probing_every_cell_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(500, 8)).astype(np.float32)
+        query = rng.normal(size=8).astype(np.float32)
+        index = IVFIndex.build(vectors, ids=np.arange(500) + 1000, n_lists=10)
+
+        exact, _ = brute_force_search(vectors, query, k=10, ids=np.arange(500) + 1000)
+        found, _ = index.search(query, k=10, nprobe=index.n_lists)
+        self.assertEqual(found.tolist(), exact.tolist())
+
+        found, _ = index.search(query, k=10, nprobe=index.n_lists, exclude=exact[:3])
+        self.assertEqual(found.tolist()[:7], exact.tolist()[3:])
+
+    def test_few_probes_keep_most_of_the_recall(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+        index = IVFIndex.build(vectors, n_lists=20)
+        recall = []
+        for query in rng.normal(size=(20, 16)).astype(np.float32):
+            exact, _ = brute_force_search(vectors, query, k=10)
+            found, _ = index.search(query, k=10, nprobe=8)
+            recall.append(len(set(found.tolist()) & set(exact.tolist())) / 10)
+        self.assertGreater(np.mean(recall), 0.6)
+
+
+class ParallelTrainingTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        dense = rng.integers(1, 6, size=(40, 15)) * (rng.random((40, 15)) < 0.3)
+        self.matrix = sp.csr_matrix(dense.astype(np.float32))
+
+    def test_parallel_gram_matches_the_serial_product(self):
+        gram = parallel_gram(self.matrix, workers=2)
+        np.testing.assert_allclose(gram.toarray(), (self.matrix.T @ self.matrix).toarray())
+
+    def test_als_factors_do_not_depend_on_worker_count(self):
+        serial = train_als(self.matrix, factors=4, iterations=3, workers=1)
+        parallel = train_als(self.matrix, factors=4, iterations=3, workers=2)
+        for one, two in zip(serial[:2], parallel[:2]):
+            self.assertTrue(np.allclose(one, two, atol=1e-5))
+        self.assertEqual(serial[2], parallel[2])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FilteredRecommendationTests(TestCase):
+    def setUp(self):
+        use_temp_artifacts(self)
+        self.addCleanup(setattr, recommendation, '_model', None)
+        self.dramas = make_movies(4, genre='Drama')
+        self.comedies = make_movies(4, genre='Comedy')
+        # make_movies dates them 2000 onwards; the first two of each are older
+        for movie in self.dramas[:2] + self.comedies[:2]:
+            movie.release_date = date(1995, 1, 1)
+            movie.save()
+        rate_blocks(self.dramas + self.comedies)
+        get_catalog_index(force=True)
+        recommendation.get_similarity_model(force=True)
+
+    def test_only_matching_unrated_movies_are_returned(self):
+        filters = RecommendationFilters(['comedy'], year_to=1999)
+        movies = recommendation.get_recommendations('user-0', 5, filters=filters)
+
+        rated = set(Rating.objects.filter(user_id='user-0').values_list('movie_id', flat=True))
+        allowed = {movie.id for movie in self.comedies[:2]} - rated
+        self.assertTrue(movies)
+        self.assertLessEqual({movie.id for movie in movies}, allowed)
+
+    def test_filters_come_from_query_params(self):
+        request = APIRequestFactory().get('/api/recommendations/', {'genre': 'Comedy,drama', 'year_from': '1990'})
+        filters = RecommendationFilters.from_query_params(request.GET)
+        self.assertEqual((filters.genres, filters.year_from, filters.year_to), (('comedy', 'drama'), 1990, None))
+
+        request = APIRequestFactory().get('/api/recommendations/', {'year_from': 'soon'})
+        force_authenticate(request, user=clerk_user('user-0'))
+        self.assertEqual(views.get_movie_recommendations(request).status_code, 400)
+
+
+class ItemSimilarityModelTests(SimpleTestCase):
+    # user -> {movie_id: stars}
+    RATINGS = {
+        'a': {10: 5, 20: 4, 30: 1},
+        'b': {10: 4, 20: 5, 40: 2},
+        'c': {20: 2, 30: 5, 40: 4, 50: 3},
+        'd': {10: 3, 30: 4, 50: 5},
+    }
+
+    def build(self, ratings):
+        triples = [(user, movie, stars) for user, movies in ratings.items() for movie, stars in movies.items()]
+        return ItemSimilarityModel(RatingMatrix.from_triples(*zip(*triples)))
+
+    def assert_same_model(self, patched, rebuilt):
+        delta = patched._delta_matrix()
+        gram = patched.gram + delta if delta is not None else patched.gram
+        np.testing.assert_allclose(gram.toarray(), rebuilt.gram.toarray(), atol=1e-5)
+        np.testing.assert_allclose(patched.inv_norms, rebuilt.inv_norms, atol=1e-6)
+        np.testing.assert_array_equal(patched.item_counts, rebuilt.item_counts)
+        for user in rebuilt.ratings.user_ids:
+            np.testing.assert_allclose(
+                patched.score_items(*patched.user_profile(user)),
+                rebuilt.score_items(*rebuilt.user_profile(user)), atol=1e-5,
+            )
+
+    def test_update_user_matches_a_rebuild(self):
+        ratings = {user: dict(movies) for user, movies in self.RATINGS.items()}
+        model = self.build(ratings)
+        for change in [
+            lambda r: r['a'].update({40: 3}),   # add
+            lambda r: r['b'].update({20: 1}),   # change
+            lambda r: r['c'].pop(30),           # delete
+        ]:
+            change(ratings)
+            for user, movies in ratings.items():
+                model.update_user(user, list(movies), list(movies.values()))
+            self.assert_same_model(model, self.build(ratings))
+
+    def test_score_items_is_adjusted_cosine(self):
+        model = self.build(self.RATINGS)
+        dense = model.ratings.matrix.toarray().astype(np.float64)
+        rated = dense > 0
+        means = dense.sum(axis=1) / rated.sum(axis=1)
+        centred = np.where(rated, dense - means[:, None], 0.0)
+        norms = np.linalg.norm(centred, axis=0)
+        cosine = (centred.T @ centred) / np.outer(norms, norms)
+
+        items, weights = model.user_profile('a')
+        np.testing.assert_allclose(model.score_items(items, weights), cosine[:, items] @ weights, atol=1e-5)
+
+    def test_recommend_skips_rated_and_fills_with_popular(self):
+        model = self.build(self.RATINGS)
+        ranked = model.recommend('a', n=2)
+        self.assertEqual(len(ranked), 2)
+        self.assertFalse(set(ranked) & set(self.RATINGS['a']))
+        # Unknown users get the most-rated titles
+        self.assertEqual(model.recommend('nobody', n=2), [10, 20])
+        self.assertEqual(model.recommend('a', n=5, popular_fill=False, exclude=[40]), [50])
+
+
+class NeighbourTests(TestCase):
+    def setUp(self):
+        use_temp_artifacts(self)
+        self.movies = make_movies(8)
+        with self.captureOnCommitCallbacks(execute=True):
+            rate_blocks(self.movies)
+
+    def stored(self):
+        return {
+            movie.id: list(MovieNeighbour.objects.filter(movie=movie).order_by('rank').values_list('neighbour_id', 'score'))
+            for movie in self.movies
+        }
+
+    def test_only_movies_with_changed_ratings_are_rescored(self):
+        self.assertEqual(refresh_neighbours(k=3), (8, 0))
+        self.assertEqual(refresh_neighbours(k=3)[0], 0)
+
+        changed = self.movies[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user_id='user-new', movie=changed, rating=1)
+            Rating.objects.create(user_id='user-new', movie=self.movies[7], rating=5)
+
+        scorer = NeighbourScorer.from_db()
+        with mock.patch.object(scorer, 'scores', wraps=scorer.scores) as scores:
+            rescored, _ = refresh_neighbours(k=3, scorer=scorer)
+        self.assertEqual(rescored, 2)
+        rows = np.concatenate([call.args[0] for call in scores.call_args_list])
+        self.assertEqual(sorted(scorer.movie_ids[rows].tolist()), [changed.id, self.movies[7].id])
+
+        # The rescored lists match a full run
+        patched = self.stored()
+        refresh_neighbours(k=3, full=True)
+        full = self.stored()
+        for movie_id in (changed.id, self.movies[7].id):
+            self.assertEqual([n for n, _ in patched[movie_id]], [n for n, _ in full[movie_id]])
+
+    def test_scores_are_sparse_without_self_similarity(self):
+        scorer = NeighbourScorer.from_db()
+        rows = np.arange(len(self.movies))
+        scores = scorer.scores(rows)
+        self.assertEqual(scores.shape, (len(rows), len(self.movies)))
+        self.assertFalse(scores.diagonal().any())
+        dense = scores.toarray()
+        np.testing.assert_allclose(dense, dense.T, atol=1e-6)
+
+    def test_similar_movies_endpoint_serves_stored_neighbours(self):
+        refresh_neighbours(k=3)
+        movie = self.movies[0]
+        expected = list(MovieNeighbour.objects.filter(movie=movie).order_by('rank').values_list('neighbour_id', flat=True))
+        self.assertTrue(expected)
+
+        request = APIRequestFactory().get(f'/api/movies/{movie.id}/similar/', {'limit': 2})
+        force_authenticate(request, user=clerk_user('user-0'))
+        response = views.get_similar_movies(request, movie_id=movie.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['similar']], expected[:2])
+
+        request = APIRequestFactory().get('/api/movies/0/similar/')
+        force_authenticate(request, user=clerk_user('user-0'))
+        self.assertEqual(views.get_similar_movies(request, movie_id=0).status_code, 404)
+
+
+class BlendTests(SimpleTestCase):
+    def test_scores_are_normalised_then_weighted(self):
+        first = ([1, 2, 3], [3.0, 2.0, 1.0])
+        second = ([2, 3, 4], [0.0, 5.0, 10.0])
+
+        # Normalised: 1 -> 1, 2 -> 0.5, 3 -> 0 and 2 -> 0, 3 -> 0.5, 4 -> 1
+        scored = [(0.8, np.array(first[0]), np.array(first[1])), (0.2, np.array(second[0]), np.array(second[1]))]
+        self.assertEqual(blend(scored, 4), [1, 2, 4, 3])
+        scored = [(0.2, np.array(first[0]), np.array(first[1])), (0.8, np.array(second[0]), np.array(second[1]))]
+        self.assertEqual(blend(scored, 4), [4, 3, 1, 2])
+        self.assertEqual(blend(scored, 4, excluded=[4]), [3, 1, 2])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TimeBudgetTests(TestCase):
+    def setUp(self):
+        use_temp_artifacts(self)
+        self.addCleanup(setattr, recommendation, '_model', None)
+        self.movies = make_movies(4)
+        get_catalog_index(force=True)
+        # A stubbed clock in milliseconds, advanced only by the strategies
+        self.now = 0.0
+        clock = mock.patch.object(strategies, 'time', mock.Mock(perf_counter=lambda: self.now / 1000))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.registry = StrategyRegistry()
+
+    def add(self, name, movie, cost_ms, fast=False):
+        """Register a strategy that takes cost_ms and only suggests `movie`."""
+        test = self
+
+        class Stub(Strategy):
+            def candidates(self, context):
+                test.now += cost_ms
+                return [movie.id]
+
+            def score(self, context, candidates):
+                return [1.0] * len(candidates)
+
+        Stub.name, Stub.fast = name, fast
+        self.registry.register(Stub)
+
+    def test_slow_strategies_are_skipped_once_the_budget_is_spent(self):
+        self.add('fast', self.movies[0], cost_ms=60, fast=True)
+        self.add('slow', self.movies[1], cost_ms=5)
+        weights = {'fast': 1.0, 'slow': 1.0}
+
+        result = self.registry.recommend('someone', 5, weights=weights, budget_ms=50)
+        self.assertEqual(result.movie_ids, [self.movies[0].id])
+        self.assertEqual(result.skipped, ['slow'])
+        self.assertTrue(result.degraded)
+
+        # With room left it runs, until its typical latency would overrun
+        result = self.registry.recommend('someone', 5, weights=weights, budget_ms=100)
+        self.assertFalse(result.degraded)
+        self.assertEqual(sorted(result.movie_ids), sorted([self.movies[0].id, self.movies[1].id]))
+        self.assertTrue(self.registry.recommend('someone', 5, weights=weights, budget_ms=64).degraded)
+
+    def test_degraded_lists_are_flagged_and_not_cached(self):
+        self.add('fast', self.movies[0], cost_ms=60, fast=True)
+        self.add('slow', self.movies[1], cost_ms=5)
+
+        request = APIRequestFactory().get('/api/recommendations/')
+        force_authenticate(request, user=clerk_user('someone'))
+        with override_settings(RECOMMENDER_STRATEGY_WEIGHTS={'fast': 1.0, 'slow': 1.0}, RECOMMENDER_TIME_BUDGET_MS=50):
+            with mock.patch.object(strategies, 'registry', self.registry):
+                response = views.get_movie_recommendations(request)
+                self.assertEqual(response['X-Recommendations-Degraded'], 'slow')
+                self.assertEqual([movie['id'] for movie in response.data['recommendations']], [self.movies[0].id])
+
+                started = self.now
+                views.get_movie_recommendations(request)
+        self.assertGreater(self.now, started)
+
+
+class EvaluationTests(SimpleTestCase):
+    def test_rank_metrics_by_hand(self):
+        # Hits at ranks 2 and 4; three relevant titles in all
+        precision, recall, ndcg = rank_metrics([1, 2, 3, 4], {2, 4, 9}, k=4)
+        self.assertAlmostEqual(precision, 0.5)
+        self.assertAlmostEqual(recall, 2 / 3)
+        dcg = 1 / np.log2(3) + 1 / np.log2(5)
+        idcg = 1 + 1 / np.log2(3) + 1 / np.log2(4)
+        self.assertAlmostEqual(ndcg, dcg / idcg)
+
+        self.assertEqual(rank_metrics([1, 2], set(), k=2), (0.0, 0.0, 0.0))
+        self.assertAlmostEqual(rank_metrics([5, 6], {5, 6}, k=2)[2], 1.0)
+
+    def test_temporal_split_has_no_leakage(self):
+        users = ['a', 'b'] * 5
+        movies = list(range(10))
+        timestamps = [10, 3, 7, 1, 9, 5, 2, 8, 6, 4]
+        train, (test_users, test_movies, _), cutoff = temporal_split(
+            users, movies, [4.0] * 10, timestamps, test_fraction=0.2
+        )
+
+        by_movie = dict(zip(movies, timestamps))
+        self.assertEqual(sorted(test_movies.tolist()), [0, 4])
+        self.assertEqual(sorted(train.movie_ids.tolist()), [1, 2, 3, 5, 6, 7, 8, 9])
+        self.assertLess(max(by_movie[m] for m in train.movie_ids.tolist()), min(by_movie[m] for m in test_movies.tolist()))
+        self.assertTrue(all(by_movie[m] <= cutoff for m in train.movie_ids.tolist()))
+        self.assertEqual(test_users.tolist(), ['a', 'a'])
+
+    def test_evaluate_averages_over_users(self):
+        class Fixed(Recommender):
+            def recommend(self, user_id, seen, n):
+                return np.array([{'a': 3, 'b': 4}[user_id], 5]), None
+
+        train = RatingMatrix.from_triples(['a', 'b'], [1, 2], [5.0, 5.0])
+        # a's 3 is relevant; b's 4 is rated too low and 6 is never suggested
+        test = (np.array(['a', 'b', 'b']), np.array([3, 4, 6]), np.array([5.0, 2.0, 4.0]))
+        result = evaluate(Fixed(), train, test, ['a', 'b'], k=2, n_catalog=6)
+
+        self.assertEqual(result['users'], 2)
+        self.assertEqual(result['precision@2'], 0.25)
+        self.assertEqual(result['recall@2'], 0.5)
+        self.assertEqual(result['ndcg@2'], 0.5)
+        self.assertEqual(result['coverage'], 0.5)
+
+
+class HomePageTests(TestCase):
+    def test_trending_cards_show_the_average_rating(self):
+        movie = make_movies(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user_id='u1', movie=movie, rating=4)
+            Rating.objects.create(user_id='u2', movie=movie, rating=5)
+
+        response = self.client.get('/', HTTP_HOST='localhost')
+        self.assertEqual([m.id for m in response.context['trending_movies']], [movie.id])
+        self.assertContains(response, '<i class="fas fa-star"></i> 4.5')
+
+
+class GenreTests(TestCase):
+    def test_split_genres_keeps_first_spelling_and_order(self):
+        self.assertEqual(split_genres(' Drama, comedy ,drama,, Sci-Fi'), ['Drama', 'comedy', 'Sci-Fi'])
+        self.assertEqual(split_genres(None), [])
+
+    def test_saves_link_movies_to_shared_genres(self):
+        first = Movie.objects.create(title='One', genre='Drama, Comedy', release_date=date(2000, 1, 1))
+        second = Movie.objects.create(title='Two', genre='comedy', release_date=date(2001, 1, 1))
+        self.assertEqual(Genre.objects.count(), 2)
+        self.assertEqual(list(movies_in_genre(find_genre(' COMEDY '))), [first, second])
+        self.assertEqual(genre_counts(), [('Comedy', 2), ('Drama', 1)])
+
+        first.genre = 'Thriller'
+        first.save()
+        self.assertEqual(genre_counts(), [('Comedy', 1), ('Thriller', 1)])
+        self.assertFalse(find_genre('Drama').movie_links.exists())
+
+    def test_lookups_match_the_key_exactly(self):
+        Movie.objects.create(title='One', genre='Science Fiction', release_date=date(2000, 1, 1))
+        with CaptureQueriesContext(connection) as queries:
+            genre = find_genre('science fiction')
+        self.assertEqual(genre.name, 'Science Fiction')
+        self.assertIn('"key" = ', queries[0]['sql'])
+
+
+class GenreMigrationTests(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('movies', target)])
+        return executor.loader.project_state([('movies', target)]).apps
+
+    def test_0008_splits_existing_genre_strings(self):
+        self.addCleanup(self.migrate, MigrationLoader(connection).graph.leaf_nodes('movies')[0][1])
+        old_apps = self.migrate('0007_trending')
+        OldMovie = old_apps.get_model('movies', 'Movie')
+        OldMovie.objects.create(title='One', genre='Drama, Comedy', release_date=date(2000, 1, 1))
+        OldMovie.objects.create(title='Two', genre='comedy,drama', release_date=date(2001, 1, 1))
+        OldMovie.objects.create(title='Three', genre='', release_date=date(2002, 1, 1))
+
+        new_apps = self.migrate('0008_genre')
+        Genre = new_apps.get_model('movies', 'Genre')
+        MovieGenre = new_apps.get_model('movies', 'MovieGenre')
+        self.assertEqual(sorted(Genre.objects.values_list('name', flat=True)), ['Comedy', 'Drama'])
+        self.assertEqual(MovieGenre.objects.count(), 4)
+
+
+@override_settings(RECOMMENDER_ARTIFACT_CHECK_SECONDS=0)
+class CatalogIndexTests(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, catalog, '_index', None)
+
+    def test_movies_added_by_other_workers_pass_filters(self):
+        catalog.get_catalog_index(force=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            movie = make_movies(1, genre='Comedy')[0]
+        # Only the shared MOVIES counter tells this worker, not its local hook
+        catalog._index_built_at = time.time()
+
+        index = catalog.get_catalog_index()
+        mask = index.mask(RecommendationFilters(['comedy']))
+        self.assertEqual(index.allowed([movie.id], mask).tolist(), [True])
+
+    def test_year_bounds_exclude_undated_movies(self):
+        # Year 0 marks a movie without a release date
+        index = catalog.CatalogIndex([1, 2], ['drama'], np.ones((2, 1), dtype=np.uint64), [2000, 0], [0, 0])
+
+        for filters in [RecommendationFilters(year_to=2010), RecommendationFilters(year_from=1900)]:
+            self.assertEqual(index.mask(filters).tolist(), [True, False])
+        self.assertEqual(index.mask(RecommendationFilters(['drama'])).tolist(), [True, True])
+
+    def test_genres_come_from_the_link_table(self):
+        movie = Movie.objects.create(title='Linked', genre='Science Fiction', release_date=date(2001, 1, 1))
+        # The display string no longer names the genre; the link still does
+        Movie.objects.filter(id=movie.id).update(genre='Space')
+        index = get_catalog_index(force=True)
+
+        self.assertEqual(index.genre_names, ['science fiction'])
+        mask = index.mask(RecommendationFilters(['Science Fiction']))
+        self.assertEqual(index.allowed([movie.id], mask).tolist(), [True])
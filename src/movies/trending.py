@@ -0,0 +1,195 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Buckets are numbered in hours from this instant
+TRENDING_EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def current_hour(now=None):
+    now = now or timezone.now()
+    return int((now - TRENDING_EPOCH).total_seconds() // 3600)
+
+
+def window_hours():
+    return getattr(settings, 'RECOMMENDER_TRENDING_DAYS', 7) * 24
+
+
+def half_life_hours():
+    return getattr(settings, 'RECOMMENDER_TRENDING_HALF_LIFE_HOURS', 24)
+
+
+def activity_weight(kind):
+    """Weight of one 'rating' or 'watchlist' event."""
+    weights = getattr(settings, 'RECOMMENDER_TRENDING_WEIGHTS', {'rating': 1.0, 'watchlist': 0.5})
+    return weights.get(kind, 0.0)
+
+
+def decayed_score(buckets):
+    """
+    Trending score from (hour, activity) buckets.
+
+    Activity is decayed *forward*: an event in hour h counts
+    2 ** (h / half-life) rather than 2 ** ((h - now) / half-life). Every
+    score then carries the same factor 2 ** (-now / half-life), so rows
+    written at different times still rank correctly by the stored value and
+    nothing has to be rewritten as time passes. Kept as a log2 so it never
+    overflows. Returns None for no activity.
+    """
+    half_life = half_life_hours()
+    terms = [math.log2(activity) + hour / half_life for hour, activity in buckets if activity > 0]
+    if not terms:
+        return None
+    top = max(terms)
+    return top + math.log2(sum(2 ** (term - top) for term in terms))
+
+
+def current_activity(score, hour=None):
+    """Activity the stored score amounts to now, in decayed events."""
+    hour = current_hour() if hour is None else hour
+    return 2 ** (score - hour / half_life_hours())
+
+
+def refresh_movie_trending(movie_ids, hour=None):
+    """
+    Recompute the trending rows of the given movies from their buckets
+    inside the window. Movies with no activity left drop out.
+    """
+    TrendingBucket = apps.get_model('movies', 'TrendingBucket')
+    MovieTrending = apps.get_model('movies', 'MovieTrending')
+
+    movie_ids = list(set(movie_ids))
+    start = (current_hour() if hour is None else hour) - window_hours()
+    buckets = {}
+    rows = TrendingBucket.objects.filter(movie_id__in=movie_ids, hour__gt=start)
+    for movie_id, bucket_hour, activity in rows.values_list('movie_id', 'hour', 'activity'):
+        buckets.setdefault(movie_id, []).append((bucket_hour, activity))
+
+    trending = []
+    for movie_id, movie_buckets in buckets.items():
+        score = decayed_score(movie_buckets)
+        if score is not None:
+            trending.append(MovieTrending(
+                movie_id=movie_id, score=score, last_hour=max(h for h, _ in movie_buckets),
+            ))
+
+    with transaction.atomic():
+        MovieTrending.objects.filter(movie_id__in=movie_ids).delete()
+        MovieTrending.objects.bulk_create(trending)
+    return len(trending)
+
+
+def record_activity(movie_id, kind, when=None):
+    """
+    Add one event to a movie's bucket for the current hour with a single
+    UPDATE (an INSERT for the hour's first event), then rescore the movie
+    from its at most window-many buckets.
+    """
+    TrendingBucket = apps.get_model('movies', 'TrendingBucket')
+    weight = activity_weight(kind)
+    if weight <= 0:
+        return
+    hour = current_hour(when)
+
+    bucket = TrendingBucket.objects.filter(movie_id=movie_id, hour=hour)
+    if not bucket.update(activity=F('activity') + weight):
+        try:
+            with transaction.atomic():
+                TrendingBucket.objects.create(movie_id=movie_id, hour=hour, activity=weight)
+        except IntegrityError:
+            # Another request created the bucket first
+            bucket.update(activity=F('activity') + weight)
+    refresh_movie_trending([movie_id])
+
+
+def trending_changed(movie_id, kind):
+    """Record activity once the current transaction commits."""
+    def record():
+        try:
+            record_activity(movie_id, kind)
+        except Exception as e:
+            print(f"Error recording trending activity for movie {movie_id}: {str(e)}")
+
+    transaction.on_commit(record)
+
+
+def expire_trending(hour=None):
+    """
+    Slide the window: drop buckets that fell out of it and rescore the
+    movies that lost some, so scores only cover the last
+    RECOMMENDER_TRENDING_DAYS. Returns (buckets deleted, movies rescored).
+    """
+    TrendingBucket = apps.get_model('movies', 'TrendingBucket')
+    MovieTrending = apps.get_model('movies', 'MovieTrending')
+
+    hour = current_hour() if hour is None else hour
+    start = hour - window_hours()
+    expired = TrendingBucket.objects.filter(hour__lte=start)
+    movie_ids = list(expired.values_list('movie_id', flat=True).distinct())
+    deleted, _ = expired.delete()
+    MovieTrending.objects.filter(last_hour__lte=start).delete()
+    if movie_ids:
+        refresh_movie_trending(movie_ids, hour=hour)
+    return deleted, len(movie_ids)
+
+
+def rebuild_trending(batch_size=5000):
+    """
+    Rebuild buckets and scores from Rating.created_at and
+    Watchlist.added_at within the window, e.g. after bulk imports that
+    bypass the signals.
+    """
+    Rating = apps.get_model('movies', 'Rating')
+    Watchlist = apps.get_model('movies', 'Watchlist')
+    TrendingBucket = apps.get_model('movies', 'TrendingBucket')
+    MovieTrending = apps.get_model('movies', 'MovieTrending')
+
+    hour = current_hour()
+    since = TRENDING_EPOCH + timedelta(hours=hour - window_hours() + 1)
+    activity = {}
+    for model, field, kind in [(Rating, 'created_at', 'rating'), (Watchlist, 'added_at', 'watchlist')]:
+        weight = activity_weight(kind)
+        if weight <= 0:
+            continue
+        rows = model.objects.filter(**{f'{field}__gte': since}).values_list('movie_id', field)
+        for movie_id, when in rows.iterator(chunk_size=20000):
+            key = (movie_id, current_hour(when))
+            activity[key] = activity.get(key, 0.0) + weight
+
+    by_movie = {}
+    for (movie_id, bucket_hour), value in activity.items():
+        by_movie.setdefault(movie_id, []).append((bucket_hour, value))
+    trending = [
+        MovieTrending(movie_id=movie_id, score=decayed_score(buckets), last_hour=max(h for h, _ in buckets))
+        for movie_id, buckets in by_movie.items()
+    ]
+
+    with transaction.atomic():
+        TrendingBucket.objects.all().delete()
+        MovieTrending.objects.all().delete()
+        TrendingBucket.objects.bulk_create([
+            TrendingBucket(movie_id=movie_id, hour=bucket_hour, activity=value)
+            for (movie_id, bucket_hour), value in activity.items()
+        ], batch_size=batch_size)
+        MovieTrending.objects.bulk_create(trending, batch_size=batch_size)
+    return len(activity), len(trending)
+
+
+def trending_queryset(hour=None):
+    """Movies active inside the window, hottest first; served by the -score index."""
+    MovieTrending = apps.get_model('movies', 'MovieTrending')
+    hour = current_hour() if hour is None else hour
+    return MovieTrending.objects.filter(last_hour__gt=hour - window_hours()).order_by('-score')
+
+
+def trending_movies(num_movies=10, exclude=None):
+    """Return the currently trending Movie objects."""
+    rows = trending_queryset().select_related('movie')
+    if exclude:
+        rows = rows.exclude(movie_id__in=list(exclude))
+    return [row.movie for row in rows[:num_movies]]
@@ -5,9 +5,13 @@ from . import views
 urlpatterns = [
     path('movies/', views.movie_list, name='movie_list'),
     path('movies/<int:movie_id>/', views.movie_detail, name='movie_detail'),
+    path('movies/<int:movie_id>/similar/', views.get_similar_movies, name='get_similar_movies'),
     path('movies/search/', views.search_movies, name='search_movies'),
+    path('movies/autocomplete/', views.autocomplete_movies, name='autocomplete_movies'),
+    path('movies/trending/', views.get_trending_movies, name='get_trending_movies'),
     path('movies/genres/', views.get_all_genres, name='get_all_genres'),
     path('movies/genre/<str:genre>/', views.get_movies_by_genre, name='get_movies_by_genre'),
+    path('export/<str:name>/', views.export_data, name='export_data'),
 
     path('api/ratings/add/', views.add_rating, name='add_rating'),
     path('ratings/update/', views.update_rating, name='update_rating'),
@@ -0,0 +1,85 @@
+from functools import wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+CATALOG = 'catalog'
+# Bumped by Movie saves and deletes only; in-process text indexes watch it
+MOVIES = 'movies'
+
+
+def bump(name=CATALOG):
+    """Increment a change counter once the current transaction commits."""
+    def _bump():
+        CatalogVersion = apps.get_model('movies', 'CatalogVersion')
+        updated = CatalogVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=Now())
+        if not updated:
+            CatalogVersion.objects.get_or_create(name=name, defaults={'version': 1})
+
+    # After commit, so concurrent writers never queue on the counter's row lock
+    transaction.on_commit(_bump)
+
+
+def counter(name=CATALOG):
+    """(version, last modified) of a change counter; (0, None) before the first bump."""
+    CatalogVersion = apps.get_model('movies', 'CatalogVersion')
+    row = CatalogVersion.objects.filter(name=name).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+def catalog_stamp(**view_kwargs):
+    """The catalog counter; takes, and ignores, the view's URL arguments."""
+    return counter(CATALOG)
+
+
+def movie_stamp(movie_id):
+    """(version, last modified) of one movie, or None if it does not exist."""
+    Movie = apps.get_model('movies', 'Movie')
+    return Movie.objects.filter(id=movie_id).values_list('version', 'updated_at').first()
+
+
+def conditional(stamp, tag, public=True):
+    """
+    Answer If-None-Match / If-Modified-Since with a 304 from `stamp(**kwargs)`
+    alone, before the view runs any of its queries, and send the ETag,
+    Last-Modified and Cache-Control that let clients and caches revalidate.
+
+    `tag` is formatted with the URL arguments and the version, e.g.
+    'movie-{movie_id}-v{version}'. Views of authenticated data pass
+    public=False; shared caches never store those responses.
+    """
+    def _stamp(request, **kwargs):
+        # Both of condition()'s callbacks read the same row; fetch it once
+        if not hasattr(request, '_version_stamp'):
+            request._version_stamp = stamp(**kwargs)
+        return request._version_stamp
+
+    def etag(request, *args, **kwargs):
+        current = _stamp(request, **kwargs)
+        return tag.format(version=current[0], **kwargs) if current else None
+
+    def last_modified(request, *args, **kwargs):
+        current = _stamp(request, **kwargs)
+        return current[1] if current else None
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if public:
+                    max_age = settings.RECOMMENDER_HTTP_MAX_AGE
+                    patch_cache_control(response, public=True, max_age=max_age, s_maxage=max_age)
+                else:
+                    patch_cache_control(response, private=True, no_cache=True)
+                    patch_vary_headers(response, ['Authorization'])
+            return response
+        return wrapper
+    return decorator
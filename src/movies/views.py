@@ -1,8 +1,8 @@
-from django.db.models import Q
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .auth import ClerkJWTAuthentication
+from .versions import catalog_stamp, conditional, movie_stamp
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -18,26 +18,58 @@ from django.apps import apps
 def get_movie_recommendations(request):
     try:
         # Import recommendation function
-        from .recommendation import get_recommendations
+        from .cache import get_cached_recommendations
+        from .recommendation import get_user_recommendations, model_version
+        
+        from .catalog import RecommendationFilters
+        from .fieldsets import movie_columns, parse_fields, serialize_movie
         
         # Get the user ID directly from Clerk authentication
-        clerk_user_id = request.user.get('id')
+        clerk_user_id = request.user.id
+        live = []
         
-        # Get recommendations using the Clerk user ID
-        recommended_movies = get_recommendations(clerk_user_id)
+        # Optional ?genre=, ?year_from= and ?year_to= restrictions
+        try:
+            filters = RecommendationFilters.from_query_params(request.query_params)
+        except ValueError:
+            return Response({"error": "year_from and year_to must be integers"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Serialize the movies
-        movies_data = []
-        for movie in recommended_movies:
-            movies_data.append({
-                "id": movie.id,
-                "title": movie.title,
-                "genre": movie.genre,
-                "poster_url": movie.poster_url,
-                "description": movie.description
-            })
+        # Card fields unless ?fields= asks for others
+        try:
+            fields = parse_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        def compute():
+            # Serve the precomputed list, scoring live only if there is none
+            recommended_movies = get_user_recommendations(
+                clerk_user_id, result=live, filters=filters, only=movie_columns(fields)
+            )
+            
+            # Serialize the movies
+            movies_data = [serialize_movie(movie, fields) for movie in recommended_movies]
+            payload = {
+                "recommendations": movies_data,
+                "model_version": live[0].model_version if live else model_version(),
+            }
+            return payload, not (live and live[0].degraded)
         
-        return Response({"recommendations": movies_data})
+        payload = get_cached_recommendations(
+            clerk_user_id, 5, compute, namespace=f'api:{filters.cache_key()}:{",".join(fields)}'
+        )
+        
+        response = Response({"recommendations": payload["recommendations"]})
+        # Which published models produced this list, even when served from cache
+        response['X-Model-Version'] = payload["model_version"]
+        if live:
+            # Per-strategy stage latencies, and which strategies the time budget
+            # cut; precomputed lists ran no strategies and send no header
+            server_timing = live[0].server_timing()
+            if server_timing:
+                response['Server-Timing'] = server_timing
+            if live[0].degraded:
+                response['X-Recommendations-Degraded'] = ','.join(live[0].skipped)
+        return response
     
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -48,11 +80,79 @@ def get_movie_recommendations(request):
 def protected_view(request):
     return Response({"message": "This is a protected view. You are authenticated!"})
 
+# Conditional GETs are answered from the version stamps alone; see versions.py
+@conditional(catalog_stamp, 'catalog-v{version}')
 def movie_list(request):
+    from .fieldsets import movie_columns, parse_fields, serialize_movie
+    from .genres import find_genre, movies_in_genre
+    from .pagination import SORTS, keyset_page
+
     Movie = apps.get_model('movies', 'Movie')
-    movies = list(Movie.objects.all().values())
-    return JsonResponse(movies, safe=False)
+    
+    sort = request.GET.get('sort', 'title')
+    if sort not in SORTS:
+        return JsonResponse({"error": f"sort must be one of: {', '.join(SORTS)}"}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+    # Compact cards by default; ?fields= asks for more (or fewer) columns
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    movies = Movie.objects.all()
+    genre = request.GET.get('genre')
+    if genre:
+        genre_obj = find_genre(genre)
+        movies = movies_in_genre(genre_obj) if genre_obj else Movie.objects.none()
+    
+    # Sorted and paged in SQL; ?cursor= seeks from the previous page's
+    # last (or first) row, so deep pages cost the same as the first
+    try:
+        # The sort column is loaded too, for the page cursors
+        movies = movies.only(*movie_columns(fields), SORTS[sort][0])
+        rows, next_cursor, prev_cursor = keyset_page(movies, sort, request.GET.get('cursor'), limit)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    results = [serialize_movie(movie, fields) for movie in rows]
+    return JsonResponse({"results": results, "next": next_cursor, "prev": prev_cursor})
+
+def autocomplete_movies(request):
+    from .autocomplete import suggest_movies
 
+    try:
+        limit = max(int(request.GET.get('limit', 10)), 1)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+
+    # Answered from the in-process prefix index, without a database query
+    query = request.GET.get('q', '')
+    return JsonResponse({"query": query, "results": suggest_movies(query, limit)})
+
+@api_view(['GET'])
+def export_data(request, name):
+    from django.http import StreamingHttpResponse
+    from django.utils import timezone
+    from .export import EXPORTS, export_rows, ndjson_lines, parse_since
+
+    if name not in EXPORTS:
+        return Response({"error": f"Unknown export: {name}"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        since = parse_since(request.query_params['since']) if request.query_params.get('since') else None
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Taken before the first row is read: pass it back as ?since= next time
+    # to pick up everything changed while this export was streaming
+    started_at = timezone.now()
+    response = StreamingHttpResponse(ndjson_lines(export_rows(name, since)), content_type='application/x-ndjson')
+    response['X-Export-Started-At'] = started_at.isoformat()
+    response['Content-Disposition'] = f'attachment; filename="{name}.ndjson"'
+    return response
+
+@conditional(movie_stamp, 'movie-{movie_id}-v{version}')
 def movie_detail(request, movie_id):
     Movie = apps.get_model('movies', 'Movie')
     movie = get_object_or_404(Movie, id=movie_id)
@@ -63,6 +163,63 @@ def movie_detail(request, movie_id):
         "description": movie.description
     })
 
+@api_view(['GET'])
+def get_trending_movies(request):
+    try:
+        from .trending import current_activity, current_hour, trending_queryset, window_hours
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Top rows of the MovieTrending score index; Rating is never scanned
+        hour = current_hour()
+        movies_data = []
+        for row in trending_queryset(hour).select_related('movie')[:limit]:
+            movies_data.append({
+                "id": row.movie.id,
+                "title": row.movie.title,
+                "genre": row.movie.genre,
+                "poster_url": row.movie.poster_url,
+                "activity": round(current_activity(row.score, hour), 3)
+            })
+
+        return Response({"window_days": window_hours() // 24, "results": movies_data})
+
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def get_similar_movies(request, movie_id):
+    try:
+        Movie = apps.get_model('movies', 'Movie')
+        from .neighbours import stored_neighbours
+
+        if not Movie.objects.filter(id=movie_id).exists():
+            return Response({"error": "Movie not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Precomputed by refresh_similar_movies; one indexed query per request
+        similar_data = []
+        for row in stored_neighbours(movie_id, limit):
+            similar_data.append({
+                "id": row.neighbour.id,
+                "title": row.neighbour.title,
+                "genre": row.neighbour.genre,
+                "poster_url": row.neighbour.poster_url,
+                "score": round(row.score, 4)
+            })
+
+        return Response({"movie_id": movie_id, "similar": similar_data})
+
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @csrf_exempt
 def add_rating(request):
     if request.method == 'POST':
@@ -155,24 +312,24 @@ def remove_from_watchlist(request):
 def get_user_watchlist(request):
     try:
         Watchlist = apps.get_model('movies', 'Watchlist')
+        from .fieldsets import movie_columns, parse_fields, serialize_movie
+        
+        try:
+            fields = parse_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Get the user ID from Clerk authentication
         clerk_user_id = request.user.get('id')
         
-        # Get watchlist items for this user
-        watchlist_items = Watchlist.objects.filter(user_id=clerk_user_id)
+        # Get watchlist items for this user, joined to just the movie
+        # columns the requested fields need
+        watchlist_items = Watchlist.objects.filter(user_id=clerk_user_id).select_related('movie').only(
+            'movie_id', *movie_columns(fields, prefix='movie__')
+        )
         
         # Serialize the watchlist movies
-        movies_data = []
-        for item in watchlist_items:
-            movie = item.movie
-            movies_data.append({
-                "id": movie.id,
-                "title": movie.title,
-                "genre": movie.genre,
-                "poster_url": movie.poster_url,
-                "description": movie.description
-            })
+        movies_data = [serialize_movie(item.movie, fields) for item in watchlist_items]
         
         return Response({"watchlist": movies_data})
     
@@ -183,30 +340,41 @@ def get_user_watchlist(request):
 # Remove authentication and permission classes for search
 def search_movies(request):
     try:
-        Movie = apps.get_model('movies', 'Movie')
+        from .fieldsets import movie_columns, parse_fields, serialize_movie
+        from .recommendation import movies_in_order
+        from .search import fuzzy_search_movie_ids
         
         query = request.query_params.get('q', '')
         if not query:
             return Response({"error": "Search query is required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Search for movies by title or genre
-        movies = Movie.objects.filter(
-            Q(title__icontains=query) | 
-            Q(genre__icontains=query)
-        )
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fields = parse_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Serialize the movies
-        movies_data = []
-        for movie in movies:
-            movies_data.append({
-                "id": movie.id,
-                "title": movie.title,
-                "genre": movie.genre,
-                "poster_url": movie.poster_url,
-                "description": movie.description
-            })
+        # BM25 over title, genre and description from the in-memory index;
+        # only the requested page is read from the database. Typos are
+        # corrected when the query as typed matches nothing
+        movie_ids, scores, total, corrected = fuzzy_search_movie_ids(query, (page - 1) * page_size, page_size)
+        relevance = dict(zip(movie_ids, scores))
         
-        return Response({"results": movies_data})
+        # Serialize the movies, reading only the requested columns
+        movies_data = []
+        for movie in movies_in_order(movie_ids, only=movie_columns(fields)):
+            movie_data = serialize_movie(movie, fields)
+            movie_data["score"] = round(relevance[movie.id], 4)
+            movies_data.append(movie_data)
+        
+        response = {"results": movies_data, "count": total, "page": page, "page_size": page_size}
+        if corrected:
+            response["corrected_query"] = corrected
+        return Response(response)
     
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -285,6 +453,7 @@ def get_user_ratings(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@conditional(movie_stamp, 'ratings-{movie_id}-v{version}', public=False)
 def get_movie_ratings(request, movie_id):
     try:
         Movie = apps.get_model('movies', 'Movie')
@@ -293,18 +462,10 @@ def get_movie_ratings(request, movie_id):
         # Get the movie
         movie = get_object_or_404(Movie, id=movie_id)
         
-        # Get all ratings for this movie
+        # Get all ratings for this movie; the average comes from the
+        # aggregates stored on the movie
         ratings = Rating.objects.filter(movie=movie)
         
-        # Calculate average rating
-        total_rating = 0
-        count = 0
-        for rating in ratings:
-            total_rating += rating.rating
-            count += 1
-        
-        avg_rating = total_rating / count if count > 0 else 0
-        
         # Serialize the ratings
         ratings_data = []
         for rating in ratings:
@@ -324,8 +485,9 @@ def get_movie_ratings(request, movie_id):
                 "poster_url": movie.poster_url,
                 "description": movie.description
             },
-            "average_rating": avg_rating,
-            "ratings_count": count,
+            "average_rating": movie.average_rating,
+            "ratings_count": movie.rating_count,
+            "rating_histogram": movie.rating_histogram,
             "ratings": ratings_data
         })
     
@@ -335,29 +497,30 @@ def get_movie_ratings(request, movie_id):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@conditional(catalog_stamp, 'catalog-v{version}', public=False)
 def get_movies_by_genre(request, genre):
     try:
-        Movie = apps.get_model('movies', 'Movie')
+        from .fieldsets import movie_columns, parse_fields, serialize_movie
+        from .genres import find_genre, movies_in_genre
         
-        # Get all movies with the specified genre
-        movies = Movie.objects.filter(genre__icontains=genre)
+        try:
+            fields = parse_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Resolve the name in the small Genre table, then join through the
+        # (genre, movie) index
+        genre_obj = find_genre(genre)
+        movies = movies_in_genre(genre_obj).only(*movie_columns(fields)) if genre_obj else []
         
-        if not movies.exists():
+        if not movies:
             return Response({"message": "No movies found for this genre"}, status=status.HTTP_404_NOT_FOUND)
         
         # Serialize the movies
-        movies_data = []
-        for movie in movies:
-            movies_data.append({
-                "id": movie.id,
-                "title": movie.title,
-                "genre": movie.genre,
-                "poster_url": movie.poster_url,
-                "description": movie.description
-            })
+        movies_data = [serialize_movie(movie, fields) for movie in movies]
         
         return Response({
-            "genre": genre,
+            "genre": genre_obj.name,
             "count": len(movies_data),
             "movies": movies_data
         })
@@ -366,17 +529,15 @@ def get_movies_by_genre(request, genre):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@conditional(catalog_stamp, 'catalog-v{version}', public=False)
 def get_all_genres(request):
     try:
-        Movie = apps.get_model('movies', 'Movie')
-        
-        # Get all unique genres from the movies
-        all_genres = Movie.objects.values_list('genre', flat=True).distinct()
+        from .genres import genre_counts
         
-        # Convert to a list and sort alphabetically
-        genres_list = sorted(list(all_genres))
+        # Every genre with its number of movies, from one aggregate query
+        counts = genre_counts()
         
-        return Response({"genres": genres_list})
+        return Response({"genres": [name for name, _ in counts], "counts": dict(counts)})
     
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -164,3 +164,72 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Caching
+# Per-user recommendation lists. Invalidation bumps counters in the cache
+# from other processes (management commands, other workers), so the backend
+# must be shared: Redis when REDIS_URL is set, otherwise files. A per-process
+# LocMemCache would never see those bumps and keep serving stale lists
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', '/tmp/recommenderx-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# Recommendation engine
+# Seconds an in-process similarity model is served before a background rebuild;
+# rating changes reach every worker's models sooner through the shared cache
+RECOMMENDER_MODEL_TTL = int(os.getenv('RECOMMENDER_MODEL_TTL', '3600'))
+# Versioned on-disk model artifacts (ALS factors, indexes) shared by all workers
+RECOMMENDER_ARTIFACT_DIR = os.getenv('RECOMMENDER_ARTIFACT_DIR', os.path.join(BASE_DIR, 'artifacts'))
+# Seconds between a worker's checks of each artifact's "current" pointer
+RECOMMENDER_ARTIFACT_CHECK_SECONDS = float(os.getenv('RECOMMENDER_ARTIFACT_CHECK_SECONDS', '2'))
+# IVF cells probed per ANN query; higher trades latency for recall
+RECOMMENDER_ANN_NPROBE = int(os.getenv('RECOMMENDER_ANN_NPROBE', '8'))
+# Blend weight per recommendation strategy; 0 disables a strategy
+RECOMMENDER_STRATEGY_WEIGHTS = {
+    'collaborative': 1.0,
+    'content': 0.4,
+    'popularity': 0.1,
+    'trending': 0.1,
+}
+# Candidates each strategy generates before filtering and re-ranking
+RECOMMENDER_CANDIDATE_POOL = int(os.getenv('RECOMMENDER_CANDIDATE_POOL', '300'))
+# Live scoring budget; slow strategies are skipped once it would be exceeded
+RECOMMENDER_TIME_BUDGET_MS = float(os.getenv('RECOMMENDER_TIME_BUDGET_MS', '50'))
+# Sliding window of hourly activity buckets behind trending titles
+RECOMMENDER_TRENDING_DAYS = int(os.getenv('RECOMMENDER_TRENDING_DAYS', '7'))
+# Hours after which an event counts half as much towards trending
+RECOMMENDER_TRENDING_HALF_LIFE_HOURS = float(os.getenv('RECOMMENDER_TRENDING_HALF_LIFE_HOURS', '24'))
+# Trending activity per rating and per watchlist addition
+RECOMMENDER_TRENDING_WEIGHTS = {
+    'rating': 1.0,
+    'watchlist': 0.5,
+}
+# Phantom ratings at the mean added to every title's popularity average
+RECOMMENDER_POPULARITY_PRIOR_WEIGHT = int(os.getenv('RECOMMENDER_POPULARITY_PRIOR_WEIGHT', '10'))
+# Popularity boost, in stars, for a title rated just now; it halves every
+# RECOMMENDER_POPULARITY_RECENCY_DAYS without a rating
+RECOMMENDER_POPULARITY_RECENCY_WEIGHT = float(os.getenv('RECOMMENDER_POPULARITY_RECENCY_WEIGHT', '0.25'))
+RECOMMENDER_POPULARITY_RECENCY_DAYS = int(os.getenv('RECOMMENDER_POPULARITY_RECENCY_DAYS', '30'))
+# Seconds a user's recommendation list is cached; writes evict it sooner
+RECOMMENDER_CACHE_TIMEOUT = int(os.getenv('RECOMMENDER_CACHE_TIMEOUT', '300'))
+# Neighbours stored per movie by refresh_similar_movies
+RECOMMENDER_SIMILAR_MOVIES = int(os.getenv('RECOMMENDER_SIMILAR_MOVIES', '20'))
+# Seconds clients and shared caches may reuse public catalog responses
+# before revalidating them with their ETag
+RECOMMENDER_HTTP_MAX_AGE = int(os.getenv('RECOMMENDER_HTTP_MAX_AGE', '60'))
+# Blend of rating co-occurrence and content similarity for "more like this"
+RECOMMENDER_SIMILAR_WEIGHTS = {
+    'ratings': 0.7,
+    'content': 0.3,
+}
+# Ratings at which a title's rating similarities count for half
+RECOMMENDER_SIMILAR_SHRINKAGE = int(os.getenv('RECOMMENDER_SIMILAR_SHRINKAGE', '10'))
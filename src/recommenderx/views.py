@@ -11,6 +11,8 @@ def home_page_view(request):
     """Home page view showing featured and recommended movies."""
     try:
         from movies.models import Movie
+        from movies.popularity import popular_movies as get_popular_movies
+        from movies.trending import trending_movies as get_trending_movies
         
         # Get total count for debugging
         total_count = Movie.objects.count()
@@ -22,32 +24,42 @@ def home_page_view(request):
         if all_movies:
             featured_movie = all_movies[0] if all_movies else None
             recommended_movies = all_movies[1:5] if len(all_movies) > 1 else []
-            popular_movies = all_movies[5:13] if len(all_movies) > 5 else []
+            # Highest Bayesian-average titles in one indexed query; insertion
+            # order only until anything has been rated
+            popular_movies = get_popular_movies(8)
+            if not popular_movies:
+                popular_movies = all_movies[5:13] if len(all_movies) > 5 else []
+            # Most decayed rating/watchlist activity this week, also one query
+            trending_movies = get_trending_movies(8)
             
             print(f"Featured: {featured_movie.title if featured_movie else 'None'}")
             print(f"Recommended: {len(recommended_movies)} movies")
             print(f"Popular: {len(popular_movies)} movies")
+            print(f"Trending: {len(trending_movies)} movies")
         else:
             print("No movies found in database")
             featured_movie = None
             recommended_movies = []
             popular_movies = []
+            trending_movies = []
         
     except Exception as e:
         print(f"Error fetching movies for homepage: {str(e)}")
         featured_movie = None
         recommended_movies = []
         popular_movies = []
+        trending_movies = []
     
     return render(request, 'home.html', {
         'featured_movie': featured_movie,
         'recommended_movies': recommended_movies,
         'popular_movies': popular_movies,
+        'trending_movies': trending_movies,
         'CLERK_PUBLISHABLE_KEY': settings.CLERK_PUBLISHABLE_KEY
     })
 
 def movie_list_view(request):
-    from django.db.models import Q
+    from django.db.models import QuerySet
     from django.apps import apps
     
     # Get the Movie model
@@ -55,84 +67,84 @@ def movie_list_view(request):
     
     search_query = request.GET.get('q', '')
     genre_filter = request.GET.get('genre', '')
-    sort_by = request.GET.get('sort', 'title')  # Default sort by title
-    
-    # Query the database directly instead of making API requests
-    if search_query:
-        # Search for movies by title or genre
-        movies_queryset = Movie.objects.filter(
-            Q(title__icontains=search_query) | 
-            Q(genre__icontains=search_query)
-        )
+    # Searches default to relevance order, browsing to title order
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'title')
+    
+    # Query the database directly instead of making API requests; the
+    # grid only reads the columns its cards show
+    from movies.fieldsets import CARD_FIELDS, movie_columns
+    from movies.pagination import SORTS
+    columns = movie_columns(CARD_FIELDS + ('average_rating', 'rating_count'))
+    if search_query and sort_by == 'relevance':
+        # Ranked by BM25; only the page shown is sorted and fetched
+        from movies.search import SearchResults
+        movies_queryset = SearchResults(search_query, only=columns)
+    elif search_query:
+        from movies.search import search_movie_ids
+        movies_queryset = Movie.objects.filter(id__in=search_movie_ids(search_query, limit=None)[0])
     elif genre_filter:
-        # Filter by genre
-        movies_queryset = Movie.objects.filter(genre__icontains=genre_filter)
+        # Filter by genre through the indexed Genre link table
+        from movies.genres import find_genre, movies_in_genre
+        genre_obj = find_genre(genre_filter)
+        movies_queryset = movies_in_genre(genre_obj) if genre_obj else Movie.objects.none()
     else:
         # Get all movies
         movies_queryset = Movie.objects.all()
     
-    # Convert queryset to list of dictionaries
-    movies = []
-    for movie in movies_queryset:
-        movies.append({
-            "id": movie.id,
-            "title": movie.title,
-            "genre": movie.genre,
-            "poster_url": movie.poster_url,
-            "description": movie.description
-        })
-    
-    # Add rating information to each movie
-    try:
-        from movies.models import Rating
+    # Genres and their movie counts for the filter dropdown
+    from movies.genres import genre_counts
+    genres = genre_counts()
+    
+    next_cursor = prev_cursor = None
+    if isinstance(movies_queryset, QuerySet):
+        # Sorted in the database on the (field, id) indexes ("rating" is the
+        # stored overall popularity score) and paged by ?cursor=, which seeks
+        # past the previous page instead of counting an OFFSET
+        from movies.pagination import keyset_page
+        sort = sort_by if sort_by in SORTS else 'title'
+        movies_queryset = movies_queryset.only(*columns, SORTS[sort][0])
+        try:
+            movies_list, next_cursor, prev_cursor = keyset_page(movies_queryset, sort, request.GET.get('cursor'), 12)
+        except ValueError:
+            # Stale or edited cursor (e.g. from another sort): start over
+            movies_list, next_cursor, prev_cursor = keyset_page(movies_queryset, sort, None, 12)
+        movies_page = None
+    else:
+        # Ranked search results are ordered in memory, and only the page
+        # shown is fetched, so numbered pages cost nothing extra
+        page = request.GET.get('page', 1)
+        paginator = Paginator(movies_queryset, 12)  # Show 12 movies per page
         
-        for movie in movies:
-            # Get all ratings for this movie
-            ratings = Rating.objects.filter(movie_id=movie['id'])
-            
-            if ratings.exists():
-                # Calculate average rating
-                avg_rating = sum(r.rating for r in ratings) / ratings.count()
-                movie['rating'] = avg_rating
-                movie['ratings_count'] = ratings.count()
-            else:
-                movie['rating'] = 0
-                movie['ratings_count'] = 0
-    except Exception as e:
-        print(f"Error adding ratings to movies: {str(e)}")
-    
-    # Sort movies based on user preference
-    if sort_by == 'title':
-        movies = sorted(movies, key=lambda x: x.get('title', '').lower())
-    elif sort_by == 'rating':
-        # Use the 'rating' field we added earlier
-        movies = sorted(movies, key=lambda x: x.get('rating', 0), reverse=True)
-    elif sort_by == 'release_date':
-        # Sort by release date (newest first)
-        movies = sorted(movies, key=lambda x: x.get('release_date', ''), reverse=True)
-    
-    # Get genres for filter dropdown directly from database
-    genres = list(Movie.objects.values_list('genre', flat=True).distinct())
-    genres = sorted(genres)
-    
-    # Pagination
-    page = request.GET.get('page', 1)
-    paginator = Paginator(movies, 12)  # Show 12 movies per page
-    
-    try:
-        movies_page = paginator.page(page)
-    except PageNotAnInteger:
-        movies_page = paginator.page(1)
-    except EmptyPage:
-        movies_page = paginator.page(paginator.num_pages)
+        try:
+            movies_page = paginator.page(page)
+        except PageNotAnInteger:
+            movies_page = paginator.page(1)
+        except EmptyPage:
+            movies_page = paginator.page(paginator.num_pages)
+        movies_list = movies_page.object_list
+    
+    # Convert the page to dictionaries; ratings come from the aggregates
+    # stored on each movie
+    movies = [{
+        "id": movie.id,
+        "title": movie.title,
+        "genre": movie.genre,
+        "poster_url": movie.poster_url,
+        "rating": movie.average_rating,
+        "ratings_count": movie.rating_count
+    } for movie in movies_list]
+    if movies_page is not None:
+        movies_page.object_list = movies
     
     return render(request, 'movies/movie_list.html', {
-        'movies': movies_page,
+        'movies': movies,
         'genres': genres,
         'current_genre': genre_filter,
         'search_query': search_query,
         'sort_by': sort_by,
-        'page_obj': movies_page,  # For pagination template
+        'page_obj': movies_page,  # For numbered pagination of ranked searches
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
     })
 
 def movie_detail_view(request, movie_id):
@@ -172,16 +184,11 @@ def movie_detail_view(request, movie_id):
         import hashlib
         from django.contrib.auth.models import User
         
-        # Get all ratings for this movie
+        # Get all ratings for this movie; the average comes from the
+        # aggregates stored on the movie
         all_ratings = Rating.objects.filter(movie_id=movie_id)
-        
-        # Calculate average rating
-        if all_ratings.exists():
-            avg_rating = sum(r.rating for r in all_ratings) / all_ratings.count()
-            ratings_count = all_ratings.count()
-        else:
-            avg_rating = 0
-            ratings_count = 0
+        avg_rating = movie_obj.average_rating
+        ratings_count = movie_obj.rating_count
         
         # Format ratings for the template
         ratings_list = []
@@ -198,6 +205,7 @@ def movie_detail_view(request, movie_id):
         # Set movie rating data
         movie['average_rating'] = avg_rating
         movie['ratings_count'] = ratings_count
+        movie['rating_histogram'] = movie_obj.rating_histogram
         movie['ratings'] = ratings_list
         
         # Check if current user has rated this movie
@@ -367,6 +375,10 @@ def movie_detail_view(request, movie_id):
             else:
                 llm_recommendation = "Unable to generate a recommendation at this time. Please try again later."
     
+    # "More like this" comes from the precomputed neighbour lists
+    from movies.recommendation import get_similar_movies
+    similar_movies = get_similar_movies(movie_id, 6)
+    
     # Debug the final movie object
     print(f"Final movie object has user_rating: {movie.get('user_rating') is not None}")
     if movie.get('user_rating'):
@@ -381,31 +393,52 @@ def movie_detail_view(request, movie_id):
         'has_ratings': len(movie.get('ratings', [])) > 0,
         'llm_recommendation': llm_recommendation,  # Add the LLM recommendation to the context
         'in_watchlist': in_watchlist,  # Add watchlist status to the context
+        'similar_movies': similar_movies,
     }
     
     return render(request, 'movies/movie_detail.html', context)
 
 def recommendations_view(request):
-    from django.apps import apps
+    from movies.cache import get_cached_recommendations
+    from movies.recommendation import get_user_recommendations
     
-    # Get the Movie model
-    Movie = apps.get_model('movies', 'Movie')
+    # Get the Clerk token
+    clerk_token = (
+        request.COOKIES.get('clerk_token') or
+        request.COOKIES.get('__clerk_db_jwt') or
+        request.COOKIES.get('__session') or
+        request.headers.get('Authorization', '').replace('Bearer ', '')
+    )
     
     try:
-        # Get a sample of movies as recommendations
-        # In a real app, this would use a recommendation algorithm
-        movie_queryset = Movie.objects.all().order_by('?')[:10]
+        # Ratings from the site are stored against the Django user for this Clerk token
+        user_id = None
+        if clerk_token:
+            import hashlib
+            from django.contrib.auth.models import User
+            
+            hash_object = hashlib.md5(clerk_token.encode())
+            username = f"clerk_{hash_object.hexdigest()[:8]}"
+            user_id = User.objects.filter(username=username).values_list('id', flat=True).first()
         
-        # Convert queryset to list of dictionaries
-        recommended_movies = []
-        for movie in movie_queryset:
-            recommended_movies.append({
-                "id": movie.id,
-                "title": movie.title,
-                "genre": movie.genre,
-                "poster_url": movie.poster_url,
-                "description": movie.description
-            })
+        def compute():
+            # Precomputed recommendations with live scoring as the fallback
+            live = []
+            movie_queryset = get_user_recommendations(user_id, 10, result=live)
+            
+            # Convert queryset to list of dictionaries
+            movies = []
+            for movie in movie_queryset:
+                movies.append({
+                    "id": movie.id,
+                    "title": movie.title,
+                    "genre": movie.genre,
+                    "poster_url": movie.poster_url,
+                    "description": movie.description
+                })
+            return movies, not (live and live[0].degraded)
+        
+        recommended_movies = get_cached_recommendations(user_id, 10, compute, namespace='page')
     except Exception as e:
         print(f"Error getting recommendations: {str(e)}")
         recommended_movies = []
@@ -445,9 +478,13 @@ def watchlist_view(request):
             user = User.objects.create(username=username)
             user_id = user.id
         
-        # Get the user's watchlist using the Django user ID
+        # Get the user's watchlist using the Django user ID, with each
+        # movie's card columns joined in
+        from movies.fieldsets import CARD_FIELDS, movie_columns
         from movies.models import Watchlist
-        watchlist_items = Watchlist.objects.filter(user_id=user_id)
+        watchlist_items = Watchlist.objects.filter(user_id=user_id).select_related('movie').only(
+            'movie_id', *movie_columns(CARD_FIELDS, prefix='movie__')
+        )
         
         print(f"Found {watchlist_items.count()} watchlist items for user {user_id}")
         
@@ -458,7 +495,6 @@ def watchlist_view(request):
                 'id': item.movie.id,
                 'title': item.movie.title,
                 'genre': item.movie.genre,
-                'description': item.movie.description,
                 'poster_url': item.movie.poster_url,
                 'watchlist_id': item.id,  # For removal functionality
             })
@@ -785,9 +821,6 @@ def remove_from_watchlist_view(request):
 # Add this function after your existing views
 
 def search_movies_view(request):
-    from django.db.models import Q
-    from django.apps import apps
-    
     search_query = request.GET.get('q', '')
     
     if not search_query:
@@ -795,41 +828,32 @@ def search_movies_view(request):
 
     print(f"Search query: {search_query}")
     
-    # Get the Movie model
-    Movie = apps.get_model('movies', 'Movie')
-    
     try:
-        # Search for movies by title or genre directly from database
-        movies_queryset = Movie.objects.filter(
-            Q(title__icontains=search_query) | 
-            Q(genre__icontains=search_query)
+        # Ranked by BM25 from the in-memory index; the paginator below only
+        # fetches the card columns of the page it shows
+        from movies.fieldsets import CARD_FIELDS, movie_columns, serialize_movie
+        from movies.search import SearchResults
+        
+        movies = SearchResults(
+            search_query,
+            serialize=lambda movie: serialize_movie(movie, CARD_FIELDS),
+            only=movie_columns(CARD_FIELDS),
         )
-        
-        # Convert queryset to list of dictionaries
-        movies = []
-        for movie in movies_queryset:
-            movies.append({
-                "id": movie.id,
-                "title": movie.title,
-                "genre": movie.genre,
-                "poster_url": movie.poster_url,
-                "description": movie.description
-            })
+        movies.count()
+        corrected_query = movies.corrected_query
     except Exception as e:
         print(f"Error searching movies: {str(e)}")
         movies = []
+        corrected_query = None
 
-    # Get genres for filter dropdown directly from database
+    # Genres and their movie counts for the filter dropdown
     try:
-        genres = list(Movie.objects.values_list('genre', flat=True).distinct())
-        genres = sorted(genres)
+        from movies.genres import genre_counts
+        genres = genre_counts()
     except Exception as e:
         print(f"Error fetching genres: {str(e)}")
         genres = []    
     
-    # Sort movies by title
-    movies = sorted(movies, key=lambda x: x.get('title', '').lower())
-    
     # Pagination
     page = request.GET.get('page', 1)
     paginator = Paginator(movies, 12)  # Show 12 movies per page
@@ -844,11 +868,12 @@ def search_movies_view(request):
     # Render the search results template with all necessary context
     context = {
         'query': search_query,
+        'corrected_query': corrected_query,
         'movies': movies_page,
         'genres': genres,
         'current_genre': '',
         'search_query': search_query,
-        'sort_by': 'title',
+        'sort_by': 'relevance',
         'page_obj': movies_page,  # For pagination template
         'CLERK_PUBLISHABLE_KEY': settings.CLERK_PUBLISHABLE_KEY
     }